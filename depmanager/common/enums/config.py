@@ -7,6 +7,8 @@ from typing import List
 from typing import Union
 
 from depmanager.common.enums.content_type import ContentType
+from depmanager.common.enums.formats import DatabaseFormat
+from depmanager.common.enums.variables import MEGABYTE
 from depmanager.common.shared.cached_property import cached_property
 
 # pylint: disable=protected-access
@@ -21,6 +23,13 @@ class Config:
         "repair_on_import": True,
         "repair_auto_skip_on_missing": False,
         "repair_auto_fix_on_missing": False,
+        "worker_count": 0,
+        "database_format": DatabaseFormat.JSON,
+        "zip_memory_budget_mb": 256,
+        "compression_cache": True,
+        "zip_storage_methods": {},
+        "zip_min_deflate_gain": 0.05,
+        "zip_deflate_workers": 1,
         "session": [],
         "favorites_ignore": {
             ContentType.CLOTHING: False,
@@ -104,6 +113,40 @@ class Config:
     def auto_fix(self) -> bool:
         return self.config.get("repair_auto_fix_on_missing", False)
 
+    @property
+    def worker_count(self) -> int:
+        # 0 will use all available cores, 1 will run scans serially
+        return int(self.config.get("worker_count", 0))
+
+    @property
+    def database_format(self) -> str:
+        return self.config.get("database_format", DatabaseFormat.JSON)
+
+    @property
+    def zip_memory_budget(self) -> int:
+        # Peak memory of a single var rewrite, larger members are streamed and larger images are not recompressed
+        return int(self.config.get("zip_memory_budget_mb", 256)) * MEGABYTE
+
+    @property
+    def compression_cache(self) -> bool:
+        # Remember which images are not worth compressing, next to the remote database
+        return self.config.get("compression_cache", True)
+
+    @property
+    def zip_storage_methods(self) -> Dict[str, Union[str, int]]:
+        # Extension to "stored", "deflated" or a deflate level, on top of StoragePolicy's defaults
+        return self.config.get("zip_storage_methods", {})
+
+    @property
+    def zip_min_deflate_gain(self) -> float:
+        # Members deflating by less than this fraction of their size are stored
+        return float(self.config.get("zip_min_deflate_gain", 0.05))
+
+    @property
+    def zip_deflate_workers(self) -> int:
+        # Threads members of a rewritten var are deflated on, 0 for one per core
+        return self.config.get("zip_deflate_workers", 1)
+
     @property
     def session(self) -> List[str]:
         return self.config.get("session")
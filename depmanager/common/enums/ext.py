@@ -19,6 +19,7 @@ class Ext:
     CSLIST = ".cslist"
     DLL = ".dll"
     ASSETBUNDLE = ".assetbundle"
+    DMDB = ".dmdb"
 
     TYPES_ELEM = [VMI, VAM]
     TYPES_JSON = [VAP, JSON]
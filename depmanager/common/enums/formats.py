@@ -0,0 +1,4 @@
+class DatabaseFormat:
+    JSON = "json"
+    BINARY = "binary"
+    SQLITE = "sqlite"
@@ -6,5 +6,5 @@ KILOBYTE = BYTE * 1024
 MEGABYTE = KILOBYTE * 1024
 GIGABYTE = MEGABYTE * 1024
 
-TEMP_VAR_NAME = "temp.temp.1.var"
+TEMP_VAR_PREFIX = "temp.temp."
 BACKWARDS_COMPAT_PLUGIN_AUTHORS = ["Hunting-Succubus", "MacGruber"]  # "AcidBubbles"
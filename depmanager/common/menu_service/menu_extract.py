@@ -1,13 +1,13 @@
 import os
-from zipfile import ZIP_DEFLATED
 
 from depmanager.common.enums.ext import Ext
-from depmanager.common.enums.variables import TEMP_VAR_NAME
 from depmanager.common.menu_service.base_actions_menu import BaseActionsMenu
 from depmanager.common.parser.appearance_parser import AppearanceParser
 from depmanager.common.parser.clothing_parser import ClothingParser
 from depmanager.common.shared.console_menu_item import ConsoleMenuItem
 from depmanager.common.shared.progress_bar import ProgressBar
+from depmanager.common.shared.tools import temp_var_path
+from depmanager.common.shared.ziptools import ZipMemberWriter
 from depmanager.common.shared.ziptools import ZipReadInto
 from depmanager.common.shared.ziptools import ZipWrite
 
@@ -103,21 +103,15 @@ class MenuExtract(BaseActionsMenu):
         for var_id, var_ref in self.cache.local.db.vars.items():
             progress.inc()
             if var_id in unique_presets:
-                temp_file = os.path.join(var_ref.directory, TEMP_VAR_NAME)
-                with ZipReadInto(var_ref.file_path, temp_file) as (zf_src, zf_dest):
+                temp_file = temp_var_path(var_ref.directory)
+                with ZipReadInto(var_ref.file_path, temp_file) as (zf_src, zf_dest), ZipMemberWriter(zf_dest) as writer:
                     for item in zf_src.infolist():
-                        zf_dest.writestr(item.filename, zf_src.read(item.filename), ZIP_DEFLATED)
-                    with open(os.path.join(preset_storage, f"Preset_{var_ref.clean_name}{Ext.JPG}"), "rb") as read_file:
-                        zf_dest.writestr(
-                            f"Custom/Atom/Person/Clothing/Preset_{var_ref.clean_name}{Ext.JPG}",
-                            read_file.read(),
-                            ZIP_DEFLATED,
-                        )
-                    with open(os.path.join(preset_storage, f"Preset_{var_ref.clean_name}{Ext.VAP}"), "rb") as read_file:
-                        zf_dest.writestr(
-                            f"Custom/Atom/Person/Clothing/Preset_{var_ref.clean_name}{Ext.VAP}",
-                            read_file.read(),
-                            ZIP_DEFLATED,
+                        writer.copy(zf_src, item)
+                    # ZipFile.write streams the preset files instead of reading them whole
+                    for ext in (Ext.JPG, Ext.VAP):
+                        writer.write_file(
+                            os.path.join(preset_storage, f"Preset_{var_ref.clean_name}{ext}"),
+                            f"Custom/Atom/Person/Clothing/Preset_{var_ref.clean_name}{ext}",
                         )
 
                 os.remove(var_ref.file_path)
@@ -21,6 +21,7 @@ class MenuMaintenance(BaseActionsMenu):
                 ConsoleMenuItem("CREATE *.dep from local image_lib", self.build_dep_from_image_lib),
                 ConsoleMenuItem("FIND what uses var", self.search_that_use),
                 ConsoleMenuItem("FIND low value vars", self.search_low_value),
+                ConsoleMenuItem("COMPACT remote database", self.compact_database),
             ],
         )
 
@@ -42,10 +43,7 @@ class MenuMaintenance(BaseActionsMenu):
         ]
         for var_id in repairable_var_ids:
             var_ref = self.cache.local.db[var_id]
-            repaired = self.cache.remote.db.repair_broken_var(var_ref, remove_confirm=False, remove_skip=True)
-            if not repaired:
-                continue
-            self.cache.remote.db.repair_metadata(var_ref)
+            self.cache.remote.db.transform_var(var_ref, remove_confirm=False, remove_skip=True)
 
     def repair_duplication(self):
         # filters = self.get_var_filters()
@@ -82,11 +80,13 @@ class MenuMaintenance(BaseActionsMenu):
     def build_dep_from_image_lib(self):
         self.cache.remote.db.save_image_db_as_dep()
 
+    def compact_database(self):
+        self.cache.remote.db.save(compact=True)
+
     def search_that_use(self):
         var_name = input("Name: ").strip()
-        # noinspection PyTypeChecker
-        required_by = self.cache.remote.db.vars_required.get(var_name)
-        if required_by is None or len(required_by) == 0:
+        required_by = self.cache.remote.required_by(var_name)
+        if len(required_by) == 0:
             print("Not used as a dependency by any vars.")
         else:
             print("Used by:")
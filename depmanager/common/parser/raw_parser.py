@@ -1,5 +1,7 @@
+import re
 from collections import defaultdict
 from os import path
+from typing import Iterator
 from typing import Optional
 
 from depmanager.common.enums.ext import Ext
@@ -10,6 +12,69 @@ DEAD_TRIGGERS = [
     "toggle:",
     "clothing:",
 ]
+DEAD_TRIGGER_PATTERN = re.compile(b"|".join(re.escape(trigger.encode("UTF-8")) for trigger in DEAD_TRIGGERS))
+
+# A single "key" : "value" (or a lone "value") starting a line, the layout of pretty printed json
+PAIR_PATTERN = re.compile(rb'[ \t]*(?:"([^"\r\n]*)"[ \t]*:[ \t]*)?"([^"\r\n]*)"')
+# What separates a key from its value
+KEY_SEPARATOR = re.compile(rb"[ \t]*:[ \t]*")
+# Pretty printed lines are short, anything longer is scanned string by string
+MAX_PAIR_LINE = 4096
+
+
+def iter_reference_strings(data: bytes) -> Iterator[tuple[Optional[bytes], bytes]]:
+    """Yields (key, value) for every json string of data holding a reference, key is None for array items
+
+    Every reference marker (":/", "Custom/", "Saves/") ends in a slash, so the scan jumps from slash to slash with
+    bytes.find, which is far faster than any regex alternation. When the marker is on a short line PAIR_PATTERN
+    reads the key and value in one go, otherwise only the surrounding quotes are inspected. Like the line based
+    scanner, strings never span lines.
+    """
+    find = data.find
+    rfind = data.rfind
+    startswith = data.startswith
+    match_pair = PAIR_PATTERN.match
+    match_separator = KEY_SEPARATOR.fullmatch
+    position = 0
+    while True:
+        slash = find(b"/", position)
+        if slash < 0:
+            return
+        if not (
+            (slash >= 1 and startswith(b":", slash - 1))
+            or (slash >= 6 and startswith(b"Custom", slash - 6))
+            or (slash >= 5 and startswith(b"Saves", slash - 5))
+        ):
+            position = slash + 1
+            continue
+
+        line_start = rfind(b"\n", max(0, slash - MAX_PAIR_LINE), slash)
+        if line_start >= 0 or slash < MAX_PAIR_LINE:
+            pair = match_pair(data, line_start + 1)
+            if pair is not None and pair.start(2) <= slash < pair.end(2):
+                position = pair.end()
+                yield pair.groups()
+                continue
+
+        value_start = rfind(b'"', 0, slash)
+        value_end = find(b'"', slash)
+        if value_start < 0 or value_end < 0:
+            return
+        value = data[value_start + 1 : value_end]
+        if b"\n" in value or b"\r" in value:
+            position = slash + 1
+            continue
+        position = value_end + 1
+
+        key = None
+        key_end = rfind(b'"', 0, value_start)
+        if key_end >= 0 and match_separator(data, key_end + 1, value_start):
+            key_start = rfind(b'"', 0, key_end)
+            if key_start >= 0:
+                key = data[key_start + 1 : key_end]
+                if b"\n" in key or b"\r" in key:
+                    key = None
+        yield key, value
 
 
 class RawParser:
@@ -57,6 +122,41 @@ class RawParser:
                 packages["SELF_UNREF"].add(package_path)
         return packages
 
+    @staticmethod
+    def scan_bytes_with_paths(data: bytes) -> dict[str, set[str]]:
+        """Byte level equivalent of scan_with_paths over the raw contents of a member
+
+        Every string found by iter_reference_strings is handled like a line of scan_with_paths, with the key and value
+        standing in for the line. Minified json is therefore scanned completely, instead of stopping at the first
+        reference.
+        """
+        packages = defaultdict(set)
+        for key, value in iter_reference_strings(data):
+            context = value.lower() if key is None else (key + b" " + value).lower()
+            if b":/" in value:
+                if b"https://" in context or b"http://" in context:
+                    continue
+                package_parts = value.decode("UTF-8").split(":/")
+                package = "::".join(package_parts[:-1])
+                # If there are "name" or "displayName" hooks we should dump the A_ referencing
+                if (package[:2] == "A_" and b"name" in context) or DEAD_TRIGGER_PATTERN.search(context):
+                    if ":" in package:
+                        package = package.split(":")[1]
+                    else:
+                        package = package[2:]
+
+                package_path = package_parts[-1]
+                package_path = package_path.replace(":False", "").replace(":True", "")
+                packages[package].add(package_path)
+            else:
+                tokens = (value,) if key is None else (key, value)
+                split_on = b"Custom/" if any(b"Custom/" in token for token in tokens) else b"Saves/"
+                package_path = next(token for token in tokens if split_on in token).decode("UTF-8")
+                if package_path[:2] == "A_" and ":" in package_path:
+                    package_path = package_path.split(":")[1]
+                packages["SELF_UNREF"].add(package_path)
+        return packages
+
     @classmethod
     def replace(cls, contents: list[str], replacement_mappings: dict[str, Optional[str]]) -> list[str]:
         rebuilt_contents = []
@@ -1,5 +1,11 @@
 _NOT_FOUND = object()
 
+
+def cached_slots(*names: str) -> tuple[str, ...]:
+    """The __slots__ a class without a __dict__ declares for the cached properties it uses"""
+    return tuple(f"_cached_{name}" for name in names)
+
+
 # noinspection PyPep8Naming
 # pylint: disable=invalid-name
 class cached_property:
@@ -9,16 +15,20 @@ class cached_property:
     is also slower, and we don't care about true thread safety in this program.
     This version also has fewer checks than the Django version because it is only
     for python 3.10+
+
+    Instances without a __dict__ keep the value in a slot of their own, see cached_slots.
     """
 
     def __init__(self, func):
         self.func = func
         self.attr_name = None
+        self.slot_name = None
         self.__doc__ = func.__doc__
 
     def __set_name__(self, owner, name):
         if self.attr_name is None:
             self.attr_name = name
+            self.slot_name = cached_slots(name)[0]
         elif name != self.attr_name:
             raise TypeError(
                 "Cannot assign the same cached_property to two different names " f"({self.attr_name!r} and {name!r})."
@@ -29,5 +39,18 @@ class cached_property:
             return self
         if self.attr_name is None:
             raise TypeError("Cannot use cached_property instance without calling __set_name__ on it.")
-        res = instance.__dict__[self.attr_name] = self.func(instance)
+        # Once set the __dict__ entry hides this descriptor, only slotted instances come back here
+        res = getattr(instance, self.slot_name, _NOT_FOUND)
+        if res is not _NOT_FOUND:
+            return res
+        res = self.func(instance)
+        try:
+            instance.__dict__[self.attr_name] = res
+        except AttributeError:
+            try:
+                setattr(instance, self.slot_name, res)
+            except AttributeError:
+                raise TypeError(
+                    f"{type(instance).__name__} has neither a __dict__ nor a {self.slot_name!r} slot for {self.attr_name!r}"
+                ) from None
         return res
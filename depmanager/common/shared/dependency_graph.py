@@ -0,0 +1,187 @@
+from typing import Iterable
+from typing import Optional
+
+from depmanager.common.shared.cached_property import cached_property
+from depmanager.common.shared.tools import paused_gc
+
+
+class DependencyGraph:
+    """Resolved dependency graph of a database, built once and queried many times
+
+    Strongly connected components are condensed with Tarjan's algorithm so cycles collapse to a single node. The
+    transitive closure of a component is the set of its own members joined with the closures of the components it
+    depends on, it is computed lazily and memoised, so every shared sub-tree is only expanded once.
+
+    labels are any values attached to the nodes, the dependency names a var uses for instance. collect() gathers
+    them over a closure, in a single pass over the components in the order Tarjan emits them.
+    """
+
+    def __init__(self, edges: dict[str, Iterable[str]], labels: Optional[dict[str, Iterable[str]]] = None):
+        self.nodes = list(edges)
+        self.index = {node: position for position, node in enumerate(self.nodes)}
+        self.successors = [
+            [position for position in map(self.index.get, edges[node]) if position is not None] for node in self.nodes
+        ]
+        self.labels = labels if labels is not None else {}
+        self.components, self.component_of = self._strongly_connected_components()
+        self._closures = {}
+        self._reverse_closures = {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self.index
+
+    def _strongly_connected_components(self) -> tuple[list[list[int]], list[int]]:
+        """Iterative Tarjan, dependency chains are deep enough to hit the recursion limit"""
+        successors = self.successors
+        node_count = len(successors)
+        # 0 is not visited yet, a node is on the stack while it is visited and has no component
+        order = [0] * node_count
+        low_link = [0] * node_count
+        component_of = [-1] * node_count
+        components = []
+        stack = []
+        counter = 0
+
+        for root in range(node_count):
+            if order[root]:
+                continue
+            if not successors[root]:
+                # Most vars depend on nothing, they are components of their own
+                order[root] = -1
+                component_of[root] = len(components)
+                components.append([root])
+                continue
+            counter += 1
+            order[root] = low_link[root] = counter
+            stack.append(root)
+            work = [(root, iter(successors[root]))]
+            while work:
+                node, targets = work[-1]
+                for target in targets:
+                    if not order[target]:
+                        if not successors[target]:
+                            order[target] = -1
+                            component_of[target] = len(components)
+                            components.append([target])
+                            continue
+                        counter += 1
+                        order[target] = low_link[target] = counter
+                        stack.append(target)
+                        work.append((target, iter(successors[target])))
+                        break
+                    if component_of[target] == -1 and order[target] < low_link[node]:
+                        low_link[node] = order[target]
+                else:
+                    work.pop()
+                    if work and low_link[node] < low_link[work[-1][0]]:
+                        low_link[work[-1][0]] = low_link[node]
+                    if low_link[node] == order[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            component_of[member] = len(components)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        # Tarjan emits components in reverse topological order, dependencies come before their dependants
+        return components, component_of
+
+    def _condense(self, adjacency: list[list[int]]) -> list[set[int]]:
+        condensed = [set() for _ in self.components]
+        for source, targets in enumerate(adjacency):
+            source_component = self.component_of[source]
+            for target in targets:
+                target_component = self.component_of[target]
+                if target_component != source_component:
+                    condensed[source_component].add(target_component)
+        return condensed
+
+    @cached_property
+    def component_successors(self) -> list[set[int]]:
+        return self._condense(self.successors)
+
+    @cached_property
+    def component_predecessors(self) -> list[set[int]]:
+        predecessors = [[] for _ in self.successors]
+        for source, targets in enumerate(self.successors):
+            for target in targets:
+                predecessors[target].append(source)
+        return self._condense(predecessors)
+
+    @cached_property
+    def component_labels(self) -> list[frozenset]:
+        """The labels of every component joined with those of every component it depends on"""
+        collected = []
+        nodes, successors, component_of = self.nodes, self.successors, self.component_of
+        with paused_gc():
+            for component, members in enumerate(self.components):
+                labels = set()
+                for member in members:
+                    labels.update(self.labels.get(nodes[member], ()))
+                    for target in successors[member]:
+                        # Emitted, and so collected, before any component depending on it
+                        if component_of[target] != component:
+                            labels |= collected[component_of[target]]
+                collected.append(frozenset(labels))
+        return collected
+
+    def _component_closure(self, component: int, adjacency: list[set[int]], memo: dict[int, frozenset]) -> frozenset:
+        """Every node reachable from component, including its own members"""
+        work = [component]
+        while work:
+            current = work[-1]
+            if current in memo:
+                work.pop()
+                continue
+            pending = [target for target in adjacency[current] if target not in memo]
+            if pending:
+                work.extend(pending)
+                continue
+            work.pop()
+            reachable = {self.nodes[member] for member in self.components[current]}
+            for target in adjacency[current]:
+                reachable |= memo[target]
+            memo[current] = frozenset(reachable)
+        return memo[component]
+
+    def is_cyclic(self, node: str) -> bool:
+        position = self.index[node]
+        return len(self.components[self.component_of[position]]) > 1 or position in self.successors[position]
+
+    def _reachable(self, node: str, adjacency: list[set[int]], memo: dict[int, frozenset]) -> set[str]:
+        if node not in self.index:
+            return set()
+        component = self.component_of[self.index[node]]
+        reachable = set()
+        for target in adjacency[component]:
+            reachable |= self._component_closure(target, adjacency, memo)
+        if self.is_cyclic(node):
+            # Within a cycle every member is reachable from any other member, including itself
+            reachable.update(self.nodes[member] for member in self.components[component])
+        return reachable
+
+    def closure(self, node: str) -> set[str]:
+        """Every node node depends on, directly or not. The node itself is only included if it is part of a cycle"""
+        return self._reachable(node, self.component_successors, self._closures)
+
+    def reverse_closure(self, node: str) -> set[str]:
+        """Every node depending on node, directly or not"""
+        return self._reachable(node, self.component_predecessors, self._reverse_closures)
+
+    def collect(self, node: str) -> frozenset[str]:
+        """The labels of node and of every node it depends on, directly or not, shared by the whole component"""
+        if node not in self.index:
+            return frozenset()
+        return self.component_labels[self.component_of[self.index[node]]]
+
+    def cycles(self) -> list[list[str]]:
+        """Every dependency cycle, as the sorted list of the nodes taking part in it"""
+        return sorted(
+            sorted(self.nodes[member] for member in component)
+            for component in self.components
+            if len(component) > 1 or component[0] in self.successors[component[0]]
+        )
@@ -0,0 +1,128 @@
+import collections
+import os
+from typing import Optional
+from typing import Sequence
+
+import numpy as np
+
+
+def _char_codes(strings: Sequence[str]) -> np.ndarray:
+    """Zero padded (len(strings), max_length) array of the code points of every string"""
+    if len(strings) == 0:
+        return np.zeros((0, 0), dtype=np.uint32)
+    as_array = np.array(strings, dtype=str)
+    width = as_array.dtype.itemsize // 4
+    return as_array.view(np.uint32).reshape(len(strings), max(width, 1))
+
+
+def fuzzy_scores(query: str, candidates: Sequence[str]) -> np.ndarray:
+    """Vectorised fuzzy_compare_strings(query, candidate) for a batch of candidates
+
+    Only the characters of the query count towards the score, so only those are compared.
+    """
+    codes = _char_codes(candidates)
+    scores = np.zeros(len(candidates), dtype=np.int64)
+    for char, query_count in collections.Counter(query).items():
+        char_counts = np.count_nonzero(codes == ord(char), axis=1)
+        scores += np.maximum(query_count - char_counts, 0)
+    return scores
+
+
+class FuzzyIndex:
+    """Approximate match index over a list of strings, scored with fuzzy_compare_strings
+
+    The score is the number of characters of the query missing from the candidate, counting repeats. Seen as the
+    set of (char, n) pairs "the query holds at least n of char", a candidate scoring below threshold lacks fewer
+    than threshold of those pairs. Any threshold pairs of the query are therefore enough to find every candidate
+    that can match: only the candidates holding one of the rarest pairs are scored, all at once against the
+    character histogram of the index.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = list(keys)
+        codes = _char_codes(self.keys)
+        self.alphabet, columns = np.unique(codes, return_inverse=True)
+        columns = columns.reshape(codes.shape)
+        rows = np.repeat(np.arange(len(self.keys)), codes.shape[1])
+        histogram = np.bincount(
+            rows * len(self.alphabet) + columns.ravel(), minlength=len(self.keys) * len(self.alphabet)
+        )
+        self.histogram = histogram.reshape(len(self.keys), len(self.alphabet)).astype(np.uint16)
+        self.column = {chr(code): position for position, code in enumerate(self.alphabet) if code != 0}
+        # counts_at_least[column][n] is the number of keys holding at least n of that character
+        self.counts_at_least = [
+            np.cumsum(np.bincount(self.histogram[:, position])[::-1])[::-1] for position in range(len(self.alphabet))
+        ]
+        self._postings = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _posting_size(self, column: Optional[int], count: int) -> int:
+        if column is None or count >= len(self.counts_at_least[column]):
+            return 0
+        return int(self.counts_at_least[column][count])
+
+    def _posting(self, column: int, count: int) -> np.ndarray:
+        posting = self._postings.get((column, count))
+        if posting is None:
+            posting = np.flatnonzero(self.histogram[:, column] >= count)
+            self._postings[(column, count)] = posting
+        return posting
+
+    def search(self, query: str, threshold: int) -> tuple[np.ndarray, np.ndarray]:
+        """Positions of every key scoring below threshold, in index order, and their scores"""
+        query_counts = collections.Counter(query)
+        pairs = [
+            (self.column.get(char), count) for char, total in query_counts.items() for count in range(1, total + 1)
+        ]
+        if len(pairs) < threshold:
+            # Short queries are within threshold of anything, even of an empty key
+            candidates = np.arange(len(self.keys))
+        else:
+            rarest = sorted(pairs, key=lambda pair: self._posting_size(*pair))[:threshold]
+            postings = [self._posting(column, count) for column, count in rarest if self._posting_size(column, count)]
+            if len(postings) == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+            candidates = np.unique(np.concatenate(postings))
+
+        # Characters missing from the whole index are missing from every candidate
+        scores = np.full(len(candidates), sum(c for char, c in query_counts.items() if char not in self.column))
+        known = [(self.column[char], c) for char, c in query_counts.items() if char in self.column]
+        if known:
+            columns, counts = (np.array(values) for values in zip(*known))
+            candidate_counts = self.histogram[candidates][:, columns].astype(np.int64)
+            scores = scores + np.maximum(counts - candidate_counts, 0).sum(axis=1)
+        matches = scores < threshold
+        return candidates[matches], scores[matches]
+
+    def nearest(self, query: str, threshold: int) -> Optional[int]:
+        """Position of the best scoring key below threshold, the first one wins a tie"""
+        positions, scores = self.search(query, threshold)
+        if len(positions) == 0:
+            return None
+        return int(positions[np.argmin(scores)])
+
+
+class FuzzyFileIndex:
+    """Reusable equivalent of tools.find_fuzzy_file_match over an includes_as_list style listing"""
+
+    def __init__(self, included_files: Sequence[tuple[str, str, str]]):
+        self.included_by_ext = collections.defaultdict(list)
+        for var_id, file_path, file_only in included_files:
+            self.included_by_ext[os.path.splitext(file_only)[1]].append((var_id, file_path))
+        self.indexes = {
+            ext: FuzzyIndex([file_path for _, file_path in included]) for ext, included in self.included_by_ext.items()
+        }
+
+    def find(self, filepath: str, threshold: int = 2) -> tuple[Optional[str], Optional[str]]:
+        ext = os.path.splitext(filepath)[1]
+        index = self.indexes.get(ext)
+        if index is None:
+            return None, None
+        # A basename holds a subset of the characters of its path, so it never scores better than the path
+        # and the path matches alone decide the result
+        position = index.nearest(filepath, threshold)
+        if position is None:
+            return None, None
+        return self.included_by_ext[ext][position]
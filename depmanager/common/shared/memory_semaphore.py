@@ -0,0 +1,27 @@
+import threading
+
+
+class MemorySemaphore:
+    """Counting semaphore over bytes instead of slots
+
+    A request larger than the capacity is clamped to it, so it waits for everything else to be released and then
+    runs alone instead of never running.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.available = self.capacity
+        self._condition = threading.Condition()
+
+    def acquire(self, amount: int) -> int:
+        """Blocks until amount bytes are available, returns the amount to release"""
+        amount = min(max(0, amount), self.capacity)
+        with self._condition:
+            self._condition.wait_for(lambda: self.available >= amount)
+            self.available -= amount
+        return amount
+
+    def release(self, amount: int) -> None:
+        with self._condition:
+            self.available += amount
+            self._condition.notify_all()
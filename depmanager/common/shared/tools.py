@@ -1,7 +1,20 @@
 import collections
+import contextlib
+import gc
 import os
+import uuid
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Callable
 from typing import Optional
 
+from orjson import orjson
+
+from depmanager.common.enums.ext import Ext
+from depmanager.common.enums.variables import TEMP_VAR_PREFIX
+from depmanager.common.shared.fuzzy_index import FuzzyFileIndex
+from depmanager.common.shared.fuzzy_index import fuzzy_scores
 from depmanager.common.shared.progress_bar import ProgressBar
 
 
@@ -15,29 +28,55 @@ def select_fuzzy_match(filepath: str, found: list[tuple[str, str]]) -> tuple[Opt
         return None, None
     if len(found) == 1:
         return found[0]
-    fuzzy_matches = [fuzzy_compare_strings(filepath, item[1]) for item in found]
-    best_index = fuzzy_matches.index(min(fuzzy_matches))
-    return found[best_index]
+    fuzzy_matches = fuzzy_scores(filepath, [item[1] for item in found])
+    return found[int(fuzzy_matches.argmin())]
 
 
 def find_fuzzy_file_match(
     filepath: str, included_files: list[tuple[str, str, str]], threshold: int = 2
 ) -> tuple[Optional[str], Optional[str]]:
-    filepath_ext = os.path.splitext(filepath)[1]
+    """One off lookup, build a FuzzyFileIndex instead when matching several files against the same listing"""
+    return FuzzyFileIndex(included_files).find(filepath, threshold)
+
+
+def read_json_lines(file_path: str) -> tuple[list, int]:
+    """Every entry of a json lines file, and the number of lines skipped because they could not be parsed
+
+    A line is only ever cut short when a run is interrupted while appending to the file.
+    """
+    entries = []
+    skipped = 0
+    with open(file_path, "rb") as read_file:
+        for line in read_file.read().splitlines():
+            if len(line) == 0:
+                continue
+            try:
+                entries.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                skipped += 1
+    return entries, skipped
+
 
-    found_fuzz_filepath = []
-    found_fuzz_file = []
-    for repair_var_id, repair_var_file_path, repair_var_file_only in included_files:
-        if filepath_ext != os.path.splitext(repair_var_file_only)[1]:
-            continue
-        if fuzzy_compare_strings(filepath, repair_var_file_path) < threshold:
-            found_fuzz_filepath.append((repair_var_id, repair_var_file_path))
-        elif fuzzy_compare_strings(filepath, repair_var_file_only) < threshold:
-            found_fuzz_file.append((repair_var_id, repair_var_file_path))
+@contextlib.contextmanager
+def paused_gc():
+    """Loading the database allocates millions of acyclic containers, which otherwise triggers repeated
+    full collections of the cyclic garbage collector"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
-    if len(found_fuzz_filepath) > 0:
-        return select_fuzzy_match(filepath, found_fuzz_filepath)
-    return select_fuzzy_match(filepath, found_fuzz_file)
+
+def temp_var_path(directory: str) -> str:
+    """Unique temp var to rewrite a var into, so vars sharing a directory can be rewritten at the same time"""
+    return os.path.join(directory, f"{TEMP_VAR_PREFIX}{uuid.uuid4().hex}{Ext.VAR}")
+
+
+def is_temp_var(filename: str) -> bool:
+    return filename.startswith(TEMP_VAR_PREFIX) and filename.endswith(Ext.VAR)
 
 
 def remove_empty_directories(filepath):
@@ -77,3 +116,51 @@ def are_substrings_in_str(str_a: str, str_list: list[str], ignore_case: bool = T
 def get_file_stat(file_path) -> tuple[str, float, float]:
     stats = os.stat(file_path)
     return file_path, stats.st_mtime, stats.st_size
+
+
+def _scan_directory(dir_path: str, extension: str) -> tuple[list[tuple[str, float, float]], list[str]]:
+    files = []
+    sub_directories = []
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                # Mirror os.walk, symlinked directories are listed but never followed
+                if entry.is_dir(follow_symlinks=False):
+                    sub_directories.append(entry.path)
+                elif len(entry.name) > len(extension) and entry.name[-len(extension) :] == extension:
+                    try:
+                        # On windows the DirEntry already carries these stats, so no extra round trip is made
+                        stats = entry.stat()
+                    except OSError as err:
+                        print(f"ERROR :: Could not stat {entry.path} >> {err}")
+                        continue
+                    files.append((entry.path, stats.st_mtime, stats.st_size))
+    except OSError:
+        # os.walk silently skips directories it cannot list
+        pass
+    return files, sub_directories
+
+
+def scan_directory_files(
+    root: str, extension: str, ignore: Callable[[str], bool] = None, workers: int = None
+) -> list[tuple[str, float, float]]:
+    """Single pass replacement for os.walk + get_file_stat
+
+    Every directory is listed once with os.scandir on a thread pool, so sibling subtrees are walked concurrently.
+    Ignored directories are pruned before they are listed instead of being filtered out afterwards.
+    """
+    if ignore is not None and ignore(root):
+        return []
+
+    files_with_stats = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(_scan_directory, root, extension)}
+        while len(pending) > 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, sub_directories = future.result()
+                files_with_stats.extend(files)
+                for sub_directory in sub_directories:
+                    if ignore is None or not ignore(sub_directory):
+                        pending.add(executor.submit(_scan_directory, sub_directory, extension))
+    return sorted(files_with_stats)
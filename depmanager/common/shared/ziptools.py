@@ -1,7 +1,73 @@
+import copy
+import functools
+import mmap
+import os
+import shutil
+import struct
+import time
+import zlib
+from array import array
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from typing import IO
+from typing import Callable
+from typing import Iterable
 from typing import Optional
+from typing import Union
+from zipfile import ZIP64_LIMIT
 from zipfile import ZIP_DEFLATED
 from zipfile import ZIP_STORED
+from zipfile import BadZipFile
 from zipfile import ZipFile
+from zipfile import ZipInfo
+
+from depmanager.common.enums.ext import Ext
+from depmanager.common.shared.memory_semaphore import MemorySemaphore
+
+# Layouts from the zip APPNOTE, all little endian
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_ZIP64_EXTRA_ID = 0x0001
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+
+# Peak memory a member rewrite may use, see set_memory_budget
+_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+def set_memory_budget(budget: int) -> None:
+    """Bytes a zip rewrite may hold in memory at once
+
+    Members are streamed in chunks of a quarter of the budget (within MIN_CHUNK_SIZE and MAX_CHUNK_SIZE), members
+    larger than the budget should never be read whole, see fits_memory_budget.
+    """
+    global _MEMORY_BUDGET  # pylint: disable=global-statement
+    _MEMORY_BUDGET = budget
+
+
+def get_memory_budget() -> int:
+    return _MEMORY_BUDGET
+
+
+def get_chunk_size() -> int:
+    return max(MIN_CHUNK_SIZE, min(_MEMORY_BUDGET // 4, MAX_CHUNK_SIZE))
+
+
+def fits_memory_budget(item: ZipInfo) -> bool:
+    return item.file_size <= _MEMORY_BUDGET
 
 
 class ZipObj:
@@ -74,3 +140,519 @@ class ZipReadInto:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.zip_read.close()
         self.zip_write.close()
+
+
+def _strip_zip64_extra(extra: bytes) -> bytes:
+    """ZipInfo.FileHeader appends its own zip64 field, any existing one has to go"""
+    stripped = b""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<2H", extra, position)
+        if header_id != _ZIP64_EXTRA_ID:
+            stripped += extra[position : position + 4 + length]
+        position += 4 + length
+    return stripped
+
+
+def copy_zip_member(
+    read_zf: ZipFile,
+    zf_dest: ZipFile,
+    item: ZipInfo,
+    compress_type: Optional[int] = None,
+    compresslevel: Optional[int] = None,
+) -> None:
+    """Copy a member from read_zf into zf_dest without holding it in memory
+
+    If the member already uses compress_type (or compress_type is None) its compressed bytes are copied as they are,
+    nothing is inflated or deflated again and the member keeps its compression type, crc and date. Otherwise it is
+    re-encoded, streamed between ZipFile.open handles. Either way the data moves in get_chunk_size() blocks.
+    """
+    if compress_type is None or compress_type == item.compress_type or item.is_dir():
+        _copy_raw_member(read_zf, zf_dest, item)
+    else:
+        _stream_member(read_zf, zf_dest, item, compress_type, compresslevel)
+
+
+def _stream_member(
+    read_zf: ZipFile, zf_dest: ZipFile, item: ZipInfo, compress_type: int, compresslevel: Optional[int] = None
+) -> None:
+    zinfo = ZipInfo(item.filename, item.date_time)
+    zinfo.compress_type = compress_type
+    # ZipFile.open has no level argument, it takes the one of the ZipInfo
+    zinfo._compresslevel = compresslevel  # pylint: disable=protected-access
+    zinfo.external_attr = item.external_attr
+    # Lets ZipFile.open decide up front whether the member needs zip64
+    zinfo.file_size = item.file_size
+    with read_zf.open(item) as read_item, zf_dest.open(zinfo, "w") as write_item:
+        shutil.copyfileobj(read_item, write_item, get_chunk_size())
+
+
+def _copy_raw_member(read_zf: ZipFile, zf_dest: ZipFile, item: ZipInfo) -> None:
+    zinfo = copy.copy(item)
+    # The sizes are known before the data is written, so there is no data descriptor after it
+    zinfo.flag_bits &= ~_FLAG_DATA_DESCRIPTOR
+    zinfo.extra = _strip_zip64_extra(item.extra)
+
+    # pylint: disable=protected-access
+    with read_zf._lock:
+        read_fp = read_zf.fp
+        read_fp.seek(item.header_offset)
+        header = read_fp.read(_LOCAL_HEADER.size)
+        if len(header) != _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIGNATURE:
+            raise BadZipFile(f"Bad local header for {item.filename} in {read_zf.filename}")
+        fields = _LOCAL_HEADER.unpack(header)
+        read_fp.seek(item.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10])
+
+        def read_chunks():
+            remaining = zinfo.compress_size
+            chunk_size = get_chunk_size()
+            while remaining > 0:
+                chunk = read_fp.read(min(remaining, chunk_size))
+                if len(chunk) == 0:
+                    raise BadZipFile(f"Truncated member {item.filename} in {read_zf.filename}")
+                remaining -= len(chunk)
+                yield chunk
+
+        _write_raw_member(zf_dest, zinfo, read_chunks())
+
+
+def _write_raw_member(zf_dest: ZipFile, zinfo: ZipInfo, chunks: Iterable[bytes]) -> None:
+    """Write a member whose compressed data is already at hand, zinfo holds its final sizes and crc"""
+    zip64 = zinfo.file_size > ZIP64_LIMIT or zinfo.compress_size > ZIP64_LIMIT
+    # Mirrors ZipFile.mkdir, which is the only member writer that does not go through a compressor
+    # pylint: disable=protected-access
+    with zf_dest._lock:
+        if zf_dest._seekable:
+            zf_dest.fp.seek(zf_dest.start_dir)
+        zinfo.header_offset = zf_dest.fp.tell()
+        zf_dest._writecheck(zinfo)
+        zf_dest._didModify = True
+        zf_dest.fp.write(zinfo.FileHeader(zip64))
+        for chunk in chunks:
+            zf_dest.fp.write(chunk)
+        zf_dest.filelist.append(zinfo)
+        zf_dest.NameToInfo[zinfo.filename] = zinfo
+        zf_dest.start_dir = zf_dest.fp.tell()
+
+
+def deflate_data(data: bytes, compresslevel: Optional[int] = None) -> bytes:
+    """Raw deflate stream of data, byte for byte what ZipFile.writestr stores for a ZIP_DEFLATED member"""
+    level = zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def write_encoded_member(zf_dest: ZipFile, name: str, data: bytes, compress_type: int, payload: bytes) -> None:
+    """Equivalent of zf_dest.writestr(name, data, compress_type) for data already encoded into payload"""
+    zinfo = ZipInfo(name, date_time=time.localtime(time.time())[:6])
+    zinfo.compress_type = compress_type
+    zinfo.external_attr = 0o600 << 16
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(payload)
+    zinfo.CRC = zlib.crc32(data)
+    _write_raw_member(zf_dest, zinfo, (payload,))
+
+
+class StoragePolicy:
+    """How members are written into a zip, by extension
+
+    methods maps a lower case extension to a (compress_type, compresslevel) pair, ZIP_STORED or ZIP_DEFLATED, any
+    other extension uses default. Formats that are compressed already are stored by default, deflating them costs
+    CPU on every rewrite and on every load for a percent or two. Data the policy would deflate is stored anyway when
+    deflating gains less than min_gain of its size.
+    """
+
+    PRECOMPRESSED = (
+        Ext.JPG,
+        Ext.ALT_JPG,
+        Ext.PNG,
+        Ext.ASSETBUNDLE,
+        Ext.ZIP,
+        Ext.VAR,
+        ".mp3",
+        ".ogg",
+        ".mp4",
+        ".webm",
+    )
+
+    def __init__(
+        self,
+        methods: Optional[dict[str, tuple[int, Optional[int]]]] = None,
+        default: tuple[int, Optional[int]] = (ZIP_DEFLATED, None),
+        min_gain: float = 0.05,
+    ):
+        self.methods = {ext: (ZIP_STORED, None) for ext in self.PRECOMPRESSED}
+        self.methods.update(methods or {})
+        self.default = default
+        self.min_gain = min_gain
+
+    @classmethod
+    def from_config(cls, methods: dict[str, Union[str, int]], min_gain: float) -> "StoragePolicy":
+        """methods maps an extension to "stored", "deflated" or a deflate level"""
+        parsed = {}
+        for ext, method in methods.items():
+            if method == "stored":
+                parsed[ext.lower()] = (ZIP_STORED, None)
+            elif method == "deflated":
+                parsed[ext.lower()] = (ZIP_DEFLATED, None)
+            else:
+                parsed[ext.lower()] = (ZIP_DEFLATED, int(method))
+        return cls(parsed, min_gain=min_gain)
+
+    def method(self, name: str) -> tuple[int, Optional[int]]:
+        return self.methods.get(path.splitext(name)[1].lower(), self.default)
+
+    def gains(self, size: int, compress_size: int) -> bool:
+        return size - compress_size >= size * self.min_gain
+
+    def copy_method(self, item: ZipInfo) -> tuple[int, Optional[int]]:
+        """(compress_type, compresslevel) to copy a member with"""
+        compress_type, compresslevel = self.method(item.filename)
+        # A member deflated for next to nothing is stored, it only costs an inflate
+        if compress_type == item.compress_type == ZIP_DEFLATED and not self.gains(item.file_size, item.compress_size):
+            return ZIP_STORED, None
+        return compress_type, compresslevel
+
+    def copy(self, read_zf: ZipFile, zf_dest: ZipFile, item: ZipInfo) -> None:
+        copy_zip_member(read_zf, zf_dest, item, *self.copy_method(item))
+
+    def encode(self, name: str, data: bytes) -> tuple[int, bytes]:
+        """(compress_type, payload) of data written as member name"""
+        compress_type, compresslevel = self.method(name)
+        if compress_type == ZIP_DEFLATED:
+            deflated = deflate_data(data, compresslevel)
+            if self.gains(len(data), len(deflated)):
+                return ZIP_DEFLATED, deflated
+        return ZIP_STORED, data
+
+    def write(self, zf_dest: ZipFile, name: str, data: bytes) -> None:
+        write_encoded_member(zf_dest, name, data, *self.encode(name, data))
+
+    def write_file(self, zf_dest: ZipFile, file_path: str, name: str) -> None:
+        """Streams file_path into the member name, a streamed file is never measured against min_gain"""
+        zf_dest.write(file_path, name, *self.method(name))
+
+
+# Policy every var rewrite follows, see set_storage_policy
+_storage_policy = StoragePolicy()
+
+
+def set_storage_policy(policy: StoragePolicy) -> None:
+    """Policy members are written with when a var is rewritten, the default stores compressed formats"""
+    global _storage_policy  # pylint: disable=global-statement
+    _storage_policy = policy
+
+
+def get_storage_policy() -> StoragePolicy:
+    return _storage_policy
+
+
+# Threads a ZipMemberWriter deflates members on, see set_deflate_workers
+_DEFLATE_WORKERS = 1
+
+
+def set_deflate_workers(workers: int) -> None:
+    """Threads ZipMemberWriter re-encodes members on, 0 for one per core, 1 (the default) encodes them in turn"""
+    global _DEFLATE_WORKERS  # pylint: disable=global-statement
+    _DEFLATE_WORKERS = workers
+
+
+def get_deflate_workers() -> int:
+    return _DEFLATE_WORKERS
+
+
+def _member_info(item: ZipInfo, data: bytes, compress_type: int, payload: bytes) -> ZipInfo:
+    zinfo = ZipInfo(item.filename, item.date_time)
+    zinfo.compress_type = compress_type
+    zinfo.external_attr = item.external_attr
+    zinfo.file_size = len(data)
+    zinfo.compress_size = len(payload)
+    zinfo.CRC = zlib.crc32(data)
+    return zinfo
+
+
+class ZipMemberWriter:
+    """Writes members into zf_dest in the order they are given, re-encoding them on a thread pool
+
+    Members that are deflated (or inflated) anew are read and encoded by worker threads, zlib lets go of the GIL
+    while it works, and written once every earlier member is out. Raw copies and members that have to be streamed
+    (files on disk, members past the memory budget) are written by the calling thread in turn. Headers and the
+    central directory are left to zf_dest as for any other member, so the zip is the one zipfile would write. With
+    one worker every member is encoded and written as it is given, the output is the same either way.
+    """
+
+    def __init__(self, zf_dest: ZipFile, workers: Optional[int] = None, policy: Optional["StoragePolicy"] = None):
+        self.zf_dest = zf_dest
+        self.policy = policy or get_storage_policy()
+        workers = get_deflate_workers() if workers is None else workers
+        self.workers = workers if workers > 0 else os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self._semaphore = MemorySemaphore(get_memory_budget())
+        self._pending: deque[tuple[Future, int, Optional[IO[bytes]]]] = deque()
+
+    def __enter__(self) -> "ZipMemberWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            for _, _, handle in self._pending:
+                if handle is not None:
+                    handle.close()
+
+    def write(self, name: str, data: bytes) -> None:
+        """Write data as member name, encoded under the policy"""
+        self._submit(self._encode_data, name, data, cost=len(data))
+
+    def write_encoded(self, name: str, data: bytes, compress_type: int, payload: bytes) -> None:
+        self._defer(functools.partial(write_encoded_member, self.zf_dest, name, data, compress_type, payload))
+
+    def copy(self, read_zf: ZipFile, item: ZipInfo) -> None:
+        """Copy a member from read_zf under the policy, see StoragePolicy.copy"""
+        compress_type, compresslevel = self.policy.copy_method(item)
+        if compress_type == item.compress_type or item.is_dir():
+            self._defer(functools.partial(_copy_raw_member, read_zf, self.zf_dest, item))
+        elif not fits_memory_budget(item):
+            self._defer(functools.partial(_stream_member, read_zf, self.zf_dest, item, compress_type, compresslevel))
+        else:
+            # Members are opened and closed on this thread, ZipFile counts its open handles without a lock
+            read_item = read_zf.open(item)
+            self._submit(
+                self._encode_member,
+                read_item,
+                item,
+                compress_type,
+                compresslevel,
+                cost=2 * item.file_size,
+                handle=read_item,
+            )
+
+    def write_file(self, file_path: str, name: str) -> None:
+        self._defer(functools.partial(self.policy.write_file, self.zf_dest, file_path, name))
+
+    def close(self) -> None:
+        """Write out every member still pending"""
+        try:
+            self._drain(0)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+
+    def _encode_data(self, name: str, data: bytes) -> Callable[[], None]:
+        compress_type, payload = self.policy.encode(name, data)
+        return functools.partial(write_encoded_member, self.zf_dest, name, data, compress_type, payload)
+
+    def _encode_member(
+        self, read_item: IO[bytes], item: ZipInfo, compress_type: int, compresslevel: Optional[int]
+    ) -> Callable[[], None]:
+        # The member checks its crc, reads from several threads share the file under the lock of the ZipFile
+        data = read_item.read()
+        payload = deflate_data(data, compresslevel) if compress_type == ZIP_DEFLATED else data
+        return functools.partial(
+            _write_raw_member, self.zf_dest, _member_info(item, data, compress_type, payload), (payload,)
+        )
+
+    def _submit(
+        self, job: Callable[..., Callable[[], None]], *args, cost: int, handle: Optional[IO[bytes]] = None
+    ) -> None:
+        if self._executor is None:
+            try:
+                job(*args)()
+            finally:
+                if handle is not None:
+                    handle.close()
+            return
+        # Memory is only given back once a member is written, write out earlier members until the cost fits
+        while len(self._pending) > 0 and self._semaphore.available < min(cost, self._semaphore.capacity):
+            self._write_next()
+        cost = self._semaphore.acquire(cost)
+        self._pending.append((self._executor.submit(job, *args), cost, handle))
+        self._drain(2 * self.workers)
+
+    def _defer(self, write: Callable[[], None]) -> None:
+        if self._executor is None:
+            write()
+            return
+        done = Future()
+        done.set_result(write)
+        self._pending.append((done, 0, None))
+        self._drain(2 * self.workers)
+
+    def _drain(self, limit: int) -> None:
+        # Members are written in order, keep a bounded number in flight
+        while len(self._pending) > limit or (len(self._pending) > 0 and self._pending[0][0].done()):
+            self._write_next()
+
+    def _write_next(self) -> None:
+        result, cost, handle = self._pending.popleft()
+        try:
+            result.result()()
+        finally:
+            self._semaphore.release(cost)
+            if handle is not None:
+                handle.close()
+
+
+def zip_archive_size(entry_sizes: Iterable[int], comment: bytes = b"") -> int:
+    """Size of a zip holding members of the given zip_entry_size, without zip64 records"""
+    return sum(entry_sizes) + _EOCD.size + len(comment)
+
+
+def zip_entry_size(name: str, compress_size: int, extra: bytes = b"", comment: bytes = b"") -> int:
+    """Bytes a member takes in a zip, its local header, data and central directory entry (zip64 aside)"""
+    name_length = len(name.encode("UTF-8"))
+    return _LOCAL_HEADER.size + _CENTRAL_HEADER.size + 2 * (name_length + len(extra)) + len(comment) + compress_size
+
+
+class ZipCentralDirectory:
+    """Lightweight reader that only parses the central directory of a zip
+
+    The file is memory mapped and the central directory is read into flat arrays, no ZipInfo objects are built.
+    Stored and deflated members can be read directly, anything else (encryption, bzip2, lzma...) raises
+    NotImplementedError so the caller can fall back to ZipRead. Structural problems raise BadZipFile.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.names: list[str] = []
+        self.sizes = array("Q")
+        self.compressed_sizes = array("Q")
+        self.crcs = array("L")
+        self.offsets = array("Q")
+        self.methods = array("H")
+        self.flags = array("H")
+        self._file = None
+        self._map = None
+        self._index = None
+
+    def __enter__(self) -> "ZipCentralDirectory":
+        # pylint: disable=consider-using-with
+        self._file = open(self.file_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse()
+        except (ValueError, OSError, struct.error) as err:
+            self.close()
+            raise BadZipFile(f"Cannot read central directory of {self.file_path} >> {err}") from err
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _find_end_of_central_directory(self) -> tuple[int, int]:
+        """Returns the (offset, entry count) of the central directory"""
+        data = self._map
+        # The EOCD record is at most 22 bytes plus a 64k comment from the end of the file
+        eocd_offset = data.rfind(_EOCD_SIGNATURE, max(0, len(data) - _EOCD.size - 0xFFFF))
+        if eocd_offset < 0:
+            raise BadZipFile(f"File is not a zip file {self.file_path}")
+        _, _, _, _, entries, _, cd_offset, _ = _EOCD.unpack_from(data, eocd_offset)
+
+        locator_offset = eocd_offset - _ZIP64_LOCATOR.size
+        if locator_offset >= 0 and data[locator_offset : locator_offset + 4] == _ZIP64_LOCATOR_SIGNATURE:
+            _, _, zip64_offset, _ = _ZIP64_LOCATOR.unpack_from(data, locator_offset)
+            zip64_eocd = _ZIP64_EOCD.unpack_from(data, zip64_offset)
+            if zip64_eocd[0] != _ZIP64_EOCD_SIGNATURE:
+                raise BadZipFile(f"Corrupt zip64 end of central directory {self.file_path}")
+            entries, cd_offset = zip64_eocd[7], zip64_eocd[9]
+        return cd_offset, entries
+
+    def _parse(self):
+        data = self._map
+        offset, entries = self._find_end_of_central_directory()
+        raw_names = []
+        for _ in range(entries):
+            header = _CENTRAL_HEADER.unpack_from(data, offset)
+            if header[0] != _CENTRAL_HEADER_SIGNATURE:
+                raise BadZipFile(f"Bad central directory entry in {self.file_path}")
+            flags, method, crc = header[3], header[4], header[7]
+            compressed_size, size = header[8], header[9]
+            name_length, extra_length, comment_length = header[10], header[11], header[12]
+            local_offset = header[16]
+
+            name_start = offset + _CENTRAL_HEADER.size
+            extra_start = name_start + name_length
+            if 0xFFFFFFFF in (size, compressed_size, local_offset):
+                size, compressed_size, local_offset = self._zip64_extra(
+                    data[extra_start : extra_start + extra_length], size, compressed_size, local_offset
+                )
+
+            raw_names.append((data[name_start:extra_start], flags))
+            self.sizes.append(size)
+            self.compressed_sizes.append(compressed_size)
+            self.crcs.append(crc)
+            self.offsets.append(local_offset)
+            self.methods.append(method)
+            self.flags.append(flags)
+            offset = extra_start + extra_length + comment_length
+
+        # Same fallback as ZipObj.read, names without the utf-8 flag are decoded as latin1 if utf-8 fails
+        try:
+            self.names = [raw.decode("UTF-8") for raw, _ in raw_names]
+        except UnicodeDecodeError:
+            self.names = [raw.decode("UTF-8" if flags & _FLAG_UTF8 else "latin1") for raw, flags in raw_names]
+
+    @staticmethod
+    def _zip64_extra(extra: bytes, size: int, compressed_size: int, local_offset: int) -> tuple[int, int, int]:
+        position = 0
+        while position + 4 <= len(extra):
+            header_id, length = struct.unpack_from("<2H", extra, position)
+            if header_id == _ZIP64_EXTRA_ID:
+                values = iter(struct.unpack_from(f"<{length // 8}Q", extra, position + 4))
+                # Only the fields that overflowed are present, in this order
+                if size == 0xFFFFFFFF:
+                    size = next(values)
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = next(values)
+                if local_offset == 0xFFFFFFFF:
+                    local_offset = next(values)
+                break
+            position += 4 + length
+        return size, compressed_size, local_offset
+
+    def infolist(self) -> list[tuple[str, int]]:
+        return list(zip(self.names, self.sizes))
+
+    def namelist(self) -> list[str]:
+        return self.names
+
+    def read(self, name: str) -> bytes:
+        if self._index is None:
+            self._index = {member: position for position, member in enumerate(self.names)}
+        try:
+            position = self._index[name]
+        except KeyError as err:
+            raise KeyError(f"There is no item named {name!r} in the archive") from err
+
+        method = self.methods[position]
+        if self.flags[position] & _FLAG_ENCRYPTED or method not in (ZIP_STORED, ZIP_DEFLATED):
+            raise NotImplementedError(f"Unsupported member {name} in {self.file_path}")
+
+        data = self._map
+        local_offset = self.offsets[position]
+        header = _LOCAL_HEADER.unpack_from(data, local_offset)
+        if header[0] != _LOCAL_HEADER_SIGNATURE:
+            raise BadZipFile(f"Bad local header for {name} in {self.file_path}")
+        start = local_offset + _LOCAL_HEADER.size + header[9] + header[10]
+        raw = data[start : start + self.compressed_sizes[position]]
+
+        try:
+            content = zlib.decompress(raw, -zlib.MAX_WBITS) if method == ZIP_DEFLATED else raw
+        except zlib.error as err:
+            raise BadZipFile(f"Cannot inflate {name} in {self.file_path} >> {err}") from err
+        if zlib.crc32(content) != self.crcs[position] or len(content) != self.sizes[position]:
+            raise BadZipFile(f"Bad CRC-32 for file {name!r}")
+        return content
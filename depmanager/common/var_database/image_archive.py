@@ -0,0 +1,187 @@
+import hashlib
+import os
+from os import path
+from typing import Iterable
+
+from orjson import orjson
+
+IMAGE_ARCHIVE_PACK = "image_lib.pack"
+IMAGE_ARCHIVE_INDEX = "image_lib.jsonl"
+
+
+class ImageArchive:
+    """Append only store of the image_lib thumbnails, next to the database it belongs to
+
+    Thumbnails are appended to a pack file and described by json lines in an index, keyed by var_id. A later line
+    for the same var_id wins and a line without a sha1 removes it. The pack is content addressed, a thumbnail that
+    only moved to another directory appends an index line and no data. Dead bytes and lines are dropped by
+    compact() once they make up more than COMPACT_RATIO of the pack or index. Bump VERSION whenever the layout of
+    the lines changes, every older line is then ignored.
+    """
+
+    VERSION = 1
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, directory: str):
+        self.pack_path = path.join(directory, IMAGE_ARCHIVE_PACK)
+        self.index_path = path.join(directory, IMAGE_ARCHIVE_INDEX)
+        self.entries: dict[str, dict] = {}
+        self.blobs: dict[str, int] = {}
+        self.index_lines = 0
+        self.load()
+
+    @property
+    def exists(self) -> bool:
+        return path.exists(self.index_path)
+
+    @property
+    def pack_size(self) -> int:
+        return os.stat(self.pack_path).st_size if path.exists(self.pack_path) else 0
+
+    @property
+    def live_size(self) -> int:
+        return sum({entry["sha1"]: entry["size"] for entry in self.entries.values()}.values())
+
+    def load(self) -> None:
+        if not path.exists(self.index_path):
+            return
+        pack_size = self.pack_size
+        with open(self.index_path, "rb") as read_file:
+            for line in read_file.read().splitlines():
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # A line cut short by an interrupted save
+                    continue
+                if entry.get("version") != self.VERSION:
+                    continue
+                self.index_lines += 1
+                if "sha1" not in entry:
+                    self.entries.pop(entry["var_id"], None)
+                elif entry["offset"] + entry["size"] <= pack_size:
+                    self.entries[entry["var_id"]] = entry
+                    self.blobs[entry["sha1"]] = entry["offset"]
+
+    @property
+    def paths(self) -> dict[str, str]:
+        """var_id to the path of its thumbnail, relative to the image_lib"""
+        return {var_id: entry["path"].replace("/", os.sep) for var_id, entry in self.entries.items()}
+
+    def extract_missing(self, local_dir: str, present: Iterable[str]) -> list[str]:
+        """Write out the thumbnail of every var_id not in present, returns the files written"""
+        present = set(present)
+        missing = sorted(
+            (entry for var_id, entry in self.entries.items() if var_id not in present), key=lambda e: e["offset"]
+        )
+        extracted = []
+        if len(missing) == 0:
+            return extracted
+        # Thumbnails with the same content and dates were hard links, they are linked again
+        written: dict[tuple[str, int], str] = {}
+        with open(self.pack_path, "rb") as read_file:
+            for entry in missing:
+                file_path = path.join(local_dir, *entry["path"].split("/"))
+                os.makedirs(path.dirname(file_path), exist_ok=True)
+                linked_file = written.get((entry["sha1"], entry["mtime"]))
+                if linked_file is not None:
+                    try:
+                        os.link(linked_file, file_path)
+                        extracted.append(file_path)
+                        continue
+                    except OSError:
+                        pass
+                read_file.seek(entry["offset"])
+                data = read_file.read(entry["size"])
+                # Left to be generated again, a compaction may have been cut short
+                if hashlib.sha1(data).hexdigest() != entry["sha1"]:
+                    continue
+                with open(file_path, "wb") as write_file:
+                    write_file.write(data)
+                os.utime(file_path, ns=(entry["mtime"], entry["mtime"]))
+                written[(entry["sha1"], entry["mtime"])] = file_path
+                extracted.append(file_path)
+        return extracted
+
+    def sync(self, local_dir: str, image_files: Iterable[str]) -> int:
+        """Bring the archive in line with the thumbnails under local_dir, returns the number of lines appended"""
+        image_files = list(image_files)
+        present = {path.splitext(path.basename(file_path))[0] for file_path in image_files}
+        return self.update(local_dir, image_files, [var_id for var_id in self.entries if var_id not in present])
+
+    def update(self, local_dir: str, image_files: Iterable[str], removed: Iterable[str]) -> int:
+        """Add or move the given thumbnails and drop the removed var_ids, returns the number of lines appended
+
+        A thumbnail whose size and modification time match its entry is not read again.
+        """
+        lines = []
+        with open(self.pack_path, "ab") as pack_file:
+            offset = pack_file.seek(0, os.SEEK_END)
+            for file_path in image_files:
+                var_id = path.splitext(path.basename(file_path))[0]
+                relative = path.relpath(file_path, local_dir).replace(os.sep, "/")
+                stat = os.stat(file_path)
+                entry = self.entries.get(var_id)
+                if entry is not None and (entry["size"], entry["mtime"]) == (stat.st_size, stat.st_mtime_ns):
+                    if entry["path"] == relative:
+                        continue
+                    sha1 = entry["sha1"]
+                else:
+                    with open(file_path, "rb") as read_file:
+                        data = read_file.read()
+                    sha1 = hashlib.sha1(data).hexdigest()
+                    if sha1 not in self.blobs:
+                        pack_file.write(data)
+                        self.blobs[sha1] = offset
+                        offset += len(data)
+                entry = {
+                    "version": self.VERSION,
+                    "var_id": var_id,
+                    "path": relative,
+                    "sha1": sha1,
+                    "offset": self.blobs[sha1],
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                }
+                self.entries[var_id] = entry
+                lines.append(orjson.dumps(entry))
+            for var_id in removed:
+                if self.entries.pop(var_id, None) is None:
+                    continue
+                lines.append(orjson.dumps({"version": self.VERSION, "var_id": var_id}))
+
+        # The data is on disk before any line points at it
+        if len(lines) > 0:
+            with open(self.index_path, "ab") as index_file:
+                index_file.write(b"\n".join(lines) + b"\n")
+            self.index_lines += len(lines)
+        return len(lines)
+
+    @property
+    def needs_compaction(self) -> bool:
+        pack_size = self.pack_size
+        dead_lines = self.index_lines - len(self.entries)
+        return pack_size - self.live_size > pack_size * self.COMPACT_RATIO or (
+            dead_lines > self.index_lines * self.COMPACT_RATIO
+        )
+
+    def compact(self) -> None:
+        """Rewrite the pack and index with the live thumbnails only"""
+        temp_pack = f"{self.pack_path}.compact"
+        temp_index = f"{self.index_path}.compact"
+        blobs = {}
+        lines = []
+        with open(self.pack_path, "rb") as read_file, open(temp_pack, "wb") as pack_file:
+            for entry in sorted(self.entries.values(), key=lambda e: e["offset"]):
+                if entry["sha1"] not in blobs:
+                    read_file.seek(entry["offset"])
+                    blobs[entry["sha1"]] = pack_file.tell()
+                    pack_file.write(read_file.read(entry["size"]))
+                entry["offset"] = blobs[entry["sha1"]]
+                lines.append(orjson.dumps(entry))
+        with open(temp_index, "wb") as index_file:
+            index_file.write(b"".join(line + b"\n" for line in lines))
+
+        os.replace(temp_pack, self.pack_path)
+        os.replace(temp_index, self.index_path)
+        self.blobs = blobs
+        self.index_lines = len(lines)
@@ -0,0 +1,104 @@
+import os
+from os import path
+from typing import Optional
+
+from depmanager.common.enums.ext import Ext
+
+
+class ImageCatalogue:
+    """The thumbnails of the local image_lib, as var_id to the sub directory holding it
+
+    The directory is walked once, when the catalogue is first used, and kept up to date by the image_lib
+    operations after that. changed and removed are the var_ids touched since the image database was last saved,
+    vacated the directories a thumbnail left, so saving and pruning only look at what changed. rescan() picks up
+    changes made outside of the catalogue, a user reorganizing the image_lib by hand.
+    """
+
+    def __init__(self, local_path: str):
+        self.local_path = local_path
+        self.images = self._walk()
+        self.changed: set[str] = set()
+        self.removed: set[str] = set()
+        self.vacated: set[str] = set()
+
+    def __contains__(self, var_id: str) -> bool:
+        return var_id in self.images
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def _walk(self) -> dict[str, str]:
+        images = {}
+        for dir_path, _, files in os.walk(self.local_path):
+            sub_directory = path.relpath(dir_path, self.local_path)
+            for file in files:
+                if len(file) > 4 and file[-4:] == Ext.JPG:
+                    images[file[:-4]] = Ext.EMPTY if sub_directory == "." else sub_directory
+        return images
+
+    def rescan(self) -> None:
+        images = self._walk()
+        self.changed.update(
+            var_id for var_id, sub_directory in images.items() if self.images.get(var_id) != sub_directory
+        )
+        self.removed.update(var_id for var_id in self.images if var_id not in images)
+        self.removed.difference_update(images)
+        self.vacated.update(
+            sub_directory for var_id, sub_directory in self.images.items() if images.get(var_id) != sub_directory
+        )
+        self.images = images
+
+    def image_path(self, var_id: str, sub_directory: Optional[str] = None) -> str:
+        sub_directory = self.images[var_id] if sub_directory is None else sub_directory
+        return path.join(self.local_path, sub_directory, f"{var_id}{Ext.JPG}")
+
+    def relative_path(self, var_id: str) -> str:
+        return path.join(self.images[var_id], f"{var_id}{Ext.JPG}")
+
+    @property
+    def files(self) -> list[str]:
+        return [self.image_path(var_id) for var_id in self.images]
+
+    @property
+    def relative_files(self) -> set[str]:
+        return {self.relative_path(var_id) for var_id in self.images}
+
+    def add(self, var_id: str, sub_directory: str, changed: bool = True) -> None:
+        """A thumbnail written to sub_directory, changed is False if it came out of the image database as it is"""
+        if var_id in self.images and self.images[var_id] != sub_directory:
+            self.vacated.add(self.images[var_id])
+        self.images[var_id] = sub_directory
+        self.removed.discard(var_id)
+        if changed:
+            self.changed.add(var_id)
+
+    def add_file(self, file_path: str, changed: bool = True) -> None:
+        sub_directory = path.relpath(path.dirname(file_path), self.local_path)
+        self.add(path.basename(file_path)[:-4], Ext.EMPTY if sub_directory == "." else sub_directory, changed)
+
+    def remove(self, var_id: str) -> None:
+        self.vacated.add(self.images.pop(var_id))
+        self.changed.discard(var_id)
+        self.removed.add(var_id)
+
+    def saved(self) -> None:
+        self.changed.clear()
+        self.removed.clear()
+
+    def prune_vacated(self) -> None:
+        """Remove the directories thumbnails left, and their parents, once they are empty"""
+        for sub_directory in sorted(self.vacated, key=len, reverse=True):
+            dir_path = path.join(self.local_path, sub_directory)
+            while path.normpath(dir_path) != path.normpath(self.local_path) and path.isdir(dir_path):
+                if len(os.listdir(dir_path)) > 0:
+                    break
+                os.rmdir(dir_path)
+                dir_path = path.dirname(dir_path)
+        self.vacated.clear()
+
+    def reconcile(self, archived: dict[str, str]) -> None:
+        """Mark what differs from the var_id to relative path of the image database as changed or removed"""
+        for var_id in self.images:
+            if archived.get(var_id) != self.relative_path(var_id):
+                self.changed.add(var_id)
+        self.removed.update(var_id for var_id in archived if var_id not in self.images)
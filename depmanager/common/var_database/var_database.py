@@ -1,11 +1,12 @@
-import io
-import json
+import functools
+import multiprocessing
 import os
 from collections import defaultdict
-from json import JSONDecodeError
 from os import path
 from typing import Any
 from typing import Dict
+from typing import Iterator
+from typing import Optional
 from typing import Set
 from typing import Tuple
 
@@ -16,17 +17,65 @@ from depmanager.common.enums.ext import Ext
 from depmanager.common.enums.paths import TEMP_SYNC_DIR
 from depmanager.common.enums.variables import BACKWARDS_COMPAT_PLUGIN_AUTHORS
 from depmanager.common.enums.variables import MEGABYTE
-from depmanager.common.enums.variables import TEMP_VAR_NAME
-from depmanager.common.parser.parser import VarParser
 from depmanager.common.shared.cached_property import cached_property
+from depmanager.common.shared.dependency_graph import DependencyGraph
+from depmanager.common.shared.fuzzy_index import FuzzyFileIndex
 from depmanager.common.shared.progress_bar import ProgressBar
 from depmanager.common.shared.tools import are_substrings_in_str
-from depmanager.common.shared.tools import find_fuzzy_file_match
+from depmanager.common.shared.tools import paused_gc
 from depmanager.common.shared.tools import select_fuzzy_match
-from depmanager.common.shared.ziptools import ZipReadInto
+from depmanager.common.shared.ziptools import get_memory_budget
+from depmanager.common.shared.ziptools import get_storage_policy
+from depmanager.common.shared.ziptools import set_deflate_workers
+from depmanager.common.shared.ziptools import set_memory_budget
+from depmanager.common.shared.ziptools import set_storage_policy
 from depmanager.common.var_database.var_database_image_db import VarDatabaseImageDB
+from depmanager.common.var_database.var_transform import VarTransform
+from depmanager.common.var_object.compression_cache import CompressionCache
+from depmanager.common.var_object.compression_cache import get_compression_cache
+from depmanager.common.var_object.compression_cache import set_compression_cache
 from depmanager.common.var_object.var_object import VarObject
 
+# Database of a find_broken_vars or transform_vars worker, rebuilt from the records of the parent once per worker
+_WORKER_DB: Optional["VarDatabase"] = None
+BROKEN_SCAN_CHUNK_SIZE = 64
+
+
+def worker_settings() -> dict[str, Any]:
+    """The zip and compression settings of this process, a spawned worker starts from the defaults"""
+    cache = get_compression_cache()
+    return {
+        "memory_budget": get_memory_budget(),
+        "storage_policy": get_storage_policy(),
+        "compression_cache": cache.file_path if cache is not None else None,
+    }
+
+
+def init_worker_database(root_path: str, quick_scan: bool, records: list[dict], settings: dict[str, Any]) -> None:
+    """Pool initializer, workers only receive plain records so this works with every start method"""
+    global _WORKER_DB  # pylint: disable=global-statement
+    _WORKER_DB = VarDatabase(root=root_path, quick_scan=quick_scan, workers=1, records=records)
+    set_memory_budget(settings["memory_budget"])
+    set_storage_policy(settings["storage_policy"])
+    if settings["compression_cache"] is not None:
+        set_compression_cache(CompressionCache(settings["compression_cache"]))
+    # Vars already run side by side, the images and members of each are encoded serially
+    set_deflate_workers(1)
+
+
+def find_broken_chunk(health_check: bool, var_ids: list[str]) -> list[tuple[str, dict]]:
+    return [
+        (var_id, _WORKER_DB.find_var_replacement_mappings(_WORKER_DB[var_id], health_check=health_check)[0])
+        for var_id in var_ids
+    ]
+
+
+def transform_var_job(options: dict[str, bool], job: tuple[str, dict]) -> tuple[str, bool, float]:
+    root_path, record = job
+    var_ref = VarObject.from_dict(data=record, root_path=root_path)
+    transform = VarTransform(_WORKER_DB, var_ref)
+    return var_ref.var_id, transform.run(**options), transform.saved_mb
+
 
 class VarDatabase(VarDatabaseImageDB):
     @property
@@ -34,7 +83,10 @@ class VarDatabase(VarDatabaseImageDB):
         return [
             "vars_required",
             "required_dependencies",
+            "dependency_graph",
             "repair_index",
+            "repair_path_index",
+            "repair_basename_index",
         ] + super()._attributes
 
     @cached_property
@@ -48,61 +100,73 @@ class VarDatabase(VarDatabaseImageDB):
                         required[var_name].append(var.var_id)
         return required
 
+    def _dependency_names(self, var_id: str) -> set[str]:
+        # Quick scan databases do not scan every file to build a complete used_dependencies entity
+        # The listed dependencies may or may not be accurate, but without a full scan this cannot
+        # be determined, so we should assume what is listed is the minimum we need
+        if self.quick_scan:
+            return set(self[var_id].dependencies)
+        return set(self[var_id].used_dependencies)
+
+    @cached_property
+    def dependency_graph(self) -> DependencyGraph:
+        """Graph of the used dependencies that resolve to a known var, .latest references included
+
+        Every var is labelled with its used dependencies, collecting them over the graph gives its required ones.
+        """
+        edges = {}
+        labels = {}
+        # The same dependencies are used by many vars, each name is only resolved once
+        resolved = {}
+        with paused_gc():
+            for var_id, var in self.vars.items():
+                dependencies = var.used_dependencies
+                labels[var_id] = dependencies
+                targets = []
+                for dependency in dependencies:
+                    if dependency not in resolved:
+                        resolved[dependency] = dependency if dependency in self.vars else self.get_var_name(dependency)
+                    # If the dep_id is none, the var is obviously broken, but we should not crash during this check.
+                    # This can be detected and fixed with other methods later on.
+                    if resolved[dependency] is not None:
+                        targets.append(resolved[dependency])
+                edges[var_id] = targets
+            return DependencyGraph(edges, labels)
+
+    def get_required_dependencies(self, var_id: str) -> frozenset[str]:
+        """Every dependency name that would ever be touched by var_id
+
+        With a full scan this is the chain of used dependencies, determined on the fly based on the current
+        states of all stored numbered and latest entities known to the database.
+        """
+        if var_id not in self.vars:
+            return frozenset()
+        if self.quick_scan:
+            return frozenset(self._dependency_names(var_id))
+        return self.dependency_graph.collect(var_id)
+
     @cached_property
-    def required_dependencies(self) -> defaultdict[str, set]:
+    def required_dependencies(self) -> defaultdict[str, frozenset]:
         """Logic to retrieve all required dependencies"""
-        required = defaultdict(set)
-        # progress = ProgressBar(len(self.vars), description="Building dependency map")
-        # Using .items negates the cached_property benefits
+        required = defaultdict(frozenset)
         # pylint: disable=consider-using-dict-items
         for var_id in self.vars:
-            # progress.inc()
-
-            # Quick scan databases do not scan every file to build a complete used_dependencies entity
-            # The listed dependencies may or may not be accurate, but without a full scan this cannot
-            # be determined, so we should assume what is listed is the minimum we need
-            if self.quick_scan:
-                required[var_id] = set(self[var_id].dependencies)
-            # If we have a full scan, then we can determine the chain of any dependencies that would ever be
-            # touched by a var. This is determined on the fly based on the current states of all stored
-            # numbered and latest entities known to the database.
-            else:
-                dependencies = set(self[var_id].used_dependencies)
-
-                # Need to collect all the associated dependencies
-                while True:
-                    additional_dependencies = set()
-                    for dependency in dependencies:
-                        dep_id = self.get_var_name(dependency)
-                        # If the dep_id is none, the var is obviously broken, but we should not
-                        # crash during this check. This can be detected and fixed with other methods
-                        # later on.
-                        if dep_id is None:
-                            continue
-                        additional_dependencies.update(self[dep_id].used_dependencies)
-                    new_dependencies = additional_dependencies - dependencies
-                    if len(new_dependencies) == 0:
-                        break
-                    dependencies.update(new_dependencies)
-
-                # If an exact version is needed, we only need the exact reference, it will double as latest
-                # duplicates = set()
-                # for dependency in dependencies:
-                #     if ".latest" not in dependency:
-                #         if self.get_var_name_as_latest(dependency) in dependencies:
-                #             duplicates.add(self.get_var_name_as_latest(dependency))
-
-                required[var_id] = dependencies
-
+            required[var_id] = self.get_required_dependencies(var_id)
         return required
 
+    def find_dependency_cycles(self) -> list[list[str]]:
+        if self.quick_scan:
+            return []
+        return self.dependency_graph.cycles()
+
     @property
     def unique_required_dependencies(self) -> set[str]:
+        """Every var and every name a var depends on, the same set as the union of required_dependencies"""
         unique_dependencies = set()
-        for var_id, var_required_dependencies in self.required_dependencies.items():
+        # pylint: disable=consider-using-dict-items
+        for var_id in self.vars:
             unique_dependencies.add(var_id)
-            for dependency in var_required_dependencies:
-                unique_dependencies.add(dependency)
+            unique_dependencies.update(self._dependency_names(var_id))
         return unique_dependencies
 
     @property
@@ -125,31 +189,29 @@ class VarDatabase(VarDatabaseImageDB):
     @property
     def unique_referenced_dependencies(self) -> set[str]:
         unique_referenced = set()
-        for _, var_required_dependencies in self.required_dependencies.items():
-            for dependency in var_required_dependencies:
+        # pylint: disable=consider-using-dict-items
+        for var_id in self.vars:
+            for dependency in self._dependency_names(var_id):
                 var_name = dependency if ".latest" not in dependency else self.get_var_name(dependency)
                 if var_name is not None:
                     unique_referenced.add(var_name)
         return unique_referenced
 
-    @cached_property
+    @property
     # pylint: disable=consider-using-dict-items
-    def repair_index(self) -> list[tuple[str, str, str]]:
-        """Builds a repair index
+    def repair_order(self) -> list[str]:
+        """Sorts the var ids for the repair index
 
         We sort by the following:
             - ContentType.REFERENCE_PRIORITY (this is how likely the item is to be a base reference, not part of a scene)
             - Is the item used as a reference by other vars? If so it is preferred to an unused item
             - Name of the var (if the name is a well known resource maker, we append a . to bubble them to the top)
             - Version (we prioritize newer versions over old versions, so the sort version is 10000 - version)
-
-        After sorting we unpack all the items and quickly convert them to lowercase for searching later on.
         """
         max_top_refs = 50
         top_references = [x for x, _ in self.reference_author_uses][:max_top_refs]
 
-        indexes = []
-        for var_id in self.keys:
+        def sort_key(var_id):
             # Define the methods we will sort on
             priority_sort = self[var_id].var_type.reference_priority
             used_sort = 0 if var_id in self.vars_required.keys() else 1
@@ -159,18 +221,52 @@ class VarDatabase(VarDatabaseImageDB):
                 top_sort = max_top_refs + 1
             name_sort = self[var_id].duplicate_id
             version_sort = 10000 - self[var_id].version
+            return priority_sort, used_sort, top_sort, name_sort, version_sort
 
-            # Add the list of files along with the sort ordering
-            indexes.append((priority_sort, used_sort, top_sort, name_sort, version_sort, self[var_id].includes_as_list))
+        return sorted(self.keys, key=sort_key)
 
-        # Sort based on the initial keys
-        indexes.sort(key=lambda x: (x[0], x[1], x[2], x[3], x[4]))
+    @cached_property
+    def repair_index(self) -> list[tuple[str, str, str]]:
+        """Builds a repair index
+
+        The includes of every var are unpacked in repair_order, so the most preferable references come first.
+        """
+        return [item for var_id in self.repair_order for item in self[var_id].includes_as_list]
 
-        # Extract the includes only and convert to lower, drop the sort keys
-        return [(item[0], item[1], item[2]) for sublist in indexes for item in sublist[5]]
+    @property
+    def repair_ranks(self) -> dict[str, int]:
+        return {var_id: rank for rank, var_id in enumerate(self.repair_order)}
+
+    def save_storage(self, compact: bool = False, **options) -> None:
+        if self.storage.supports_queries and (compact or self.storage.needs_compaction()):
+            # Store the repair ordering so replacements can be looked up without building the repair index, saves
+            # of only the changed vars leave it to the next lookup
+            options["repair_ranks"] = self.repair_ranks
+        super().save_storage(compact=compact, **options)
 
-    def duplication_index(self):
-        return [item for item in self.repair_index if self.vars[item[0]].var_type.is_asset]
+    @cached_property
+    def repair_path_index(self) -> dict[str, list[tuple[str, str]]]:
+        """Every (var_id, path) of the repair index keyed on the lowercased path, each list in repair_order"""
+        index = {}
+        for var_id, file_path, _ in self.repair_index:
+            index.setdefault(file_path.lower(), []).append((var_id, file_path))
+        return index
+
+    @cached_property
+    def repair_basename_index(self) -> dict[str, list[tuple[str, str]]]:
+        """Every (var_id, path) of the repair index keyed on the lowercased basename, each list in repair_order"""
+        index = {}
+        for var_id, file_path, basename in self.repair_index:
+            index.setdefault(basename.lower(), []).append((var_id, file_path))
+        return index
+
+    def duplication_index(self) -> set[str]:
+        """Lowercased paths of every file included in an asset var"""
+        return set(
+            file_path
+            for file_path, matches in self.repair_path_index.items()
+            if any(self.vars[var_id].var_type.is_asset for var_id, _ in matches)
+        )
 
     def display_var_list(self, var_id_list, prefix, show_used_by=False) -> None:
         if len(var_id_list) > 0:
@@ -277,47 +373,12 @@ class VarDatabase(VarDatabaseImageDB):
             if self_packages is None:
                 continue
             for self_package in self_packages:
-                result = next((index for index in duplication_index if index[1].lower() == self_package), None)
-                if result is not None:
+                if self_package in duplication_index:
                     var_list.add(var_id)
         return var_list
 
     def repair_metadata(self, var_ref: VarObject):
-
-        print(f"CHECKING METADATA {var_ref.var_id}...")
-        var_obj = VarObject(var_ref.root_path, var_ref.file_path)
-        if not var_obj.incorrect_metadata:
-            return
-
-        failed = False
-
-        added = len(set(var_obj.used_dependencies_sorted).difference(var_obj.dependencies))
-        removed = len(set(var_obj.dependencies).difference(var_obj.used_dependencies_sorted))
-        action = f"Adding {added} dependencies. Removing {removed} dependencies."
-        print(f"OPTIMIZING {var_obj.var_id}... {action}")
-
-        meta_json_present = False
-        temp_file = path.join(var_obj.directory, TEMP_VAR_NAME)
-        with ZipReadInto(var_obj.file_path, temp_file) as (read_zf, zf_dest):
-            for item in read_zf.infolist():
-                if item.filename == "meta.json":
-                    with io.TextIOWrapper(read_zf.open(item, "r"), encoding="UTF-8") as read_item:
-                        meta_json_present = True
-                        metadata_dict = json.loads(read_item.read())
-                        meta_data = self.fix_metadata_dict(metadata_dict, var_obj)
-                        zf_dest.writestr(item.filename, meta_data)
-                else:
-                    zf_dest.writestr(item.filename, read_zf.read(item.filename))
-
-            if not meta_json_present:
-                meta_data = self.fix_metadata_dict({}, var_obj)
-                zf_dest.writestr("meta.json", meta_data)
-
-        if failed:
-            os.remove(temp_file)
-        else:
-            os.remove(var_obj.file_path)
-            os.rename(temp_file, var_obj.file_path)
+        VarTransform(self, var_ref).run(metadata=True)
 
     def fix_metadata_dict(self, metadata_dict: Dict[str, Any], var_obj: VarObject):
         # Create a meta.json shell if the meta.json was missing
@@ -358,14 +419,35 @@ class VarDatabase(VarDatabaseImageDB):
         var_list = set()
         progress = ProgressBar(len(self.keys), description="Searching broken vars")
         track = {}
-        for var_id in self.keys:
-            progress.inc()
-            replacement_mappings, _ = self.find_var_replacement_mappings(self[var_id], health_check=health_check)
-            if len(replacement_mappings) > 0:
-                var_list.add(var_id)
-                track.update(replacement_mappings)
+        for chunk in self._find_broken_chunks(health_check):
+            for var_id, replacement_mappings in chunk:
+                progress.inc()
+                if len(replacement_mappings) > 0:
+                    var_list.add(var_id)
+                    track.update(replacement_mappings)
         return var_list
 
+    def _find_broken_chunks(self, health_check: bool) -> Iterator[list[tuple[str, dict]]]:
+        """Replacement mappings of every var, scanned by a process pool unless workers is 1"""
+        var_ids = list(self.keys)
+        if self.workers == 1 or len(var_ids) <= BROKEN_SCAN_CHUNK_SIZE:
+            for var_id in var_ids:
+                yield [(var_id, self.find_var_replacement_mappings(self[var_id], health_check=health_check)[0])]
+            return
+
+        chunks = [var_ids[i : i + BROKEN_SCAN_CHUNK_SIZE] for i in range(0, len(var_ids), BROKEN_SCAN_CHUNK_SIZE)]
+        with self._worker_pool() as m_pool:
+            yield from m_pool.imap_unordered(functools.partial(find_broken_chunk, health_check), chunks)
+
+    def _worker_pool(self):
+        """Process pool whose workers each hold a copy of this database, see init_worker_database"""
+        records = [var.to_dict() for var in self.vars.values()]
+        return multiprocessing.Pool(
+            self.workers if self.workers > 0 else None,
+            initializer=init_worker_database,
+            initargs=(self.rootpath, self.quick_scan, records, worker_settings()),
+        )
+
     def find_oversize_vars(self):
         var_list = set()
         progress = ProgressBar(len(self.keys), description="Searching oversize vars")
@@ -386,13 +468,16 @@ class VarDatabase(VarDatabaseImageDB):
 
     def find_replacement_from_repair_index(self, filepath: str, approx_packages=None, approx_types=None):
         """Find the best occurrences from self.repair_index. The repair index is sorted
-        such that the most preferable references will be hit first by next
+        such that the most preferable references come first in every lookup list
         """
+        # The stored index is only valid while there are no unsaved changes
+        if self.storage.supports_queries and not self._files_added_or_removed and self.storage.exists():
+            return self._find_replacement_from_storage(filepath, approx_packages, approx_types)
+
         # Attempt to return the first (best) exact match
-        search_val = filepath.lower()
-        result = next((index for index in self.repair_index if index[1].lower() == search_val), None)
-        if result is not None:
-            return result[0], result[1]
+        exact_matches = self.repair_path_index.get(filepath.lower())
+        if exact_matches is not None:
+            return exact_matches[0]
 
         # If exact only mode, don't attempt to fuzzy match
         if approx_packages is None and approx_types is None:
@@ -400,16 +485,40 @@ class VarDatabase(VarDatabaseImageDB):
 
         # Attempt to return the best filename match
         # Only search within approx_packages to prevent incorrect matching of generic names
-        search_val = path.basename(filepath).lower()
+        candidates = self.repair_basename_index.get(path.basename(filepath).lower(), [])
         search_ext = os.path.splitext(filepath)[-1]
         if approx_types is not None and search_ext in approx_types:
-            found_approx = list((index[0], index[1]) for index in self.repair_index if index[2].lower() == search_val)
+            found_approx = list(candidates)
         elif approx_packages is not None:
-            found_approx = list(
-                (index[0], index[1])
-                for index in self.repair_index
-                if are_substrings_in_str(index[0], approx_packages) and index[2].lower() == search_val
-            )
+            found_approx = [
+                (var_id, file_path)
+                for var_id, file_path in candidates
+                if are_substrings_in_str(var_id, approx_packages)
+            ]
+        else:
+            found_approx = []
+        return select_fuzzy_match(filepath, found_approx)
+
+    def _find_replacement_from_storage(self, filepath: str, approx_packages=None, approx_types=None):
+        """Indexed equivalent of find_replacement_from_repair_index"""
+        if self.storage.repair_ranks_stale():
+            self.storage.update_repair_ranks(self.repair_ranks)
+        result = next(iter(self.storage.find_replacements(filepath)), None)
+        if result is not None:
+            return result
+
+        if approx_packages is None and approx_types is None:
+            return None, None
+
+        search_ext = os.path.splitext(filepath)[-1]
+        if approx_types is not None and search_ext in approx_types:
+            found_approx = self.storage.find_replacements(filepath, basename_only=True)
+        elif approx_packages is not None:
+            found_approx = [
+                (var_id, member)
+                for var_id, member in self.storage.find_replacements(filepath, basename_only=True)
+                if are_substrings_in_str(var_id, approx_packages)
+            ]
         else:
             found_approx = []
         return select_fuzzy_match(filepath, found_approx)
@@ -549,6 +658,8 @@ class VarDatabase(VarDatabaseImageDB):
     def find_broken_replacement_mappings(self, var_obj: VarObject, health_check=False):
         """Check the var for replacement references"""
         mappings = set()
+        # Built on the first local fuzzy lookup, then shared by every other broken reference of the var
+        local_index = None
         # Check each file that is used by the current var
         for check_package, check_package_file in var_obj.used_packages_as_list:
             replace_key = (
@@ -598,7 +709,9 @@ class VarDatabase(VarDatabaseImageDB):
             )
             if found_id is None and check_package in ("SELF", "SELF_UNREF"):
                 # Attempt a local fuzzy replacement (maybe the file is misspelled)
-                found_id, found_path = find_fuzzy_file_match(check_package_file, var_obj.includes_as_list, threshold=3)
+                if local_index is None:
+                    local_index = FuzzyFileIndex(var_obj.includes_as_list)
+                found_id, found_path = local_index.find(check_package_file, threshold=3)
 
             # There are no suitable replacements, the reference must be removed
             if found_id is None:
@@ -646,78 +759,61 @@ class VarDatabase(VarDatabaseImageDB):
     def repair_broken_var(self, var_ref: VarObject, remove_confirm=False, remove_skip=False) -> bool:
         # var_ref is from the local_db typically and is a quick load
         # This means it will not contain a detailed mapping of the var contents
-        # We want to create a new object to make sure repairs are accurate by rescanning the local
-        # object fully with the VarParser. This will make sure that the hidden _var_raw_data
-        # cache is fully populated.
-        print(f"CHECKING REPAIR {var_ref.var_id}...")
-        var_obj = VarObject(var_ref.root_path, var_ref.file_path)
-
-        # Scan for repairs
-        replacement_mappings, replacement_used_packages = self.find_var_replacement_mappings(var_obj)
-        if len(replacement_mappings) == 0:
-            return True
+        # The transform rescans the var fully with the VarParser to make sure repairs are accurate
+        return VarTransform(self, var_ref).run(repair=True, remove_confirm=remove_confirm, remove_skip=remove_skip)
+
+    def transform_var(
+        self, var_ref: VarObject, repair=True, compress=False, remove_confirm=False, remove_skip=False
+    ) -> bool:
+        """Repair, fix the metadata of and optionally compress a var, rewriting it at most once"""
+        return VarTransform(self, var_ref).run(
+            repair=repair,
+            metadata=repair,
+            compress=compress,
+            remove_confirm=remove_confirm,
+            remove_skip=remove_skip,
+        )
 
-        null_elems, unrepairable_elems = self.check_broken_var_elements(var_obj.var_id, replacement_mappings)
-        if len(unrepairable_elems) > 0:
-            print(f"{var_obj.var_id} >> Repairs not supported for issues in this var")
-            return False
-        if len(null_elems) > 0 and remove_skip:
-            print("Skipping file as removals required...")
-            return False
-        if len(null_elems) > 0 and remove_confirm:
-            if input("Do you want to continue repairing this var? (y/n) ").lower() != "y":
-                return False
-
-        # Repair the var file
-        json_errors_during_repair = False
-        temp_file = path.join(var_obj.directory, TEMP_VAR_NAME)
-        with ZipReadInto(var_obj.file_path, temp_file) as (read_zf, zf_dest):
-            for item in read_zf.infolist():
-                if item.filename == "meta.json":
-                    with io.TextIOWrapper(read_zf.open(item, "r"), encoding="UTF-8") as read_item:
-                        meta = json.loads(read_item.read())
-                        meta["contentList"] = [
-                            r for r in read_zf.namelist() if r != "meta.json" and len(path.splitext(r)[1]) > 1
-                        ]
-                        meta["dependencies"] = self.get_dependencies_list_as_dict(replacement_used_packages)
-                        zf_dest.writestr(
-                            "meta.json",
-                            orjson.dumps(meta, option=orjson.OPT_INDENT_2).decode("UTF-8"),
-                        )
-                        continue
-
-                # Copy unfixable files directly
-                if item.filename not in var_obj.json_like_files:
-                    zf_dest.writestr(item.filename, read_zf.read(item.filename))
-                    continue
+    def transform_vars(
+        self, var_refs: list[VarObject], repair=True, compress=False, remove_confirm=False, remove_skip=False
+    ) -> list[str]:
+        """transform_var over many vars, returns the sorted ids of the vars the repair stage did not refuse
 
-                # Read and attempt to repair any readable files
-                try:
-                    with io.TextIOWrapper(read_zf.open(item, "r"), encoding="UTF-8") as read_item:
-                        contents = VarParser.replace(read_item.readlines(), replacement_mappings)
-                    json_data = json.loads("".join(contents))
-
-                    if len(null_elems) > 0:
-                        if "storables" in json_data:
-                            json_data = VarParser.remove_from_atom(json_data, null_elems)
-                        elif "atoms" in json_data:
-                            person_atoms = [i for i, item in enumerate(json_data["atoms"]) if item["type"] == "Person"]
-                            for person_atom in person_atoms:
-                                json_data["atoms"][person_atom] = VarParser.remove_from_atom(
-                                    json_data["atoms"][person_atom], null_elems
-                                )
-
-                    write_data = orjson.dumps(json_data, option=orjson.OPT_INDENT_2).decode("UTF-8")
-                    zf_dest.writestr(item.filename, write_data)
-                except JSONDecodeError as err:
-                    print(f"JSONDecodeError: {item.filename} >> {err}")
-                    zf_dest.writestr(item.filename, read_zf.read(item.filename))
-                    json_errors_during_repair = True
-
-        if json_errors_during_repair:
-            os.remove(temp_file)
-            return False
+        The largest vars go first, so no big var is left running alone at the end.
+        """
+        options = {
+            "repair": repair,
+            "metadata": repair,
+            "compress": compress,
+            "remove_confirm": remove_confirm,
+            "remove_skip": remove_skip,
+        }
+        var_refs = {var_ref.var_id: var_ref for var_ref in var_refs}
+        var_ids = sorted(var_refs, key=lambda var_id: (-path.getsize(var_refs[var_id].file_path), var_id))
+
+        transformed = []
+        saved_mb = 0.0
+        for var_id, repaired, var_saved_mb in self._transform_var_jobs(var_refs, var_ids, options):
+            saved_mb += var_saved_mb
+            if repaired:
+                transformed.append(var_id)
+        if compress:
+            print(f"TOTAL SPACE SAVED: {saved_mb:.2f}MB over {len(var_ids)} vars")
+        return sorted(transformed)
+
+    def _transform_var_jobs(
+        self, var_refs: dict[str, VarObject], var_ids: list[str], options: dict[str, bool]
+    ) -> Iterator[tuple[str, bool, float]]:
+        """Runs the transforms on a process pool unless workers is 1
+
+        Vars that may ask for confirmation are transformed one at a time.
+        """
+        if self.workers == 1 or len(var_ids) <= 1 or options["remove_confirm"]:
+            for var_id in var_ids:
+                transform = VarTransform(self, var_refs[var_id])
+                yield var_id, transform.run(**options), transform.saved_mb
+            return
 
-        os.remove(var_obj.file_path)
-        os.rename(temp_file, var_obj.file_path)
-        return True
+        jobs = [(var_refs[var_id].root_path, var_refs[var_id].to_dict()) for var_id in var_ids]
+        with self._worker_pool() as m_pool:
+            yield from m_pool.imap_unordered(functools.partial(transform_var_job, options), jobs)
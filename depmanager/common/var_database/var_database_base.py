@@ -1,5 +1,4 @@
-import itertools
-import json
+import functools
 import multiprocessing
 import os
 import shutil
@@ -7,7 +6,6 @@ import sys
 import time
 import zipfile
 from collections import defaultdict
-from json import JSONDecodeError
 from os import path
 from typing import Any
 from typing import Dict
@@ -15,20 +13,31 @@ from typing import List
 from typing import Optional
 from typing import Tuple
 
-from orjson import orjson
-
 from depmanager.common.enums.ext import Ext
+from depmanager.common.enums.formats import DatabaseFormat
 from depmanager.common.enums.paths import IMAGE_LIB_DIR
 from depmanager.common.enums.paths import REMOVED_DIR
 from depmanager.common.enums.paths import REPAIR_LIB_DIR
-from depmanager.common.enums.variables import TEMP_VAR_NAME
 from depmanager.common.shared.cached_object import CachedObject
 from depmanager.common.shared.cached_property import cached_property
 from depmanager.common.shared.progress_bar import ProgressBar
-from depmanager.common.shared.tools import get_file_stat
+from depmanager.common.shared.tools import is_temp_var
+from depmanager.common.shared.tools import paused_gc
+from depmanager.common.shared.tools import scan_directory_files
+from depmanager.common.var_database.var_database_formats import get_database_storage
+from depmanager.common.var_database.var_database_storage import VarDatabaseStorage
 from depmanager.common.var_object.var_object import VarObject
 
 
+def scan_var_record(root_path: str, quick_scan: bool, file_path: str) -> tuple[str, Optional[dict], Optional[str]]:
+    """Scan a single var and return it as a plain record, this is safe to run inside a process pool"""
+    try:
+        var = VarObject(root_path=root_path, file_path=file_path, quick_scan=quick_scan)
+        return file_path, var.to_dict(), None
+    except (ValueError, KeyError, PermissionError, zipfile.BadZipfile) as err:
+        return file_path, None, str(err)
+
+
 class VarDatabaseBase(CachedObject):
     INCLUDE_LIST = ["var"]
     EXCLUDE_LIST = ["disabled"]
@@ -39,17 +48,38 @@ class VarDatabaseBase(CachedObject):
     vars: Dict[str, VarObject]
     quick_scan: bool
     scanned: bool
-
-    def __init__(self, root: str = None, quick_scan: bool = False, favorites: Dict[str, Any] = None):
+    workers: int
+
+    def __init__(
+        self,
+        root: str = None,
+        quick_scan: bool = False,
+        favorites: Dict[str, Any] = None,
+        workers: int = 0,
+        *,
+        db_format: str = DatabaseFormat.JSON,
+        records: Optional[list[dict]] = None,
+    ):
         self._files_added_or_removed = False
+        # Var ids changed or removed since the last save, only these are written to the journal
+        self._dirty_vars = set()
+        self._needs_compaction = False
 
         self.rootpath = root
-        self.root_db = "remote_db.json"
+        self.storage = get_database_storage(root, db_format)
+        self.root_db = self.storage.filename
         self.vars = {}
         self.quick_scan = quick_scan
         self.favorites = favorites if favorites else {}
+        # 0 will use every available core, 1 will force serial scanning
+        self.workers = workers
 
-        self.load()
+        if records is None:
+            self.load()
+        else:
+            # A copy of the database of another process, the stored database is left alone
+            with paused_gc():
+                self.load_records(records)
 
     def __len__(self):
         return len(self.vars)
@@ -59,6 +89,11 @@ class VarDatabaseBase(CachedObject):
 
     def __setitem__(self, key, value):
         self.vars[key] = value
+        self._dirty_vars.add(key)
+
+    def __delitem__(self, key):
+        del self.vars[key]
+        self._dirty_vars.add(key)
 
     @property
     def _attributes(self):
@@ -86,39 +121,10 @@ class VarDatabaseBase(CachedObject):
     def root_db_path(self):
         return path.join(self.rootpath, self.root_db)
 
-    @property
-    def directory_listing(self) -> dict[str, list]:
-        dir_listing = {}
-        for (dirpath, _, filenames) in os.walk(self.rootpath):
-            if self.ignore_directory(dirpath) or len(filenames) == 0:
-                continue
-            vars_in_filenames = [f for f in filenames if len(f) > 4 and f[-4:] == Ext.VAR]
-            if len(vars_in_filenames) > 0:
-                dir_listing[dirpath] = vars_in_filenames
-        return dir_listing
-
     @cached_property
     def directory_files(self) -> list[tuple[str, float, float]]:
         print("Parallel scanning directories...")
-        files = [
-            os.path.join(f[1], f[0])
-            for f in list(
-                itertools.chain.from_iterable(
-                    itertools.product(files, [key]) for key, files in self.directory_listing.items()
-                )
-            )
-        ]
-
-        try:
-            with multiprocessing.Pool() as m_pool:
-                # Pycharm debugger has issues sometimes
-                if sys.gettrace():
-                    time.sleep(2)
-                files_with_stats = list(m_pool.map(get_file_stat, files))
-        except (BrokenPipeError, BufferError):
-            print("Failed to secure buffer...")
-            files_with_stats = list(get_file_stat(file) for file in files)
-        return files_with_stats
+        return scan_directory_files(self.rootpath, Ext.VAR, ignore=self.ignore_directory)
 
     @cached_property
     def vars_directory_files(self) -> set[str]:
@@ -131,34 +137,58 @@ class VarDatabaseBase(CachedObject):
             versions[var.duplicate_id].add(var.version)
         return versions
 
-    def to_json(self) -> str:
-        # Removing pretty-printing to improve performance
-        return orjson.dumps(
-            {"rootpath": self.rootpath, "vars": [v.to_dict() for _, v in self.vars.items()]}, option=orjson.OPT_INDENT_2
-        ).decode("UTF-8")
-
-    def save(self) -> None:
-        if self._files_added_or_removed:
+    def save(self, compact: bool = False) -> None:
+        if self._files_added_or_removed or compact:
             print(f"Saving database {self.root_db_path}")
-            with open(self.root_db_path, "w", encoding="UTF-8") as write_db_file:
-                write_db_file.write(self.to_json())
+            self.save_storage(compact=compact or self._needs_compaction)
             self._files_added_or_removed = False
+            self._needs_compaction = False
+            self._dirty_vars.clear()
             attributes = [a for a in self._attributes if a != "directory_files"]
             self.clear(attributes)
 
+    def save_storage(self, compact: bool = False, **options) -> None:
+        if compact or self.storage.needs_compaction():
+            self.storage.save(self.rootpath, [v.to_dict() for _, v in self.vars.items()], **options)
+            return
+        records = [self.vars[var_id].to_dict() for var_id in sorted(self._dirty_vars) if var_id in self.vars]
+        removed = set(var_id for var_id in self._dirty_vars if var_id not in self.vars)
+        self.storage.save_changes(records, removed, **options)
+
+    def load_records(self, records: list[dict]) -> None:
+        # Loaded vars are already stored, so they bypass the dirty tracking of __setitem__
+        for item in records:
+            var = VarObject.from_dict(data=item, root_path=self.rootpath)
+            var.tag_as_favorite(self.favorites)
+            self.vars[var.var_id] = var
+
+    def migrate(self) -> bool:
+        """One-shot migration of an existing remote_db.json into the configured database format"""
+        legacy_storage = VarDatabaseStorage(self.rootpath)
+        if legacy_storage.file_path == self.storage.file_path or not legacy_storage.exists():
+            return False
+        try:
+            print(f"Migrating database {legacy_storage.file_path} to {self.root_db_path}")
+            with paused_gc():
+                self.load_records(legacy_storage.load())
+        except ValueError:
+            return False
+        self._files_added_or_removed = True
+        self.save()
+        return True
+
     def load(self) -> None:
-        if not path.exists(self.root_db_path):
-            self.refresh()
+        if not self.storage.exists():
+            if not self.migrate():
+                self.refresh()
         else:
             try:
                 print(f"Loading default database {self.root_db_path}")
-                with open(self.root_db_path, "r", encoding="UTF-8") as read_db_file:
-                    data = json.load(read_db_file)
-                    for item in data["vars"]:
-                        var = VarObject.from_dict(data=item, root_path=self.rootpath)
-                        var.tag_as_favorite(self.favorites)
-                        self[var.var_id] = var
-            except JSONDecodeError:
+                with paused_gc():
+                    self.load_records(self.storage.load())
+            except ValueError:
+                # The stored database cannot be trusted, so the next save has to rewrite it completely
+                self._needs_compaction = True
                 self.refresh()
 
     def ignore_directory(self, dirpath: str) -> bool:
@@ -170,7 +200,7 @@ class VarDatabaseBase(CachedObject):
         if (filename_ext != Ext.VAR and not is_image) or (filename_ext != Ext.JPG and is_image):
             return None
         # If we find a temp var, we should destroy it
-        if filename == TEMP_VAR_NAME:
+        if is_temp_var(filename):
             print(f"Removing temp var: {file_path}")
             os.remove(file_path)
             return None
@@ -213,29 +243,77 @@ class VarDatabaseBase(CachedObject):
         except (ValueError, KeyError, PermissionError, zipfile.BadZipfile) as err:
             print(f"ERROR :: Could not read {file_path} >> {err}")
 
-    def add_file(self, file_path: str, filemod=None, filesize=None):
-        if "temp.temp.1.var" in file_path:
+    def update_var_from_record(self, file_path: str, record: Optional[dict], error: Optional[str] = None):
+        if record is None:
+            print(f"ERROR :: Could not read {file_path} >> {error}")
             return
+        var = VarObject.from_dict(data=record, root_path=self.rootpath)
+        var.tag_as_favorite(self.favorites)
+        self[var.var_id] = var
+        self._files_added_or_removed = True
+
+    def update_vars(self, file_paths: list[str]) -> None:
+        if len(file_paths) == 0:
+            return
+
+        progress = ProgressBar(len(file_paths), description="Scanning vars")
+        scanned = set()
+        if self.workers != 1 and len(file_paths) > 1:
+            scan = functools.partial(scan_var_record, self.rootpath, self.quick_scan)
+            try:
+                with multiprocessing.Pool(self.workers if self.workers > 0 else None) as m_pool:
+                    # Pycharm debugger has issues sometimes
+                    if sys.gettrace():
+                        time.sleep(2)
+                    for file_path, record, error in m_pool.imap_unordered(scan, file_paths, chunksize=8):
+                        progress.inc()
+                        scanned.add(file_path)
+                        self.update_var_from_record(file_path, record, error)
+            except (BrokenPipeError, BufferError):
+                print("Failed to secure buffer...")
+
+        # Serial mode, or anything the pool did not get to before failing
+        for file_path in file_paths:
+            if file_path in scanned:
+                continue
+            progress.inc()
+            self.update_var(file_path)
+
+    def should_update_file(self, file_path: str, filemod=None, filesize=None) -> bool:
+        if is_temp_var(path.basename(file_path)):
+            return False
 
         var = self.get_var_from_filepath(file_path)
         if var is not None:
             if var.file_path != file_path:
                 print(f"Warning: {file_path} is a duplicate var")
-                return
+                return False
             if (filemod != var.modified and filesize != var.size) or (
                 (filemod is None or filesize is None) and var.updated
             ):
                 print(f"Updating: {var.var_id}")
-                self.update_var(file_path)
-            return
+                return True
+            return False
+
+        return True
 
-        self.update_var(file_path)
+    def add_file(self, file_path: str, filemod=None, filesize=None):
+        if self.should_update_file(file_path, filemod, filesize):
+            self.update_var(file_path)
 
     def add_files(self) -> None:
-        progress = ProgressBar(self.directory_count, description="Scanning vars")
+        files_to_scan = []
+        filenames_to_scan = set()
         for filepath, filemod, filesize in self.directory_files:
-            progress.inc()
-            self.add_file(filepath, filemod, filesize)
+            if not self.should_update_file(filepath, filemod, filesize):
+                continue
+            # New vars are only registered after the scan, so duplicates within the scan must be caught here
+            if path.basename(filepath) in filenames_to_scan:
+                print(f"Warning: {filepath} is a duplicate var")
+                continue
+            filenames_to_scan.add(path.basename(filepath))
+            files_to_scan.append(filepath)
+        self.update_vars(files_to_scan)
 
     def remove_files(self) -> None:
         files = self.directory_files
@@ -248,7 +326,7 @@ class VarDatabaseBase(CachedObject):
         for var_path in sorted(removed_files):
             var = self.get_var_from_filepath(var_path).var_id
             print(f"Removing: {var}")
-            self.vars.pop(var)
+            del self[var]
 
     def manipulate_file(self, var_id, dest_dir, move=False, symlink=False, track_move=True) -> None:
         os.makedirs(dest_dir, exist_ok=True)
@@ -0,0 +1,14 @@
+from depmanager.common.enums.formats import DatabaseFormat
+from depmanager.common.var_database.var_database_sqlite import VarDatabaseSqliteStorage
+from depmanager.common.var_database.var_database_storage import VarDatabaseBinaryStorage
+from depmanager.common.var_database.var_database_storage import VarDatabaseStorage
+
+
+def get_database_storage(root_path: str, db_format: str = DatabaseFormat.JSON) -> VarDatabaseStorage:
+    if db_format == DatabaseFormat.JSON:
+        return VarDatabaseStorage(root_path)
+    if db_format == DatabaseFormat.BINARY:
+        return VarDatabaseBinaryStorage(root_path)
+    if db_format == DatabaseFormat.SQLITE:
+        return VarDatabaseSqliteStorage(root_path)
+    raise ValueError(f"Unsupported database format: {db_format}")
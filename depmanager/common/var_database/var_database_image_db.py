@@ -1,19 +1,85 @@
+import functools
+import hashlib
+import multiprocessing
 import os
+import shutil
 from datetime import datetime
+from io import BytesIO
 from os import path
 from typing import List
+from typing import Optional
 from typing import Tuple
 
 import filedate
 
 from depmanager.common.enums.ext import Ext
+from depmanager.common.enums.formats import DatabaseFormat
 from depmanager.common.enums.paths import IMAGE_LIB_DIR
 from depmanager.common.enums.paths import REMOVED_DIR
 from depmanager.common.shared.progress_bar import ProgressBar
-from depmanager.common.shared.tools import remove_empty_directories
 from depmanager.common.shared.ziptools import ZipRead
-from depmanager.common.shared.ziptools import ZipWrite
+from depmanager.common.var_database.image_archive import IMAGE_ARCHIVE_INDEX
+from depmanager.common.var_database.image_archive import ImageArchive
+from depmanager.common.var_database.image_catalogue import ImageCatalogue
 from depmanager.common.var_database.var_database_base import VarDatabaseBase
+from depmanager.common.var_object.var_object import VarObject
+
+# Default thumbnails this process has written or found, by defaults directory and content type
+_default_images: dict[tuple[str, str], str] = {}
+
+
+def link_default_image(var: VarObject, image_file: str, defaults_dir: str) -> None:
+    """Hard link image_file to the one thumbnail shared by every var showing the default image of its type"""
+    key = (defaults_dir, var.var_type.type)
+    if key not in _default_images:
+        buffer = BytesIO()
+        var.extract_default_image_data(var.var_type.type).save(buffer, format="JPEG")
+        data = buffer.getvalue()
+        # Named after its content, so a changed resource image does not reuse an outdated thumbnail
+        shared_file = path.join(defaults_dir, f"{var.var_type.type}.{hashlib.sha1(data).hexdigest()[:12]}{Ext.JPG}")
+        if not path.exists(shared_file):
+            os.makedirs(defaults_dir, exist_ok=True)
+            temp_file = f"{shared_file}.{os.getpid()}"
+            with open(temp_file, "wb") as write_file:
+                write_file.write(data)
+            os.replace(temp_file, shared_file)
+        _default_images[key] = shared_file
+
+    if path.exists(image_file):
+        os.remove(image_file)
+    try:
+        os.link(_default_images[key], image_file)
+    except OSError:
+        # File systems without hard links get a copy
+        shutil.copyfile(_default_images[key], image_file)
+
+
+def save_var_image(var: VarObject, image_file: str, defaults_dir: str) -> bool:
+    identity = var.find_identity_image()
+    if identity is None:
+        return False
+    os.makedirs(path.dirname(image_file), exist_ok=True)
+    if identity[0] is None:
+        # Hard links share their dates, these keep the dates of the shared thumbnail
+        link_default_image(var, image_file, defaults_dir)
+        return True
+    var.get_image(*identity).save(image_file, format="JPEG")
+
+    # Set the date of the images to the dates of the vars
+    image_filedate = filedate.File(image_file)
+    image_filedate.set(
+        created=str(datetime.fromtimestamp(var.info["created"])),
+        modified=str(datetime.fromtimestamp(var.info["modified"])),
+    )
+    return True
+
+
+def write_var_image(root_path: str, defaults_dir: str, job: tuple[str, dict]) -> Optional[str]:
+    """Write the image of a var record to image_file, this is safe to run inside a process pool"""
+    image_file, record = job
+    if save_var_image(VarObject.from_dict(data=record, root_path=root_path), image_file, defaults_dir):
+        return image_file
+    return None
 
 
 class VarDatabaseImageDB(VarDatabaseBase):
@@ -23,11 +89,19 @@ class VarDatabaseImageDB(VarDatabaseBase):
         image_root: str = None,
         quick_scan: bool = False,
         favorites: List[str] = None,
+        workers: int = 0,
+        *,
+        db_format: str = DatabaseFormat.JSON,
+        records: Optional[list[dict]] = None,
     ):
-        super().__init__(root=root, quick_scan=quick_scan, favorites=favorites)
+        super().__init__(
+            root=root, quick_scan=quick_scan, favorites=favorites, workers=workers, db_format=db_format, records=records
+        )
         self._images_added_or_removed = False
+        self._image_catalogue: Optional[ImageCatalogue] = None
 
         self.image_root = image_root
+        # Format of the image database before ImageArchive, carried over by the next save
         self.image_root_db = "image_lib.zip"
 
     @property
@@ -42,100 +116,134 @@ class VarDatabaseImageDB(VarDatabaseBase):
     def image_db_local_path(self):
         return path.join(self.image_root, IMAGE_LIB_DIR)
 
+    @property
+    def image_db_local_defaults_path(self):
+        return path.join(self.image_root, f"{IMAGE_LIB_DIR}_defaults")
+
     @property
     def image_db_local_dep_path(self):
         return path.join(self.image_root, f"{IMAGE_LIB_DIR}{Ext.DEP}")
 
+    @property
+    def image_catalogue(self) -> ImageCatalogue:
+        """The local image_lib, walked once per session"""
+        if self._image_catalogue is None:
+            os.makedirs(self.image_db_local_path, exist_ok=True)
+            self._image_catalogue = ImageCatalogue(self.image_db_local_path)
+        return self._image_catalogue
+
     @property
     def image_files(self) -> list[str]:
-        dir_listing = []
-        for (dirpath, _, filenames) in os.walk(self.image_db_local_path):
-            if IMAGE_LIB_DIR not in dirpath:
-                continue
-            dir_listing.extend([os.path.join(dirpath, f) for f in filenames if len(f) > 4 and f[-4:] == Ext.JPG])
-        return dir_listing
+        return self.image_catalogue.files
 
     @property
     def image_file_subdirs(self):
+        # The image_lib may have been reorganized by hand
         print("Scanning subdirectories")
-        os.makedirs(self.image_db_local_path, exist_ok=True)
-
-        dep = {}
-        for (dir_path, _, files) in os.walk(self.image_db_local_path):
-            for file in files:
-                dep[file.replace(Ext.JPG, Ext.EMPTY)] = path.relpath(dir_path, self.image_db_local_path)
-        return dep
+        self.image_catalogue.rescan()
+        return dict(self.image_catalogue.images)
 
     def save_image_db(self) -> None:
         if self._images_added_or_removed:
-            print(f"Saving image database {self.image_db_path}")
+            archive = ImageArchive(self.rootpath)
+            catalogue = self.image_catalogue
+            print(f"Saving image database {archive.index_path}")
+            if archive.exists:
+                changed = [catalogue.image_path(var_id) for var_id in catalogue.changed if var_id in catalogue]
+                changes = archive.update(self.image_db_local_path, changed, catalogue.removed)
+            else:
+                changes = archive.sync(self.image_db_local_path, catalogue.files)
+            catalogue.saved()
+            print(f"Saved {changes} image changes")
+            if archive.needs_compaction:
+                print("Compacting image database...")
+                archive.compact()
+            # Everything in an image_lib.zip from before the archive has been carried over
             if os.path.exists(self.image_db_path):
                 os.remove(self.image_db_path)
-            with ZipWrite(self.image_db_path, compress=False) as zip_file:
-                for item in self.image_files:
-                    zip_file.write(item, os.path.relpath(item, self.image_db_local_path))
             self._images_added_or_removed = False
 
     def save_image_db_as_dep(self):
         print("Saving image database as .dep")
-        os.makedirs(self.image_db_local_path, exist_ok=True)
-
-        dep = []
-        for (_, _, files) in os.walk(self.image_db_local_path):
-            for file in files:
-                dep.append(file.replace(Ext.JPG, Ext.EMPTY))
         with open(self.image_db_local_dep_path, "w", encoding="UTF-8") as write_dep_file:
-            for line in dep:
+            for line in self.image_catalogue.images:
                 write_dep_file.write(f"{line}\n")
 
     def load_image_db(self) -> None:
-        files = self.directory_files
-        image_files = self.image_files
-        if len(files) != len(image_files):
-            if path.exists(self.image_db_path):
-                with ZipRead(self.image_db_path) as zip_file:
-                    zip_file.extractall(self.image_db_local_path)
-            else:
-                os.makedirs(self.image_db_local_path, exist_ok=True)
+        catalogue = self.image_catalogue
+        archive = ImageArchive(self.rootpath)
+        if archive.exists:
+            extracted = archive.extract_missing(self.image_db_local_path, catalogue.images)
+            for file_path in extracted:
+                catalogue.add_file(file_path, changed=False)
+            if len(extracted) > 0:
+                print(f"Extracted {len(extracted)} images from the image database")
+            # Anything the archive is missing is saved with the next change
+            catalogue.reconcile(archive.paths)
+        elif len(self.directory_files) != len(catalogue) and path.exists(self.image_db_path):
+            # An image_lib.zip from before the archive, save_image_db carries it over
+            with ZipRead(self.image_db_path) as zip_file:
+                zip_file.extractall(self.image_db_local_path)
+            catalogue.rescan()
+
+    def remove_empty_image_directories(self) -> None:
+        self.image_catalogue.prune_vacated()
+
+    def var_image_path(self, var: VarObject) -> str:
+        return path.join(self.image_db_local_path, var.sub_directory, f"{var.clean_name}{Ext.JPG}")
 
     def update_var_image(self, file_path: str) -> None:
         var = self.get_var_from_filepath(file_path, is_image=True)
-        if var is not None:
-            local_image_name = path.join(self.image_db_local_path, var.sub_directory, f"{var.clean_name}{Ext.JPG}")
-            if path.exists(local_image_name):
-                return
-
-            image_data = var.extract_identity_image_data()
-            if image_data is not None:
-                os.makedirs(path.join(self.image_db_local_path, var.sub_directory), exist_ok=True)
-                image_data.save(local_image_name, format="JPEG")
-
-                # Set the date of the images to the dates of the vars
-                image_filedate = filedate.File(local_image_name)
-                image_filedate.set(
-                    created=str(datetime.fromtimestamp(var.info["created"])),
-                    modified=str(datetime.fromtimestamp(var.info["modified"])),
-                )
+        if var is not None and self.image_catalogue.images.get(var.clean_name) != var.sub_directory:
+            if save_var_image(var, self.var_image_path(var), self.image_db_local_defaults_path):
+                self.image_catalogue.add(var.clean_name, var.sub_directory)
+
+    def update_var_images(self, file_paths: list[str]) -> None:
+        progress = ProgressBar(len(file_paths), "Scanning new var images")
+        if self.workers == 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                progress.inc()
+                self.update_var_image(file_path)
+            return
+
+        jobs = []
+        for file_path in file_paths:
+            var = self.get_var_from_filepath(file_path, is_image=True)
+            if var is None or self.image_catalogue.images.get(var.clean_name) == var.sub_directory:
+                progress.inc()
+                continue
+            jobs.append((self.var_image_path(var), var.to_dict()))
+
+        # The records are enough to rebuild each var, so every worker opens only the zip of the var it renders
+        with multiprocessing.Pool(self.workers if self.workers > 0 else None) as m_pool:
+            for image_file in m_pool.imap_unordered(
+                functools.partial(write_var_image, self.rootpath, self.image_db_local_defaults_path), jobs, chunksize=4
+            ):
+                progress.inc()
+                if image_file is not None:
+                    self.image_catalogue.add_file(image_file)
 
     def refresh_image_db(self) -> None:
         print("Updating image lib...")
         self.load_image_db()
         required_image_files = set(path.join(v.sub_directory, f"{v.clean_name}{Ext.JPG}") for _, v in self.vars.items())
-        current_image_files = set(os.path.relpath(f, self.image_db_local_path) for f in self.image_files)
+        current_image_files = self.image_catalogue.relative_files
         removed_files = current_image_files - required_image_files
         added_files = required_image_files - current_image_files
 
         for image_path in sorted(removed_files):
             os.remove(os.path.join(self.image_db_local_path, image_path))
+            self.image_catalogue.remove(path.splitext(path.basename(image_path))[0])
 
         if len(added_files) > 0:
-            progress = ProgressBar(len(added_files), "Scanning new var images")
-            for image_path in sorted(added_files):
-                progress.inc()
-                self.update_var_image(image_path)
+            self.update_var_images(sorted(added_files))
 
-        if len(removed_files) > 0 or len(added_files) > 0 or not os.path.exists(self.image_db_path):
-            remove_empty_directories(self.image_db_local_path)
+        if (
+            len(removed_files) > 0
+            or len(added_files) > 0
+            or not path.exists(path.join(self.rootpath, IMAGE_ARCHIVE_INDEX))
+        ):
+            self.remove_empty_image_directories()
             self._images_added_or_removed = True
 
     def organize_with_image_db(self) -> None:
@@ -185,3 +293,4 @@ class VarDatabaseImageDB(VarDatabaseBase):
                 if not os.path.exists(dest_path):
                     os.makedirs(dest_path, exist_ok=True)
                 os.rename(src_file, dest_file)
+                self.image_catalogue.add(var_id, var_dest_dir)
@@ -0,0 +1,307 @@
+import sqlite3
+from contextlib import closing
+from os import path
+from typing import Optional
+from urllib.request import pathname2url
+
+from orjson import orjson
+
+from depmanager.common.var_database.var_database_storage import VarDatabaseStorage
+from depmanager.common.var_database.var_database_storage import record_var_id
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS vars (
+    var_id TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    author TEXT NOT NULL,
+    duplicate_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    sub_directory TEXT NOT NULL,
+    info TEXT NOT NULL,
+    contains TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    repair_rank INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS members (
+    var_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    path_lower TEXT NOT NULL,
+    basename_lower TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    is_include INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    var_id TEXT NOT NULL,
+    dependency TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS used_packages (
+    var_id TEXT NOT NULL,
+    package TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vars_duplicate_id ON vars (duplicate_id);
+CREATE INDEX IF NOT EXISTS vars_author ON vars (author);
+CREATE INDEX IF NOT EXISTS vars_sub_directory ON vars (sub_directory);
+CREATE INDEX IF NOT EXISTS members_var_id ON members (var_id);
+CREATE INDEX IF NOT EXISTS members_path_lower ON members (path_lower);
+CREATE INDEX IF NOT EXISTS members_basename_lower ON members (basename_lower);
+CREATE INDEX IF NOT EXISTS dependencies_var_id ON dependencies (var_id);
+CREATE INDEX IF NOT EXISTS dependencies_dependency ON dependencies (dependency);
+CREATE INDEX IF NOT EXISTS used_packages_var_id ON used_packages (var_id);
+CREATE INDEX IF NOT EXISTS used_packages_package ON used_packages (package);
+"""
+
+
+class VarDatabaseSqliteStorage(VarDatabaseStorage):
+    """SQLite storage engine
+
+    Vars, infolist members, declared dependencies and used_packages are kept in their own indexed tables. Besides
+    loading the full database this allows the common lookups to be answered straight from disk, without building
+    every VarObject in memory first.
+    """
+
+    extension = ".sqlite"
+    supports_queries = True
+
+    def __init__(self, root_path: str, name: str = "remote_db"):
+        super().__init__(root_path, name)
+        # Whether repair_rank has to be rewritten before it can order a lookup, None until read from the database
+        self._repair_ranks_stale: Optional[bool] = None
+
+    def connect(self, create: bool = False) -> sqlite3.Connection:
+        if not create:
+            # Read only, so a query against a missing database fails instead of creating an empty one
+            return sqlite3.connect(f"file:{pathname2url(path.abspath(self.file_path))}?mode=ro", uri=True)
+        connection = sqlite3.connect(self.file_path)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def needs_compaction(self) -> bool:
+        # Changes are applied in place, there is never a journal to fold back in
+        return not self.exists()
+
+    def read(self) -> list[dict]:
+        try:
+            with closing(self.connect()) as connection:
+                records = {}
+                for var_id, file_path, info, contains, metadata in connection.execute(
+                    "SELECT var_id, file_path, info, contains, metadata FROM vars"
+                ):
+                    records[var_id] = {
+                        "file_path": file_path,
+                        "info": orjson.loads(info),
+                        "contains": orjson.loads(contains),
+                        "infolist": [],
+                        "dependencies": [],
+                        "used_packages": {},
+                        "metadata": orjson.loads(metadata),
+                    }
+                for var_id, member, size in connection.execute(
+                    "SELECT var_id, path, size FROM members ORDER BY var_id, position"
+                ):
+                    records[var_id]["infolist"].append([member, size])
+                for var_id, dependency in connection.execute("SELECT var_id, dependency FROM dependencies"):
+                    records[var_id]["dependencies"].append(dependency)
+                for var_id, package, package_path in connection.execute(
+                    "SELECT var_id, package, path FROM used_packages"
+                ):
+                    records[var_id]["used_packages"].setdefault(package, []).append(package_path)
+        except sqlite3.DatabaseError as err:
+            raise ValueError(f"Corrupt database {self.file_path} >> {err}") from err
+        return list(records.values())
+
+    @staticmethod
+    def _insert_records(connection: sqlite3.Connection, records: list[dict], repair_ranks: dict[str, int]) -> None:
+        for record in records:
+            relative_path = record["file_path"]
+            author, package_name, version, _ = path.basename(relative_path).split(".")
+            var_id = f"{author}.{package_name}.{version}"
+            connection.execute(
+                "INSERT OR REPLACE INTO vars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    var_id,
+                    relative_path,
+                    author,
+                    f"{author}.{package_name}",
+                    int(version),
+                    path.split(relative_path)[0],
+                    orjson.dumps(record["info"]).decode("UTF-8"),
+                    orjson.dumps(record["contains"]).decode("UTF-8"),
+                    orjson.dumps(record["metadata"]).decode("UTF-8"),
+                    repair_ranks.get(var_id, len(repair_ranks)),
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        var_id,
+                        position,
+                        member,
+                        member.lower(),
+                        path.basename(member).lower(),
+                        size,
+                        # Matches VarObject.includes_as_list, which is what the repair index is built from
+                        int(member != "meta.json" and len(path.splitext(member)[1]) > 0),
+                    )
+                    for position, (member, size) in enumerate(record["infolist"])
+                ),
+            )
+            connection.executemany(
+                "INSERT INTO dependencies VALUES (?, ?)", ((var_id, dep) for dep in record["dependencies"])
+            )
+            connection.executemany(
+                "INSERT INTO used_packages VALUES (?, ?, ?)",
+                (
+                    (var_id, package, package_path)
+                    for package, package_paths in record["used_packages"].items()
+                    for package_path in package_paths
+                ),
+            )
+
+    def save(self, rootpath: str, records: list[dict], repair_ranks: Optional[dict[str, int]] = None) -> None:
+        """Rewrite every table in a single transaction
+
+        repair_ranks maps var_id to its position in VarDatabase.repair_index so find_replacements can return
+        matches in the same order without rebuilding the index. Without them the ranks are left stale.
+        """
+        with closing(self.connect(create=True)) as connection:
+            with connection:
+                self._delete_records(connection)
+                connection.execute("INSERT OR REPLACE INTO settings VALUES ('rootpath', ?)", (rootpath,))
+                self._insert_records(connection, records, repair_ranks if repair_ranks is not None else {})
+                self._set_repair_ranks_stale(connection, repair_ranks is None)
+            connection.execute("VACUUM")
+
+    def save_changes(self, records: list[dict], removed: set[str]) -> None:
+        """Replace only the rows of the changed and removed vars
+
+        Any change can shift the ordering of the other vars, the ranks are marked stale rather than rewritten for
+        every var on every save, see update_repair_ranks.
+        """
+        with closing(self.connect(create=True)) as connection:
+            with connection:
+                self._delete_records(connection, removed | set(record_var_id(record) for record in records))
+                self._insert_records(connection, records, {})
+                self._set_repair_ranks_stale(connection, True)
+
+    def _set_repair_ranks_stale(self, connection: sqlite3.Connection, stale: bool) -> None:
+        connection.execute("INSERT OR REPLACE INTO settings VALUES ('repair_ranks_stale', ?)", (str(int(stale)),))
+        self._repair_ranks_stale = stale
+
+    def repair_ranks_stale(self) -> bool:
+        if self._repair_ranks_stale is None:
+            with closing(self.connect()) as connection:
+                row = connection.execute("SELECT value FROM settings WHERE key = 'repair_ranks_stale'").fetchone()
+            self._repair_ranks_stale = row is not None and row[0] == "1"
+        return self._repair_ranks_stale
+
+    def update_repair_ranks(self, repair_ranks: dict[str, int]) -> None:
+        """Store the position of every var in VarDatabase.repair_index, once, before the next ordered lookup"""
+        with closing(self.connect(create=True)) as connection:
+            with connection:
+                connection.executemany(
+                    "UPDATE vars SET repair_rank = ? WHERE var_id = ?",
+                    ((rank, var_id) for var_id, rank in repair_ranks.items()),
+                )
+                self._set_repair_ranks_stale(connection, False)
+
+    @staticmethod
+    def _delete_records(connection: sqlite3.Connection, var_ids: Optional[set[str]] = None) -> None:
+        for table in ("vars", "members", "dependencies", "used_packages"):
+            if var_ids is None:
+                connection.execute(f"DELETE FROM {table}")  # nosec - fixed table names
+            else:
+                connection.executemany(
+                    f"DELETE FROM {table} WHERE var_id = ?", ((var_id,) for var_id in var_ids)  # nosec
+                )
+
+    def get_var_name(self, var_id: str, always: bool = False) -> Optional[str]:
+        """Indexed equivalent of VarDatabaseBase.get_var_name"""
+        try:
+            author, name, version = var_id.split(".")
+        except ValueError:
+            return var_id if always else None
+
+        with closing(self.connect()) as connection:
+            if version == "latest":
+                row = connection.execute(
+                    "SELECT MAX(version) FROM vars WHERE duplicate_id = ?", (f"{author}.{name}",)
+                ).fetchone()
+                if row[0] is None:
+                    return var_id if always else None
+                return f"{author}.{name}.{row[0]}"
+
+            row = connection.execute("SELECT 1 FROM vars WHERE var_id = ?", (var_id,)).fetchone()
+        if row is None:
+            return var_id if always else None
+        return var_id
+
+    def required_by(self, var_name: str) -> list[str]:
+        """Indexed equivalent of VarDatabase.vars_required.get(var_name)"""
+        dependency_names = [var_name]
+        var_name_parts = var_name.split(".")
+        if len(var_name_parts) == 3 and var_name_parts[2] != "latest":
+            # A ".latest" dependency resolves to var_name if var_name is the newest version
+            latest = f"{var_name_parts[0]}.{var_name_parts[1]}.latest"
+            if self.get_var_name(latest) == var_name:
+                dependency_names.append(latest)
+
+        placeholders = ", ".join("?" * len(dependency_names))
+        with closing(self.connect()) as connection:
+            return [
+                row[0]
+                for row in connection.execute(
+                    f"SELECT DISTINCT var_id FROM dependencies WHERE dependency IN ({placeholders})",
+                    dependency_names,
+                )
+            ]
+
+    def find_missing_vars(self, quick_scan: bool = False) -> set[str]:
+        """Indexed equivalent of VarDatabase.find_missing_vars
+
+        Every var is part of its own dependency chain, so the union of all the chains is simply every referenced
+        package, there is no need to walk the chains to find what is missing.
+        """
+        if quick_scan:
+            packages = "SELECT DISTINCT dependency FROM dependencies"
+        else:
+            packages = (
+                "SELECT DISTINCT u.package FROM used_packages u JOIN vars v ON v.var_id = u.var_id "
+                "WHERE u.package NOT IN ('SELF', 'SELF_UNREF') "
+                "AND u.package != v.var_id AND u.package != v.duplicate_id || '.latest'"
+            )
+        # Resolved like get_var_name, a ".latest" package is there if any version of it is
+        with closing(self.connect()) as connection:
+            return set(
+                row[0]
+                for row in connection.execute(
+                    f"WITH packages(package) AS ({packages}) SELECT package FROM packages p "  # nosec - fixed queries
+                    "WHERE NOT EXISTS (SELECT 1 FROM vars v WHERE v.var_id = p.package) "
+                    "AND NOT (substr(p.package, -7) = '.latest' AND EXISTS ("
+                    "SELECT 1 FROM vars l WHERE l.duplicate_id = substr(p.package, 1, length(p.package) - 7)))"
+                )
+            )
+
+    def find_replacements(self, filepath: str, basename_only: bool = False) -> list[tuple[str, str]]:
+        """Return every (var_id, path) matching filepath, ordered like VarDatabase.repair_index"""
+        if basename_only:
+            condition = "m.basename_lower = ?"
+            search_val = path.basename(filepath).lower()
+        else:
+            condition = "m.path_lower = ?"
+            search_val = filepath.lower()
+
+        with closing(self.connect()) as connection:
+            return list(
+                connection.execute(
+                    "SELECT m.var_id, m.path FROM members m JOIN vars v ON v.var_id = m.var_id "
+                    f"WHERE m.is_include = 1 AND {condition} ORDER BY v.repair_rank, m.position",
+                    (search_val,),
+                )
+            )
@@ -0,0 +1,197 @@
+import os
+import struct
+import zlib
+from os import path
+from typing import Optional
+
+from orjson import orjson
+
+from depmanager.common.enums.ext import Ext
+from depmanager.common.shared.tools import read_json_lines
+
+
+def record_var_id(record: dict) -> str:
+    return path.basename(record["file_path"]).replace(Ext.VAR, Ext.EMPTY)
+
+
+class VarDatabaseStorage:
+    """Stores the database as a single indented json file, this is the original remote_db.json format
+
+    Changes between full saves are appended to a journal next to the database file, one json line per changed or
+    removed var. The journal is replayed on load and folded back into the main file once it grows past
+    COMPACT_RATIO of the main file size, or on the next save after a line of it was found cut short.
+    """
+
+    extension = Ext.JSON
+    supports_queries = False
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, root_path: str, name: str = "remote_db"):
+        self.root_path = root_path
+        self.name = name
+        self.journal_damaged = False
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}{self.extension}"
+
+    @property
+    def file_path(self) -> str:
+        return path.join(self.root_path, self.filename)
+
+    @property
+    def journal_path(self) -> str:
+        return f"{self.file_path}.journal"
+
+    def exists(self) -> bool:
+        return path.exists(self.file_path)
+
+    def needs_compaction(self) -> bool:
+        if not self.exists():
+            return True
+        if not path.exists(self.journal_path):
+            return False
+        if self.journal_damaged:
+            return True
+        return path.getsize(self.journal_path) > path.getsize(self.file_path) * self.COMPACT_RATIO
+
+    def load(self) -> list[dict]:
+        """Read every var record, raises a ValueError if the file cannot be parsed"""
+        records = self.read()
+        if not path.exists(self.journal_path):
+            return records
+        return self.apply_journal(records)
+
+    def read(self) -> list[dict]:
+        with open(self.file_path, "rb") as read_db_file:
+            data = orjson.loads(read_db_file.read())
+        return data["vars"]
+
+    def read_journal(self) -> list[tuple[str, Optional[dict]]]:
+        """Journal entries in the order they were written, a record of None marks a removed var"""
+        if not path.exists(self.journal_path):
+            return []
+        entries, skipped = read_json_lines(self.journal_path)
+        if skipped > 0:
+            # Appending after the partial line would garble the next entry as well, the next save rewrites it all
+            self.journal_damaged = True
+        return [(entry["var_id"], entry["record"]) for entry in entries]
+
+    def apply_journal(self, records: list[dict]) -> list[dict]:
+        records_by_id = {record_var_id(record): record for record in records}
+        for var_id, record in self.read_journal():
+            if record is None:
+                records_by_id.pop(var_id, None)
+            else:
+                records_by_id[var_id] = record
+        return list(records_by_id.values())
+
+    def save(self, rootpath: str, records: list[dict]) -> None:
+        """Rewrite the whole database, this also compacts the journal"""
+        self.write(rootpath, records)
+        if path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_damaged = False
+
+    def save_changes(self, records: list[dict], removed: set[str]) -> None:
+        """Append the changed and removed vars to the journal"""
+        with open(self.journal_path, "ab") as write_journal_file:
+            for var_id in sorted(removed):
+                write_journal_file.write(orjson.dumps({"var_id": var_id, "record": None}) + b"\n")
+            for record in records:
+                write_journal_file.write(orjson.dumps({"var_id": record_var_id(record), "record": record}) + b"\n")
+
+    def write(self, rootpath: str, records: list[dict]) -> None:
+        # Written aside and swapped in, an interrupted save leaves the previous database and its journal intact
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, "wb") as write_db_file:
+            write_db_file.write(orjson.dumps({"rootpath": rootpath, "vars": records}, option=orjson.OPT_INDENT_2))
+        os.replace(temp_path, self.file_path)
+
+
+class VarDatabaseBinaryStorage(VarDatabaseStorage):
+    """Compact binary database
+
+    Layout:
+        header  MAGIC | version (u16) | compressed index length (u32)
+        index   zlib(orjson({"rootpath": str, "index": {var_id: offset}})), offsets are relative to the records
+        records length (u32) | zlib(orjson(record)) for every var
+
+    Records are compressed on their own so a single var can be read with one seek, without inflating the rest
+    of the database.
+    """
+
+    extension = Ext.DMDB
+    MAGIC = b"DMDB"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHI")
+    RECORD = struct.Struct("<I")
+    COMPRESSION_LEVEL = 6
+
+    def _read_index(self, read_chunk) -> tuple[dict[str, int], int]:
+        """Parse the header and index, read_chunk(start, length) returns the requested bytes of the file"""
+        try:
+            magic, version, index_length = self.HEADER.unpack(read_chunk(0, self.HEADER.size))
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError(f"Unsupported database format in {self.file_path}")
+            index = orjson.loads(zlib.decompress(read_chunk(self.HEADER.size, index_length)))
+        except (struct.error, zlib.error) as err:
+            raise ValueError(f"Corrupt database {self.file_path} >> {err}") from err
+        return index["index"], self.HEADER.size + index_length
+
+    def _read_record(self, read_chunk, offset: int) -> dict:
+        try:
+            (length,) = self.RECORD.unpack(read_chunk(offset, self.RECORD.size))
+            return orjson.loads(zlib.decompress(read_chunk(offset + self.RECORD.size, length)))
+        except (struct.error, zlib.error) as err:
+            raise ValueError(f"Corrupt database record in {self.file_path} >> {err}") from err
+
+    def read(self) -> list[dict]:
+        # A single read keeps the number of round trips to a network share as low as possible
+        with open(self.file_path, "rb") as read_db_file:
+            data = memoryview(read_db_file.read())
+
+        def read_chunk(start, length):
+            return data[start : start + length]
+
+        index, records_start = self._read_index(read_chunk)
+        return [self._read_record(read_chunk, records_start + offset) for offset in index.values()]
+
+    def load_record(self, var_id: str) -> Optional[dict]:
+        """Read a single var record without loading the whole database"""
+        with open(self.file_path, "rb") as read_db_file:
+
+            def read_chunk(start, length):
+                read_db_file.seek(start)
+                return read_db_file.read(length)
+
+            index, records_start = self._read_index(read_chunk)
+            # The journal holds anything that changed since the last full save
+            for journal_var_id, record in reversed(self.read_journal()):
+                if journal_var_id == var_id:
+                    return record
+            offset = index.get(var_id)
+            if offset is None:
+                return None
+            return self._read_record(read_chunk, records_start + offset)
+
+    def write(self, rootpath: str, records: list[dict]) -> None:
+        index = {}
+        blobs = []
+        offset = 0
+        for record in records:
+            blob = zlib.compress(orjson.dumps(record), self.COMPRESSION_LEVEL)
+            index[record_var_id(record)] = offset
+            blobs.append(self.RECORD.pack(len(blob)))
+            blobs.append(blob)
+            offset += self.RECORD.size + len(blob)
+
+        index_data = zlib.compress(orjson.dumps({"rootpath": rootpath, "index": index}), self.COMPRESSION_LEVEL)
+        # Written aside and swapped in, an interrupted save leaves the previous database intact
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, "wb") as write_db_file:
+            write_db_file.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(index_data)))
+            write_db_file.write(index_data)
+            for blob in blobs:
+                write_db_file.write(blob)
+        os.replace(temp_path, self.file_path)
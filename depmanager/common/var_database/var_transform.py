@@ -0,0 +1,291 @@
+import io
+import json
+import os
+from json import JSONDecodeError
+from os import path
+from typing import Optional
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+from zipfile import ZipInfo
+
+from orjson import orjson
+
+from depmanager.common.enums.variables import MEGABYTE
+from depmanager.common.parser.parser import VarParser
+from depmanager.common.shared.progress_bar import ProgressBar
+from depmanager.common.shared.tools import temp_var_path
+from depmanager.common.shared.ziptools import ZipMemberWriter
+from depmanager.common.shared.ziptools import ZipRead
+from depmanager.common.shared.ziptools import ZipWrite
+from depmanager.common.shared.ziptools import get_storage_policy
+from depmanager.common.shared.ziptools import zip_archive_size
+from depmanager.common.shared.ziptools import zip_entry_size
+from depmanager.common.var_object.var_object import VarObject
+
+
+class VarTransform:
+    """Rewrites a var in a single pass
+
+    The zip is opened once and every stage (reference repairs, meta.json fixes, image compression and PSD removal)
+    is planned against the members held in memory, each stage seeing the var as the previous stages left it. The
+    output is only written if a stage changed something. Members are written under the zip storage policy,
+    unchanged members it agrees with keep their compressed bytes.
+    """
+
+    def __init__(self, database, var_ref: VarObject):
+        self.database = database
+        self.var_ref = var_ref
+        self.read_zf: Optional[ZipFile] = None
+        self.items: list[ZipInfo] = []
+        self.replaced: dict[str, bytes] = {}
+        self.removed: set[str] = set()
+        self._members: dict[str, bytes] = {}
+        self.policy = get_storage_policy()
+        self._encoded: dict[str, tuple[bytes, tuple[int, bytes]]] = {}
+        # Space the compress stage saved, in MB
+        self.saved_mb = 0.0
+
+    def run(
+        self,
+        *,
+        repair: bool = False,
+        metadata: bool = False,
+        compress: bool = False,
+        remove_confirm: bool = False,
+        remove_skip: bool = False,
+        png_only: bool = False,
+    ) -> bool:
+        """Apply the requested stages, returns False if the repair stage refused the var (it is left untouched)"""
+        temp_file = temp_var_path(self.var_ref.directory)
+        with ZipRead(self.var_ref.file_path) as read_zf:
+            self.read_zf = read_zf
+            self.items = read_zf.infolist()
+            if repair and not self.repair(remove_confirm=remove_confirm, remove_skip=remove_skip):
+                return False
+            if metadata:
+                self.fix_metadata()
+            if compress:
+                self.compress_images(png_only=png_only)
+            changed = len(self.replaced) > 0 or len(self.removed) > 0
+            if changed:
+                self.write(temp_file)
+        self.read_zf = None
+
+        if changed:
+            os.remove(self.var_ref.file_path)
+            os.rename(temp_file, self.var_ref.file_path)
+        return True
+
+    @property
+    def namelist(self) -> list[str]:
+        return [item.filename for item in self.items]
+
+    @property
+    def infolist(self) -> list[tuple[str, int]]:
+        """The (filename, size) listing of the var as it would be written now"""
+        infolist = [
+            (item.filename, len(self.replaced[item.filename]) if item.filename in self.replaced else item.file_size)
+            for item in self.items
+            if item.filename not in self.removed
+        ]
+        names = set(self.namelist)
+        infolist.extend((name, len(data)) for name, data in self.replaced.items() if name not in names)
+        return infolist
+
+    def read_member(self, name: str) -> bytes:
+        if name in self.replaced:
+            return self.replaced[name]
+        if name not in self._members:
+            self._members[name] = self.read_zf.read(name)
+        return self._members[name]
+
+    def read_text(self, name: str) -> io.TextIOWrapper:
+        return io.TextIOWrapper(io.BytesIO(self.read_member(name)), encoding="UTF-8")
+
+    def scan(self) -> VarObject:
+        """A full scan of the var as the stages so far left it"""
+        return VarObject(
+            self.var_ref.root_path, self.var_ref.file_path, infolist=self.infolist, read_member=self.read_member
+        )
+
+    def repair(self, remove_confirm: bool = False, remove_skip: bool = False) -> bool:
+        print(f"CHECKING REPAIR {self.var_ref.var_id}...")
+        var_obj = self.scan()
+
+        # Scan for repairs
+        replacement_mappings, replacement_used_packages = self.database.find_var_replacement_mappings(var_obj)
+        if len(replacement_mappings) == 0:
+            return True
+
+        null_elems, unrepairable_elems = self.database.check_broken_var_elements(var_obj.var_id, replacement_mappings)
+        if len(unrepairable_elems) > 0:
+            print(f"{var_obj.var_id} >> Repairs not supported for issues in this var")
+            return False
+        if len(null_elems) > 0 and remove_skip:
+            print("Skipping file as removals required...")
+            return False
+        if len(null_elems) > 0 and remove_confirm:
+            if input("Do you want to continue repairing this var? (y/n) ").lower() != "y":
+                return False
+
+        # Repair the var file
+        json_errors_during_repair = False
+        json_like_files = set(var_obj.json_like_files)
+        repaired = {}
+        for name in self.namelist:
+            if name == "meta.json":
+                with self.read_text(name) as read_item:
+                    meta = json.loads(read_item.read())
+                meta["contentList"] = [r for r in self.namelist if r != "meta.json" and len(path.splitext(r)[1]) > 1]
+                meta["dependencies"] = self.database.get_dependencies_list_as_dict(replacement_used_packages)
+                repaired[name] = orjson.dumps(meta, option=orjson.OPT_INDENT_2)
+                continue
+
+            # Unfixable files are copied directly
+            if name not in json_like_files:
+                continue
+
+            # Read and attempt to repair any readable files
+            try:
+                with self.read_text(name) as read_item:
+                    contents = VarParser.replace(read_item.readlines(), replacement_mappings)
+                json_data = json.loads("".join(contents))
+
+                if len(null_elems) > 0:
+                    if "storables" in json_data:
+                        json_data = VarParser.remove_from_atom(json_data, null_elems)
+                    elif "atoms" in json_data:
+                        person_atoms = [i for i, item in enumerate(json_data["atoms"]) if item["type"] == "Person"]
+                        for person_atom in person_atoms:
+                            json_data["atoms"][person_atom] = VarParser.remove_from_atom(
+                                json_data["atoms"][person_atom], null_elems
+                            )
+
+                repaired[name] = orjson.dumps(json_data, option=orjson.OPT_INDENT_2)
+            except JSONDecodeError as err:
+                print(f"JSONDecodeError: {name} >> {err}")
+                json_errors_during_repair = True
+
+        if json_errors_during_repair:
+            return False
+        self.replaced.update(repaired)
+        return True
+
+    def fix_metadata(self) -> None:
+        print(f"CHECKING METADATA {self.var_ref.var_id}...")
+        var_obj = self.scan()
+        if not var_obj.incorrect_metadata:
+            return
+
+        added = len(set(var_obj.used_dependencies_sorted).difference(var_obj.dependencies))
+        removed = len(set(var_obj.dependencies).difference(var_obj.used_dependencies_sorted))
+        action = f"Adding {added} dependencies. Removing {removed} dependencies."
+        print(f"OPTIMIZING {var_obj.var_id}... {action}")
+
+        metadata_dict = {}
+        if "meta.json" in self.replaced or "meta.json" in self.namelist:
+            with self.read_text("meta.json") as read_item:
+                metadata_dict = json.loads(read_item.read())
+        self.replaced["meta.json"] = self.database.fix_metadata_dict(metadata_dict, var_obj).encode("UTF-8")
+
+    def compress_images(self, png_only: bool = False) -> None:
+        var_ref = self.var_ref
+        image_files = set(var_ref.clothing_image_files) | set(var_ref.texture_image_files)
+        removable_image_files = set(var_ref.removable_image_files)
+        image_bytes_pre = 0
+        image_bytes_post = 0
+        compressed = {}
+        removed = set()
+        outcomes = {}
+
+        image_items = [
+            item
+            for item in self.items
+            if item.filename in image_files
+            and item.filename not in removable_image_files
+            and item.filename not in self.removed
+        ]
+        image_results = var_ref.compress_image_members(
+            image_items, self.read_zf.read, png_only=png_only, workers=self.database.workers, outcomes=outcomes
+        )
+        progress = ProgressBar(len(self.items), description=f"COMPRESSING: {var_ref.clean_name}")
+        for item in self.items:
+            progress.inc()
+            if item.filename in removable_image_files:
+                print(f"REMOVED {var_ref.clean_name}: {item.filename}")
+                removed.add(item.filename)
+                continue
+            if item.filename not in image_files or item.filename in self.removed:
+                continue
+            _, image_size, image_write = next(image_results)
+            if image_size is None:
+                continue
+            image_bytes_pre += image_size
+            if image_write is not None:
+                image_bytes_post += image_write.getbuffer().nbytes
+                print(f"UPDATED {var_ref.clean_name}: {item.filename}")
+                compressed[item.filename] = image_write.getvalue()
+            else:
+                image_bytes_post += image_size
+        # Every image has its result, this shuts the compression pool down
+        image_results.close()
+
+        print("")
+        if len(compressed) == 0:
+            var_ref.record_compression_outcomes(outcomes, kept=False)
+            return
+
+        # The var is not written twice to compare the sizes, they are worked out from the planned members instead
+        pre_stat_mb = self.output_size() / MEGABYTE
+        planned = (self.replaced, self.removed)
+        self.replaced = {**self.replaced, **compressed}
+        self.removed = self.removed | removed
+        post_stat_mb = self.output_size() / MEGABYTE
+        if var_ref.compression_is_worthwhile(pre_stat_mb, post_stat_mb, image_bytes_pre, image_bytes_post):
+            var_ref.record_compression_outcomes(outcomes, kept=True)
+            self.saved_mb = pre_stat_mb - post_stat_mb
+        else:
+            var_ref.record_compression_outcomes(outcomes, kept=False)
+            self.replaced, self.removed = planned
+
+    def encoded(self, name: str) -> tuple[int, bytes]:
+        """(compress_type, payload) of a replaced member under the storage policy"""
+        data = self.replaced[name]
+        cached = self._encoded.get(name)
+        if cached is None or cached[0] is not data:
+            cached = (data, self.policy.encode(name, data))
+            self._encoded[name] = cached
+        return cached[1]
+
+    def copied_size(self, item: ZipInfo) -> int:
+        compress_type, _ = self.policy.copy_method(item)
+        # A stored size is exact, a member deflated anew is counted at its current size
+        return item.file_size if compress_type == ZIP_STORED else item.compress_size
+
+    def output_size(self) -> int:
+        """Size of the zip write() would produce"""
+        names = set(self.namelist)
+        return zip_archive_size(
+            [
+                zip_entry_size(item.filename, len(self.encoded(item.filename)[1]))
+                if item.filename in self.replaced
+                else zip_entry_size(item.filename, self.copied_size(item), item.extra)
+                for item in self.items
+                if item.filename not in self.removed
+            ]
+            + [zip_entry_size(name, len(self.encoded(name)[1])) for name in self.replaced if name not in names]
+        )
+
+    def write(self, temp_file: str) -> None:
+        with ZipWrite(temp_file) as zf_dest, ZipMemberWriter(zf_dest, policy=self.policy) as writer:
+            for item in self.items:
+                if item.filename in self.removed:
+                    continue
+                if item.filename in self.replaced:
+                    writer.write_encoded(item.filename, self.replaced[item.filename], *self.encoded(item.filename))
+                else:
+                    writer.copy(self.read_zf, item)
+            names = set(self.namelist)
+            for name, data in self.replaced.items():
+                if name not in names:
+                    writer.write_encoded(name, data, *self.encoded(name))
@@ -3,9 +3,11 @@ import os
 from typing import Any
 from typing import Dict
 from typing import List
+from typing import Optional
 
 from depmanager.common.enums.content_type import ContentType
 from depmanager.common.enums.ext import Ext
+from depmanager.common.enums.formats import DatabaseFormat
 from depmanager.common.enums.methods import OrganizeMethods
 from depmanager.common.enums.paths import ADDON_PACKAGE_USER_PREFS_DIR
 from depmanager.common.enums.plugins import PLUGIN_BLACKLIST_ENABLE_BY_DEFAULT
@@ -16,15 +18,27 @@ from depmanager.common.shared.cached_object import CachedObject
 from depmanager.common.shared.cached_property import cached_property
 from depmanager.common.shared.tools import remove_empty_directories
 from depmanager.common.var_database.var_database import VarDatabase
+from depmanager.common.var_database.var_database_sqlite import VarDatabaseSqliteStorage
 from depmanager.common.var_database_service.database_service_tools import DatabaseServiceTools
 
 
 class DatabaseService(CachedObject, DatabaseServiceTools):
-    def __init__(self, root: str, image_root: str = None, quick_scan: bool = False, favorites: Dict[str, Any] = None):
+    def __init__(
+        self,
+        root: str,
+        image_root: str = None,
+        quick_scan: bool = False,
+        favorites: Dict[str, Any] = None,
+        workers: int = 0,
+        *,
+        db_format: str = DatabaseFormat.JSON,
+    ):
         self.root = root
         self.image_root = image_root
         self.quick_scan = quick_scan
         self.favorites = favorites
+        self.workers = workers
+        self.db_format = db_format
 
     @property
     def _attributes(self):
@@ -33,7 +47,14 @@ class DatabaseService(CachedObject, DatabaseServiceTools):
     @cached_property
     # pylint: disable=invalid-name
     def db(self) -> VarDatabase:
-        return VarDatabase(self.root, image_root=self.image_root, quick_scan=self.quick_scan, favorites=self.favorites)
+        return VarDatabase(
+            self.root,
+            image_root=self.image_root,
+            quick_scan=self.quick_scan,
+            favorites=self.favorites,
+            workers=self.workers,
+            db_format=self.db_format,
+        )
 
     def refresh(self):
         self.db.refresh()
@@ -50,10 +71,25 @@ class DatabaseService(CachedObject, DatabaseServiceTools):
     def duplicates(self):
         return self.db.find_unversioned_duplicates()
 
+    @property
+    def storage(self) -> Optional[VarDatabaseSqliteStorage]:
+        """The queryable storage of the database, only while the database itself has not been loaded"""
+        if "db" in self.__dict__ or self.db_format != DatabaseFormat.SQLITE:
+            return None
+        storage = VarDatabaseSqliteStorage(self.root)
+        return storage if storage.exists() else None
+
     @property
     def missing(self):
+        if self.storage is not None:
+            return self.storage.find_missing_vars(quick_scan=self.quick_scan)
         return self.db.find_missing_vars()
 
+    def required_by(self, var_name: str) -> list[str]:
+        if self.storage is not None:
+            return self.storage.required_by(var_name)
+        return self.db.vars_required.get(var_name, [])
+
     @property
     def required_vars(self) -> set[str]:
         required_vars = self.db.unique_required_dependencies
@@ -118,7 +154,7 @@ class DatabaseService(CachedObject, DatabaseServiceTools):
 
         if remove_empty:
             remove_empty_directories(self.db.rootpath)
-            remove_empty_directories(self.db.image_db_local_path)
+            self.db.remove_empty_image_directories()
 
         if save_on_complete:
             self.db.save()
@@ -153,3 +189,5 @@ class DatabaseService(CachedObject, DatabaseServiceTools):
             self.display_list(broken_vars, "Broken")
         else:
             self.display_list(missing, "Missing", show_used_by=True)
+        for cycle in self.db.find_dependency_cycles():
+            print(f"Dependency cycle: {', '.join(cycle)}")
@@ -2,15 +2,38 @@ import os
 
 from depmanager.common.enums.config import Config
 from depmanager.common.shared.progress_bar import ProgressBar
+from depmanager.common.shared.ziptools import StoragePolicy
+from depmanager.common.shared.ziptools import set_deflate_workers
+from depmanager.common.shared.ziptools import set_memory_budget
+from depmanager.common.shared.ziptools import set_storage_policy
 from depmanager.common.var_database_service.database_service import DatabaseService
+from depmanager.common.var_object.compression_cache import COMPRESSION_CACHE_NAME
+from depmanager.common.var_object.compression_cache import CompressionCache
+from depmanager.common.var_object.compression_cache import set_compression_cache
 
 
 class VarDatabaseService:
     def __init__(self, var_config: Config):
         self.var_config = var_config
-        self.local = DatabaseService(root=self.var_config.local_path, quick_scan=True)
+        set_memory_budget(self.var_config.zip_memory_budget)
+        set_deflate_workers(self.var_config.zip_deflate_workers)
+        set_storage_policy(
+            StoragePolicy.from_config(self.var_config.zip_storage_methods, self.var_config.zip_min_deflate_gain)
+        )
+        if self.var_config.compression_cache and self.var_config.remote_path:
+            set_compression_cache(CompressionCache(os.path.join(self.var_config.remote_path, COMPRESSION_CACHE_NAME)))
+        self.local = DatabaseService(
+            root=self.var_config.local_path,
+            quick_scan=True,
+            workers=self.var_config.worker_count,
+            db_format=self.var_config.database_format,
+        )
         self.remote = DatabaseService(
-            root=self.var_config.remote_path, image_root=self.var_config.local_path, favorites=self.var_config.favorites
+            root=self.var_config.remote_path,
+            image_root=self.var_config.local_path,
+            favorites=self.var_config.favorites,
+            workers=self.var_config.worker_count,
+            db_format=self.var_config.database_format,
         )
 
     def clear(self):
@@ -46,7 +69,7 @@ class VarDatabaseService:
             # If it is unknown we will defer what is needed to the local dependencies, which may be right
             # or wrong.
             var_name = self.remote.db.get_var_name(var, always=True)
-            additional_required = self.remote.db.required_dependencies.get(var_name, set())
+            additional_required = self.remote.db.get_required_dependencies(var_name)
             all_required.update(additional_required)
 
         # If we have specific versions listed, we only want to copy a single version unless we actually
@@ -152,12 +175,12 @@ class VarDatabaseService:
             print("No new vars to import")
 
     def execute_repair_pass(self, new_var_ids, remove_confirm=False):
-        repaired_var_ids = self.repair_var_ids(new_var_ids, remove_confirm)
+        # Asked up front so each var is repaired, fixed and compressed in a single rewrite
+        compress = self.should_compress_vars() if len(new_var_ids) > 0 else False
+        repaired_var_ids = self.repair_var_ids(new_var_ids, remove_confirm, compress=compress)
         if len(repaired_var_ids) == 0:
             return repaired_var_ids
 
-        self.compress_var_ids(repaired_var_ids)
-
         progress = ProgressBar(len(repaired_var_ids), description="Copying local to remote")
         for var_id in repaired_var_ids:
             progress.inc()
@@ -171,28 +194,17 @@ class VarDatabaseService:
         self.remote.db.save()
         return repaired_var_ids
 
-    def repair_var_ids(self, var_id_list, remove_confirm=False):
-        repaired_var_ids = []
-        for var_id in sorted(var_id_list):
-            var_ref = self.local.db[var_id]
-            if self.var_config.auto_repair:
-                repaired = self.remote.db.repair_broken_var(
-                    var_ref, remove_confirm=remove_confirm, remove_skip=not remove_confirm
-                )
-                # If the repair failed or was cancelled, don't attempt to import the var
-                if not repaired:
-                    continue
-                self.remote.db.repair_metadata(var_ref)
-            repaired_var_ids.append(var_id)
-        return repaired_var_ids
+    def repair_var_ids(self, var_id_list, remove_confirm=False, compress=False):
+        # Vars the repair failed or was cancelled for are left out, so they are not imported
+        return self.remote.db.transform_vars(
+            [self.local.db[var_id] for var_id in var_id_list],
+            repair=self.var_config.auto_repair,
+            compress=compress,
+            remove_confirm=remove_confirm,
+            remove_skip=not remove_confirm,
+        )
 
-    def compress_var_ids(self, var_id_list):
+    def should_compress_vars(self) -> bool:
         if not self.var_config.auto_compress:
-            compress = input("Compress vars (y/n)? ").lower() == "y"
-        else:
-            compress = True
-
-        if compress:
-            for var_id in sorted(var_id_list):
-                var_ref = self.local.db[var_id]
-                var_ref.compress()
+            return input("Compress vars (y/n)? ").lower() == "y"
+        return True
@@ -0,0 +1,85 @@
+import threading
+from os import path
+from typing import Optional
+
+from orjson import orjson
+
+from depmanager.common.shared.tools import read_json_lines
+
+COMPRESSION_CACHE_NAME = "compression_cache.jsonl"
+
+
+class CompressionCache:
+    """Outcome of compressing image members, kept across runs so unchanged images are not decoded again
+
+    Entries are keyed by member CRC32, size and the compression settings that apply to the member. They are
+    appended as json lines to file_path on flush, a later line for the same key wins. Bump VERSION whenever
+    _compress_image decides differently, every older entry is then ignored.
+    """
+
+    VERSION = 1
+    SKIPPED = "skipped"
+    COMPRESSED = "compressed"
+    FAILED = "failed"
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.entries: dict[str, dict] = {}
+        self._pending: list[bytes] = []
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        if not path.exists(self.file_path):
+            return
+        # A line cut short by an interrupted run is skipped
+        entries, _ = read_json_lines(self.file_path)
+        for entry in entries:
+            if entry.get("version") == self.VERSION:
+                self.entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(crc: int, size: int, settings: str) -> str:
+        return f"{crc:08x}:{size}:{settings}"
+
+    @staticmethod
+    def var_key(var_id: str, key: str) -> str:
+        """Key of an outcome that only holds for the member key within var_id"""
+        return f"{var_id}/{key}"
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def put(self, key: str, outcome: str, reason: Optional[str] = None, size: Optional[int] = None) -> None:
+        entry = {"version": self.VERSION, "key": key, "outcome": outcome}
+        if reason is not None:
+            entry["reason"] = reason
+        if size is not None:
+            entry["size"] = size
+        with self._lock:
+            self.entries[key] = entry
+            self._pending.append(orjson.dumps(entry))
+
+    def flush(self) -> None:
+        """Append the new entries, in one write so parallel processes sharing the file do not interleave lines"""
+        with self._lock:
+            if len(self._pending) == 0:
+                return
+            data = b"\n".join(self._pending) + b"\n"
+            self._pending = []
+        with open(self.file_path, "ab") as write_file:
+            write_file.write(data)
+
+
+# Cache consulted by image compression, see set_compression_cache
+_COMPRESSION_CACHE: Optional[CompressionCache] = None
+
+
+def set_compression_cache(cache: Optional[CompressionCache]) -> None:
+    """Cache compress() and is_compressible consult, None (the default) compresses without one"""
+    global _COMPRESSION_CACHE  # pylint: disable=global-statement
+    _COMPRESSION_CACHE = cache
+
+
+def get_compression_cache() -> Optional[CompressionCache]:
+    return _COMPRESSION_CACHE
@@ -1,12 +1,12 @@
 import json
 from collections import defaultdict
-from io import TextIOWrapper
 from json import JSONDecodeError
 from os import path
 from typing import Any
 from typing import Dict
 from typing import List
 from typing import Union
+from zipfile import BadZipFile
 
 from depmanager.common.enums.content_type import ContentType
 from depmanager.common.enums.ext import Ext
@@ -14,16 +14,52 @@ from depmanager.common.enums.paths import FAVORITE
 from depmanager.common.enums.variables import MEGABYTE
 from depmanager.common.parser.parser import VarParser
 from depmanager.common.shared.cached_property import cached_property
+from depmanager.common.shared.cached_property import cached_slots
+from depmanager.common.shared.ziptools import ZipCentralDirectory
 from depmanager.common.shared.ziptools import ZipRead
 from depmanager.common.var_object.var_object_base import VarObjectBase
+from depmanager.common.var_object.var_object_compact import Infolist
+from depmanager.common.var_object.var_object_compact import compact_used_packages
+from depmanager.common.var_object.var_object_compact import intern_path
 from depmanager.common.var_object.var_object_image_lib import VarObjectImageLib
 
 
 class VarObject(VarObjectBase, VarObjectImageLib):
+    # VarObjectImageLib is a mixin without a layout of its own, its cached properties are slotted here
+    __slots__ = (
+        "quick",
+        "infolist",
+        "dependencies",
+        "used_packages",
+        "metadata",
+        "contains",
+        "var_type",
+        "favorite",
+        "favorite_should_not_organize",
+    ) + cached_slots(
+        "preferred_subdirectory",
+        "incorrect_subdirectory",
+        "prefer_symlink",
+        "dependencies_sorted",
+        "used_dependencies",
+        "used_dependencies_sorted",
+        "used_packages_as_list",
+        "json_like_files",
+        "json_files",
+        "files",
+        "image_directory",
+        "image_name",
+        "is_compressible",
+        "clothing_image_files",
+        "removable_image_files",
+        "texture_image_files",
+    )
+
     contains: dict[str, bool]
     dependencies: list[str]
     var_type: ContentType
-    infolist: list[tuple[str, int]]
+    infolist: Infolist
+    used_packages: dict[str, tuple[str, ...]]
 
     def __init__(
         self,
@@ -36,13 +72,23 @@ class VarObject(VarObjectBase, VarObjectImageLib):
         used_packages=None,
         metadata=None,
         quick_scan=False,
+        read_member=None,
     ):
         self.quick = quick_scan
         super().__init__(root_path, file_path, info)
-        self.infolist = infolist if infolist is not None else self._var_raw_data["infolist"]
-        self.dependencies = dependencies if dependencies is not None else self._var_raw_data["dependencies"]
-        self.used_packages = used_packages if used_packages is not None else self._var_raw_data["used_packages"]
-        self.metadata = metadata if metadata is not None else self._var_raw_data["metadata"]
+        raw_data = None
+        if read_member is not None:
+            # The members are already at hand (a rewrite in progress), scan them instead of the zip on disk
+            raw_data = self._scan_members(list(infolist), read_member)
+        elif infolist is None or dependencies is None or used_packages is None or metadata is None:
+            raw_data = self._scan_var()
+        infolist = infolist if infolist is not None else raw_data["infolist"]
+        dependencies = dependencies if dependencies is not None else raw_data["dependencies"]
+        used_packages = used_packages if used_packages is not None else raw_data["used_packages"]
+        self.infolist = infolist if isinstance(infolist, Infolist) else Infolist(infolist)
+        self.dependencies = [intern_path(dependency) for dependency in dependencies]
+        self.used_packages = compact_used_packages(used_packages)
+        self.metadata = metadata if metadata is not None else raw_data["metadata"]
         self.contains = contains if contains is not None else ContentType.ref_from_namelist(self.namelist)
         self.var_type = ContentType(self.contains)
         self.favorite = False
@@ -53,7 +99,7 @@ class VarObject(VarObjectBase, VarObjectImageLib):
             "file_path": self.relative_path,
             "info": self.info,
             "contains": self.contains,
-            "infolist": self.infolist,
+            "infolist": self.infolist.to_list(),
             "dependencies": self.dependencies,
             "used_packages": {key: list(val) for key, val in self.used_packages.items()},
             "metadata": self.metadata,
@@ -76,39 +122,48 @@ class VarObject(VarObjectBase, VarObjectImageLib):
     def from_dict(cls, data, root_path=None):
         return VarObject(root_path=root_path, **data)
 
-    @cached_property
-    def _var_raw_data(self) -> dict[str, Any]:
+    def _scan_var(self) -> dict[str, Any]:
+        try:
+            with ZipCentralDirectory(self.file_path) as read_cd:
+                return self._scan_members(read_cd.infolist(), read_cd.read)
+        except (BadZipFile, NotImplementedError):
+            # Anything the lightweight reader cannot handle is left to zipfile
+            pass
+
         with ZipRead(self.file_path) as read_zf:
             # Load the infolist (file names and sizes)
             infolist = [(val.filename, val.file_size) for val in read_zf.infolist()]
-
-            # Scan files for data
-            metadata = {}
-            dependencies = []
-            used_packages = defaultdict(set)
-
-            for item, _ in infolist:
-                if path.splitext(item)[1].lower() in (Ext.JSON, Ext.VAP, Ext.VAJ):
-                    try:
-                        with TextIOWrapper(read_zf.open(item, "r"), encoding="UTF-8") as read_item:
-                            if item == "meta.json":
-                                json_data = json.loads(read_item.read())
-                                dependencies = list(self._scan_keys_from_dict(json_data.get("dependencies")))
-
-                                metadata["licenseType"] = json_data.get("licenseType")
-                                metadata["creatorName"] = json_data.get("creatorName")
-                                metadata["packageName"] = json_data.get("packageName")
-                                metadata["programVersion"] = json_data.get("programVersion")
-
-                                # If scripts are using json referencing internally, we should just leave this alone
-                            elif not self.quick and not "Custom/Scripts" in item and not "Saves/PluginData" in item:
-                                packages = VarParser.scan_with_paths(read_item.readlines())
-                                for package, package_paths in packages.items():
-                                    used_packages[package].update(package_paths)
-                    except JSONDecodeError as err:
-                        raise ValueError(
-                            f"ERROR: Var meta.json cannot be parsed >> {self.file_path}\nException: {repr(err)}"
-                        ) from err
+            return self._scan_members(infolist, read_zf.read)
+
+    def _scan_members(self, infolist: list[tuple[str, int]], read_member) -> dict[str, Any]:
+        # Scan files for data
+        metadata = {}
+        dependencies = []
+        used_packages = defaultdict(set)
+
+        for item, _ in infolist:
+            if path.splitext(item)[1].lower() not in (Ext.JSON, Ext.VAP, Ext.VAJ):
+                continue
+            # If scripts are using json referencing internally, we should just leave this alone
+            if item != "meta.json" and (self.quick or "Custom/Scripts" in item or "Saves/PluginData" in item):
+                continue
+            try:
+                if item == "meta.json":
+                    json_data = json.loads(read_member(item).decode("UTF-8"))
+                    dependencies = list(self._scan_keys_from_dict(json_data.get("dependencies")))
+
+                    metadata["licenseType"] = json_data.get("licenseType")
+                    metadata["creatorName"] = json_data.get("creatorName")
+                    metadata["packageName"] = json_data.get("packageName")
+                    metadata["programVersion"] = json_data.get("programVersion")
+                else:
+                    packages = VarParser.scan_bytes_with_paths(read_member(item))
+                    for package, package_paths in packages.items():
+                        used_packages[package].update(package_paths)
+            except JSONDecodeError as err:
+                raise ValueError(
+                    f"ERROR: Var meta.json cannot be parsed >> {self.file_path}\nException: {repr(err)}"
+                ) from err
 
         return {
             "infolist": infolist,
@@ -117,9 +172,9 @@ class VarObject(VarObjectBase, VarObjectImageLib):
             "metadata": metadata,
         }
 
-    @cached_property
+    @property
     def namelist(self) -> list[str]:
-        return [val for val, _ in self.infolist]
+        return self.infolist.names
 
     @property
     def is_scene_type(self):
@@ -227,12 +282,13 @@ class VarObject(VarObjectBase, VarObjectImageLib):
             return True
         return False
 
-    @cached_property
+    @property
     def includes_as_list(self) -> list[tuple[str, str, str]]:
+        # Not cached, VarDatabase.repair_index already holds the result for every var
         includes = []
         for row in self.namelist:
             if row != "meta.json" and len(path.splitext(row)[1]) > 0:
-                includes.append((self.var_id, row, path.basename(row)))
+                includes.append((self.var_id, row, intern_path(path.basename(row))))
         return includes
 
     def split_files_on_extension(self, allowed_extensions: list[str]) -> list[str]:
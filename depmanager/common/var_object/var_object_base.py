@@ -4,9 +4,20 @@ from os import path
 
 from depmanager.common.enums.ext import Ext
 from depmanager.common.shared.cached_property import cached_property
+from depmanager.common.shared.cached_property import cached_slots
 
 
 class VarObjectBase:
+    # Only what is costly or used in hot loops is cached, a slot per cached property is held by every var
+    __slots__ = ("root_path", "original_file_path", "info") + cached_slots(
+        "file_path",
+        "relative_path",
+        "version",
+        "var_id",
+        "duplicate_id",
+        "exists",
+    )
+
     INFO = {
         "created": None,
         "modified": None,
@@ -46,38 +57,38 @@ class VarObjectBase:
 
         return self.original_file_path
 
-    @cached_property
+    @property
     def directory(self) -> str:
         return path.dirname(self.file_path)
 
-    @cached_property
+    @property
     def root_directory(self) -> str:
         return path.abspath(path.join(self.directory, ".."))
 
-    @cached_property
+    @property
     def sub_directory(self) -> str:
         return path.split(self.relative_path)[0]
 
-    @cached_property
+    @property
     def filename(self) -> str:
         return path.basename(self.file_path)
 
-    @cached_property
+    @property
     def clean_name(self) -> str:
         return path.basename(self.file_path).replace(Ext.VAR, Ext.EMPTY)
 
-    @cached_property
+    @property
     def _filename_parts(self) -> list[str]:
         parts = self.filename.split(".")
         if len(parts) != 4:
             raise ValueError(f"Var name is invalid. {self.file_path}")
         return parts
 
-    @cached_property
+    @property
     def author(self) -> str:
         return self._filename_parts[0]
 
-    @cached_property
+    @property
     def package_name(self) -> str:
         return self._filename_parts[1]
 
@@ -89,7 +100,7 @@ class VarObjectBase:
     def var_id(self) -> str:
         return f"{self.author}.{self.package_name}.{self.version}"
 
-    @cached_property
+    @property
     def id_as_latest(self) -> str:
         return f"{self.author}.{self.package_name}.latest"
 
@@ -101,11 +112,11 @@ class VarObjectBase:
     def exists(self) -> bool:
         return path.exists(self.file_path)
 
-    @cached_property
+    @property
     def is_versioned(self) -> bool:
         return "versioned" in self.directory
 
-    @cached_property
+    @property
     def is_custom(self) -> bool:
         return str.lower(self.author) == "custom"
 
@@ -0,0 +1,59 @@
+import sys
+from array import array
+from typing import Iterable
+from typing import Iterator
+from typing import Union
+
+# sys.intern is the global path table, the same member path or package name found in thousands of vars
+# (meta.json, Custom/, shared resources...) is only held in memory once.
+intern_path = sys.intern
+
+
+class Infolist:
+    """Compact (filename, size) listing of the members of a var
+
+    Behaves like the list of tuples it replaces, but keeps the interned names in a single list and packs the sizes
+    into an array instead of holding a tuple and an int object for every member.
+    """
+
+    __slots__ = ("names", "sizes")
+
+    def __init__(self, items: Iterable[Union[tuple[str, int], list]] = ()):
+        self.names = []
+        self.sizes = array("Q")
+        for name, size in items:
+            self.names.append(intern_path(name))
+            self.sizes.append(size)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return zip(self.names, self.sizes)
+
+    def __getitem__(self, index: int) -> tuple[str, int]:
+        return self.names[index], self.sizes[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Infolist):
+            return self.names == other.names and self.sizes == other.sizes
+        try:
+            return list(self) == [tuple(item) for item in other]
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Infolist({list(self)!r})"
+
+    def to_list(self) -> list[tuple[str, int]]:
+        return list(self)
+
+
+def compact_used_packages(used_packages: dict[str, Iterable[str]]) -> dict[str, tuple[str, ...]]:
+    """Interned package names mapped to tuples of interned paths, a tuple is far smaller than a set"""
+    return {
+        intern_path(package): tuple(intern_path(package_path) for package_path in package_paths)
+        for package, package_paths in used_packages.items()
+    }
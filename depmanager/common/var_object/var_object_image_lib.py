@@ -1,12 +1,19 @@
-import io
+import functools
 import os
 from collections import defaultdict
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from os import path
+from typing import Callable
+from typing import Iterator
 from typing import Optional
-from zipfile import ZIP_DEFLATED
+from zipfile import BadZipFile
+from zipfile import ZipInfo
 
 import imagequant
+import numpy as np
 import PIL
 from PIL import Image
 from PIL import UnidentifiedImageError
@@ -16,14 +23,45 @@ from depmanager.common.enums.content_type import ContentType
 from depmanager.common.enums.ext import Ext
 from depmanager.common.enums.paths import IMAGE_LIB_DIR
 from depmanager.common.enums.variables import MEGABYTE
-from depmanager.common.enums.variables import TEMP_VAR_NAME
 from depmanager.common.shared.cached_property import cached_property
+from depmanager.common.shared.memory_semaphore import MemorySemaphore
 from depmanager.common.shared.progress_bar import ProgressBar
 from depmanager.common.shared.tools import are_substrings_in_str
+from depmanager.common.shared.tools import temp_var_path
+from depmanager.common.shared.ziptools import ZipCentralDirectory
+from depmanager.common.shared.ziptools import ZipMemberWriter
 from depmanager.common.shared.ziptools import ZipRead
 from depmanager.common.shared.ziptools import ZipReadInto
+from depmanager.common.shared.ziptools import fits_memory_budget
+from depmanager.common.shared.ziptools import get_memory_budget
+from depmanager.common.var_object.compression_cache import CompressionCache
+from depmanager.common.var_object.compression_cache import get_compression_cache
+from depmanager.common.var_object.var_object_compact import Infolist
 
 PIL.Image.MAX_IMAGE_PIXELS = 225000000
+# Modes whose images hold at most 256 colors
+LOW_COLOR_MODES = ("1", "L", "P")
+# Resource image of the types a var without an image of its own is shown with
+DEFAULT_IMAGES = {
+    ContentType.ASSET: "unity.jpg",
+    ContentType.MORPH: "morph.jpg",
+    ContentType.PLUGIN: "plugin.jpg",
+    ContentType.SOUND: "sound.jpg",
+    ContentType.UNITY: "unity.jpg",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _resource_image(file_path: str) -> Image.Image:
+    """A resource image decoded once per process, callers get it shared and must not change it"""
+    with Image.open(file_path) as img:
+        return img.convert("RGB")
+
+
+def _decode_cost(image_data: bytes) -> int:
+    """Rough peak memory of compressing an image, the decoded pixels plus a resized and a quantized copy"""
+    with Image.open(BytesIO(image_data)) as img:
+        return 3 * img.width * img.height * len(img.getbands())
 
 
 def _downsample_image_if_possible(img: Image, allow_4k_scaling=False) -> tuple[Image, bool]:
@@ -39,17 +77,20 @@ def _downsample_image_if_possible(img: Image, allow_4k_scaling=False) -> tuple[I
 
 
 class VarObjectImageLib:
+    __slots__ = ()
+
     contains: dict[str, bool]
     dependencies: list[str]
     var_type: ContentType
 
+    var_id: str
     file_path: str
     directory: str
     sub_directory: str
     clean_name: str
     package_name: str
     namelist: list[str]
-    infolist: list[tuple[str, int]]
+    infolist: Infolist
     files: defaultdict[str, set[str]]
 
     DEPTH_IMAGES = ["_N", "_G", "_S", "norm", "Norm", "NORM", "gloss", "Gloss", "GLOSS", "spec", "Spec", "SPEC"]
@@ -70,7 +111,25 @@ class VarObjectImageLib:
         compressible_png = [
             item for item in self.infolist if path.splitext(item[0])[1] == Ext.PNG and item[1] > 5 * MEGABYTE
         ]
-        return len(compressible_jpg) > 0 or len(compressible_png) > 0
+        if len(compressible_jpg) == 0 and len(compressible_png) == 0:
+            return False
+
+        cache = get_compression_cache()
+        if cache is None:
+            return True
+        # Images earlier runs found not worth compressing, or not images, no longer count
+        candidates = {item[0] for item in compressible_jpg + compressible_png}
+        try:
+            with ZipCentralDirectory(self.file_path) as read_cd:
+                for filename, size, crc in zip(read_cd.names, read_cd.sizes, read_cd.crcs):
+                    if filename not in candidates:
+                        continue
+                    entry = self._cached_compression(cache, self._compression_key(filename, crc, size))
+                    if entry is None or entry["outcome"] == CompressionCache.COMPRESSED:
+                        return True
+        except (BadZipFile, NotImplementedError, OSError):
+            return True
+        return False
 
     @cached_property
     def clothing_image_files(self) -> list[str]:
@@ -120,23 +179,29 @@ class VarObjectImageLib:
 
     @staticmethod
     def _should_quantize_image(img: Image):
+        # Palette and greyscale images never hold more than 256 colors
+        if img.mode in LOW_COLOR_MODES:
+            return True
+
         colors = img.getcolors(maxcolors=100000)
         if colors is None:
             return False
 
         # Check if quantization could be a good option
-        colors = sorted(colors, reverse=True)
-        primary_colors = sum(c[0] for c in colors[:256])
-        all_colors = sum(c[0] for c in colors)
         if len(colors) <= 256:
             return True
-        # Else if dominant pixels make up most of the image
-        if (primary_colors / all_colors) > 0.5:
-            return True
-
-        return False
+        # Else if dominant pixels make up most of the image, only the sum of the 256 largest counts is needed
+        counts = np.fromiter((count for count, _ in colors), dtype=np.int64, count=len(colors))
+        primary_colors = np.partition(counts, len(counts) - 256)[-256:].sum()
+        return bool(primary_colors / counts.sum() > 0.5)
 
     def _compress_image_if_possible(self, img_data: bytes, img_filename: str, png_only=False):
+        return self._compress_image(img_data, img_filename, png_only=png_only)[0]
+
+    def _compress_image(
+        self, img_data: bytes, img_filename: str, png_only=False
+    ) -> tuple[Optional[BytesIO], Optional[str]]:
+        """The compressed image, or None and the reason the image is better left as it is"""
         original_img_data = BytesIO(img_data)
         original_img = Image.open(original_img_data)
         original_image_size = original_img_data.getbuffer().nbytes
@@ -144,11 +209,11 @@ class VarObjectImageLib:
 
         # Only process PNGs
         if png_only and original_image_format != "PNG":
-            return None
+            return None, "format"
 
         # Do not process non-square images, these can have issues rescaling
         if original_img.height != original_img.width:
-            return None
+            return None, "not_square"
 
         # Depth images don't need many colors
         image_is_for_depth_only = are_substrings_in_str(img_filename, self.DEPTH_IMAGES)
@@ -162,7 +227,7 @@ class VarObjectImageLib:
 
         img_downsampled, is_downsampled = _downsample_image_if_possible(original_img, allow_4k_scaling=allow_4k_scaling)
         if not is_downsampled and image_is_small:
-            return None
+            return None, "small"
 
         # Try to store the image at 95 quality
         try:
@@ -171,89 +236,243 @@ class VarObjectImageLib:
             )
             ratio = img_out.getbuffer().nbytes / original_image_size
             if ratio < 0.8:
-                return img_out
+                return img_out, None
             # Give up and return the original image
-            return None
+            return None, "savings"
 
         except (ValueError, OSError):
+            return None, "error"
+
+    def _compression_key(self, filename: str, crc: int, size: int, png_only=False) -> str:
+        # Everything besides the image data that _compress_image decides on
+        settings = (
+            png_only,
+            are_substrings_in_str(filename, self.DEPTH_IMAGES),
+            filename not in self.texture_image_files,
+        )
+        return CompressionCache.key(crc, size, "".join(str(int(flag)) for flag in settings))
+
+    def _cached_compression(self, cache: CompressionCache, key: str) -> Optional[dict]:
+        entry = cache.get(key)
+        if entry is not None and entry["outcome"] == CompressionCache.COMPRESSED:
+            # The image compresses, unless this var as a whole was found not worth compressing
+            return cache.get(CompressionCache.var_key(self.var_id, key)) or entry
+        return entry
+
+    @staticmethod
+    def _settled_image_result(item: ZipInfo, entry: Optional[dict]):
+        """Result of an image member that needs no decoding, None if it has to be compressed"""
+        if not fits_memory_budget(item):
+            # Decoding would exceed the rewrite memory budget, the image is kept as it is
+            return item.file_size, None, None
+        if entry is None or entry["outcome"] == CompressionCache.COMPRESSED:
             return None
+        if entry["outcome"] == CompressionCache.FAILED:
+            return None, None, None
+        return item.file_size, None, None
 
-    def compress(self, png_only=False):
+    def _compress_image_data(self, image_data: bytes, filename: str, png_only: bool):
+        """(image size, compressed image, compression cache outcome) of an image member"""
+        try:
+            image_write, reason = self._compress_image(image_data, filename, png_only=png_only)
+        except UnidentifiedImageError:
+            return None, None, (CompressionCache.FAILED, None, None)
+        if image_write is None:
+            return len(image_data), None, (CompressionCache.SKIPPED, reason, None)
+        return len(image_data), image_write, (CompressionCache.COMPRESSED, None, image_write.getbuffer().nbytes)
+
+    def _compress_admitted_image(self, image_data: bytes, filename: str, png_only: bool, semaphore, cost: int):
+        try:
+            return self._compress_image_data(image_data, filename, png_only)
+        finally:
+            semaphore.release(cost)
+
+    def compress_image_members(
+        self,
+        items: list[ZipInfo],
+        read_member: Callable[[str], bytes],
+        png_only=False,
+        workers=1,
+        outcomes: Optional[dict[str, tuple]] = None,
+    ) -> Iterator[tuple[ZipInfo, Optional[int], Optional[BytesIO]]]:
+        """Compress image members, yields (item, image size, compressed image) in member order
+
+        The image size is None for members that are not images, the compressed image is None when compressing is
+        not worth it. Unless workers is 1 the images are compressed on a thread pool (PIL and imagequant release
+        the GIL while they work), with decodes admitted against the zip memory budget. Images the compression
+        cache already knows are not worth compressing, or are not images, are not decoded again.
+
+        The compression cache outcome of every image decoded is added to outcomes, they are only saved by
+        record_compression_outcomes once the caller knows whether the var keeps its compressed images.
+        """
+        cache = get_compression_cache()
+        keys = {}
+        entries = {}
+        if cache is not None:
+            for item in items:
+                keys[item.filename] = self._compression_key(item.filename, item.CRC, item.file_size, png_only)
+                entries[item.filename] = self._cached_compression(cache, keys[item.filename])
+        results = self._compress_image_results(items, read_member, png_only, workers, entries)
+        for item, image_size, image_write, outcome in results:
+            if cache is not None and outcomes is not None and outcome is not None:
+                outcomes[keys[item.filename]] = outcome
+            yield item, image_size, image_write
+
+    def record_compression_outcomes(self, outcomes: dict[str, tuple], kept: bool) -> None:
+        """Save the outcomes compress_image_members found, kept is False when the var was not worth compressing"""
+        cache = get_compression_cache()
+        if cache is None or len(outcomes) == 0:
+            return
+        for key, outcome in outcomes.items():
+            cache.put(key, *outcome)
+            if not kept and outcome[0] == CompressionCache.COMPRESSED:
+                # The image alone compresses, but not enough for this var to be rewritten, another var holding
+                # the same image decides for itself
+                cache.put(CompressionCache.var_key(self.var_id, key), CompressionCache.SKIPPED, "var_savings")
+        cache.flush()
+
+    def _compress_image_results(
+        self,
+        items: list[ZipInfo],
+        read_member: Callable[[str], bytes],
+        png_only: bool,
+        workers: int,
+        entries: dict[str, Optional[dict]],
+    ):
+        if workers == 1:
+            for item in items:
+                result = self._settled_image_result(item, entries.get(item.filename))
+                if result is None:
+                    result = self._compress_image_data(read_member(item.filename), item.filename, png_only)
+                yield (item, *result)
+            return
+
+        workers = workers if workers > 0 else os.cpu_count() or 1
+        semaphore = MemorySemaphore(get_memory_budget())
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for item in items:
+                settled = self._settled_image_result(item, entries.get(item.filename))
+                if settled is not None:
+                    result = Future()
+                    result.set_result(settled)
+                else:
+                    image_data = read_member(item.filename)
+                    try:
+                        cost = semaphore.acquire(len(image_data) + _decode_cost(image_data))
+                    except UnidentifiedImageError:
+                        result = Future()
+                        result.set_result((None, None, (CompressionCache.FAILED, None, None)))
+                    else:
+                        result = executor.submit(
+                            self._compress_admitted_image, image_data, item.filename, png_only, semaphore, cost
+                        )
+                pending.append((item, result))
+                # Results are held until every earlier member is done, keep a bounded number in flight
+                while len(pending) > 2 * workers or (len(pending) > 0 and pending[0][1].done()):
+                    done_item, done = pending.popleft()
+                    yield (done_item, *done.result())
+            while len(pending) > 0:
+                done_item, done = pending.popleft()
+                yield (done_item, *done.result())
+
+    def compress(self, png_only=False, workers=1):
         # print(f"\nCOMPRESSING: {self.file_path}")
         pre_stat_mb = os.stat(self.file_path).st_size / MEGABYTE
         image_bytes_pre = 0
         image_bytes_post = 0
         images_updated = False
-        temp_file = path.join(self.directory, TEMP_VAR_NAME)
-        with ZipReadInto(self.file_path, temp_file) as (zf_src, zf_dest):
+        temp_file = temp_var_path(self.directory)
+        image_files = set(self.clothing_image_files) | set(self.texture_image_files)
+        removable_image_files = set(self.removable_image_files)
+        outcomes = {}
+        with ZipReadInto(self.file_path, temp_file) as (zf_src, zf_dest), ZipMemberWriter(zf_dest) as writer:
+            image_items = [
+                item
+                for item in zf_src.infolist()
+                if item.filename in image_files and item.filename not in removable_image_files
+            ]
+            compressed = self.compress_image_members(
+                image_items, zf_src.read, png_only=png_only, workers=workers, outcomes=outcomes
+            )
             progress = ProgressBar(len(zf_src.infolist()), description=f"COMPRESSING: {self.clean_name}")
             for item in zf_src.infolist():
                 progress.inc()
-                if item.filename in self.removable_image_files:
+                if item.filename in removable_image_files:
                     print(f"REMOVED {self.clean_name}: {item.filename}")
                     continue
-                if item.filename in self.clothing_image_files or item.filename in self.texture_image_files:
-                    try:
-                        image_data = zf_src.read(item.filename)
-                        image_data_size = io.BytesIO(image_data).getbuffer().nbytes
-                        image_bytes_pre += image_data_size
-
-                        image_write = self._compress_image_if_possible(image_data, item.filename, png_only=png_only)
-                        if image_write is not None:
-                            image_bytes_post += image_write.getbuffer().nbytes
-                            images_updated = True
-                            print(f"UPDATED {self.clean_name}: {item.filename}")
-                            zf_dest.writestr(item.filename, image_write.getvalue(), ZIP_DEFLATED)
-                        else:
-                            image_bytes_post += image_data_size
-                            zf_dest.writestr(item.filename, zf_src.read(item.filename), ZIP_DEFLATED)
-                    except UnidentifiedImageError:
-                        zf_dest.writestr(item.filename, zf_src.read(item.filename), ZIP_DEFLATED)
+                if item.filename not in image_files:
+                    writer.copy(zf_src, item)
+                    continue
+                _, image_size, image_write = next(compressed)
+                if image_size is None:
+                    writer.copy(zf_src, item)
+                    continue
+                image_bytes_pre += image_size
+                if image_write is not None:
+                    image_bytes_post += image_write.getbuffer().nbytes
+                    images_updated = True
+                    print(f"UPDATED {self.clean_name}: {item.filename}")
+                    writer.write(item.filename, image_write.getvalue())
                 else:
-                    zf_dest.writestr(item.filename, zf_src.read(item.filename), ZIP_DEFLATED)
+                    image_bytes_post += image_size
+                    writer.copy(zf_src, item)
+            # Every image has its result, this shuts the compression pool down
+            compressed.close()
 
         print("")
         if images_updated:
             post_stat_mb = os.stat(temp_file).st_size / MEGABYTE
-            savings_raw = pre_stat_mb - post_stat_mb
-            savings_ratio = post_stat_mb / pre_stat_mb
-            image_ratio = image_bytes_post / image_bytes_pre
-            # If we saved more than 10MB, or the compressed size decreased by 20% or the uncompressed size
-            # of the images decreased by 40% then it is worth keeping the compression
-            if savings_raw >= 10 or savings_ratio <= 0.8 or image_ratio <= 0.6:
-                print(f"{self.clean_name} SPACE SAVED: {savings_raw}MB, {savings_ratio}ZR, {image_ratio}IR")
+            if self.compression_is_worthwhile(pre_stat_mb, post_stat_mb, image_bytes_pre, image_bytes_post):
+                self.record_compression_outcomes(outcomes, kept=True)
                 os.remove(self.file_path)
                 os.rename(temp_file, self.file_path)
                 return pre_stat_mb - post_stat_mb
-            print(
-                f"{self.clean_name} INSUFFICIENT SAVINGS: {savings_raw:.2f}MB, {savings_ratio:.2f}ZR, {image_ratio:.2f}IR"
-            )
+        self.record_compression_outcomes(outcomes, kept=False)
         os.remove(temp_file)
         return 0
 
+    def compression_is_worthwhile(
+        self, pre_stat_mb: float, post_stat_mb: float, image_bytes_pre: int, image_bytes_post: int
+    ) -> bool:
+        savings_raw = pre_stat_mb - post_stat_mb
+        savings_ratio = post_stat_mb / pre_stat_mb
+        image_ratio = image_bytes_post / image_bytes_pre
+        # If we saved more than 10MB, or the compressed size decreased by 20% or the uncompressed size
+        # of the images decreased by 40% then it is worth keeping the compression
+        if savings_raw >= 10 or savings_ratio <= 0.8 or image_ratio <= 0.6:
+            print(f"{self.clean_name} SPACE SAVED: {savings_raw}MB, {savings_ratio}ZR, {image_ratio}IR")
+            return True
+        print(
+            f"{self.clean_name} INSUFFICIENT SAVINGS: {savings_raw:.2f}MB, {savings_ratio:.2f}ZR, {image_ratio:.2f}IR"
+        )
+        return False
+
     def get_image(self, image_name, image_format=None) -> Image.Image:
-        if image_format is None:
-            with ZipRead(self.file_path) as zf_src:
+        with ZipRead(self.file_path) as zf_src:
+            if image_format is None:
                 image_data = zf_src.read(f"{image_name}")
-        else:
-            try:
-                with ZipRead(self.file_path) as zf_src:
+            else:
+                try:
                     image_data = zf_src.read(f"{image_name}{image_format}")
-            except KeyError:
-                with ZipRead(self.file_path) as zf_src:
+                except KeyError:
                     image_data = zf_src.read(f"{image_name}{image_format.upper()}")
 
         stream = BytesIO(image_data)
         img = Image.open(stream)
         if img.height != 400 and img.width != 400:
-            img = img.resize((400, 400), Image.LANCZOS)
+            # As Image.thumbnail does, a JPEG is decoded at the smallest scale still past 400 and anything else is
+            # box reduced first, so the full resolution never goes through LANCZOS
+            img.draft(None, (400, 400))
+            img = img.resize((400, 400), Image.LANCZOS, reducing_gap=2.0)
 
         if isinstance(img.info.get("transparency"), bytes):
             img = img.convert("RGBA")
         img = img.convert("RGB")
         return img
 
-    def extract_identity_image_data(self) -> Optional[Image.Image]:
+    def find_identity_image(self) -> Optional[tuple[Optional[str], str]]:
+        """(member, format) of the image the var is shown with, member is None for the default image of its type"""
         files = self.files
         identities = None
         source_image_format = Ext.JPG
@@ -285,14 +504,18 @@ class VarObjectImageLib:
                 return None
 
         if identities is None:
-            image_data = self.extract_default_image_data(self.var_type.type)
-        else:
-            if len(identities) == 1:
-                identity = identities.pop()
-            else:
-                identity = self.get_best_image(identities)
-            image_data = self.get_image(identity, source_image_format)
-        return image_data
+            return None, source_image_format
+        if len(identities) == 1:
+            return next(iter(identities)), source_image_format
+        return self.get_best_image(identities), source_image_format
+
+    def extract_identity_image_data(self) -> Optional[Image.Image]:
+        identity = self.find_identity_image()
+        if identity is None:
+            return None
+        if identity[0] is None:
+            return self.extract_default_image_data(self.var_type.type)
+        return self.get_image(*identity)
 
     def get_best_image(self, identities):
         matches = [ident for ident in identities if path.basename(ident) == self.package_name]
@@ -335,14 +558,6 @@ class VarObjectImageLib:
         return clean_identities[0]
 
     def extract_default_image_data(self, default_type):
-        if default_type == ContentType.ASSET:
-            return Image.open(path.join(IMAGE_RESOURCE_DIR, "unity.jpg")).convert("RGB")
-        if default_type == ContentType.MORPH:
-            return Image.open(path.join(IMAGE_RESOURCE_DIR, "morph.jpg")).convert("RGB")
-        if default_type == ContentType.PLUGIN:
-            return Image.open(path.join(IMAGE_RESOURCE_DIR, "plugin.jpg")).convert("RGB")
-        if default_type == ContentType.SOUND:
-            return Image.open(path.join(IMAGE_RESOURCE_DIR, "sound.jpg")).convert("RGB")
-        if default_type == ContentType.UNITY:
-            return Image.open(path.join(IMAGE_RESOURCE_DIR, "unity.jpg")).convert("RGB")
-        raise ValueError("Type does not support default image data")
+        if default_type not in DEFAULT_IMAGES:
+            raise ValueError("Type does not support default image data")
+        return _resource_image(path.join(IMAGE_RESOURCE_DIR, DEFAULT_IMAGES[default_type])).copy()
@@ -0,0 +1,54 @@
+"""Compare loading remote_db.json with the stdlib json module against the binary database format
+
+Usage: python -m depmanager.scripts.bench_database_load [path]
+The path is the directory holding remote_db.json and defaults to the REMOTE_PATH environment variable.
+The binary copy is written to a temporary directory, the remote is never modified.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from depmanager.common.shared.tools import paused_gc
+from depmanager.common.var_database.var_database_storage import VarDatabaseBinaryStorage
+from depmanager.common.var_database.var_database_storage import VarDatabaseStorage
+from depmanager.common.var_object.var_object import VarObject
+
+
+def legacy_load(file_path: str, root: str) -> int:
+    with open(file_path, "r", encoding="UTF-8") as read_db_file:
+        data = json.load(read_db_file)
+    return len([VarObject.from_dict(data=item, root_path=root) for item in data["vars"]])
+
+
+def storage_load(storage: VarDatabaseStorage, root: str) -> int:
+    with paused_gc():
+        return len([VarObject.from_dict(data=item, root_path=root) for item in storage.load()])
+
+
+def main(root: str) -> None:
+    json_storage = VarDatabaseStorage(root)
+    records = json_storage.load()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        binary_storage = VarDatabaseBinaryStorage(temp_dir)
+        binary_storage.save(root, records)
+
+        print(f"json:   {os.path.getsize(json_storage.file_path) / 1024 / 1024:.1f}MB")
+        print(f"binary: {os.path.getsize(binary_storage.file_path) / 1024 / 1024:.1f}MB")
+        for name, func in (
+            ("json.load", lambda: legacy_load(json_storage.file_path, root)),
+            ("binary", lambda: storage_load(binary_storage, root)),
+        ):
+            start = time.perf_counter()
+            count = func()
+            print(f"{name:>10}: {count} vars in {time.perf_counter() - start:.3f}s")
+
+        var_id = os.path.basename(records[-1]["file_path"])[:-4]
+        start = time.perf_counter()
+        binary_storage.load_record(var_id)
+        print(f"single record {var_id}: {(time.perf_counter() - start) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getenv("REMOTE_PATH", "."))
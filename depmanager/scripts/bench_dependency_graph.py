@@ -0,0 +1,103 @@
+"""Resolving the required dependencies of every var with the fixed point loop against the dependency graph
+
+Usage: python -m depmanager.scripts.bench_dependency_graph [vars]
+Two synthetic databases of vars (default 60000) are resolved, both two thirds assets, a quarter looks and the rest
+scenes, a third of the references as .latest:
+    layered: looks use a handful of assets, scenes use looks and assets, assets use nothing
+    chained: as layered, but clothing and hair assets use texture and morph packs or another asset of their
+             creator, and looks build on other looks, the way a real library nests
+Both ways are checked to resolve the same dependencies.
+"""
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from depmanager.common.var_database.var_database import VarDatabase
+
+
+class BenchVar:
+    __slots__ = ("var_id", "duplicate_id", "version", "dependencies", "used_dependencies")
+
+    def __init__(self, var_id: str, used_dependencies: list[str]):
+        self.var_id = var_id
+        duplicate_id, version = var_id.rsplit(".", 1)
+        self.duplicate_id = duplicate_id
+        self.version = int(version)
+        self.dependencies = used_dependencies
+        self.used_dependencies = used_dependencies
+
+
+def build_vars(count: int, chained: bool) -> dict[str, BenchVar]:
+    rng = random.Random(0)
+
+    def reference(var_id: str) -> str:
+        return f"{var_id.rsplit('.', 1)[0]}.latest" if rng.random() < 0.33 else var_id
+
+    assets = [f"author_{index % 500}.asset_{index}.1" for index in range(count * 2 // 3)]
+    looks = [f"author_{index % 500}.look_{index}.1" for index in range(count // 4)]
+    scenes = [f"author_{index % 500}.scene_{index}.1" for index in range(count - len(assets) - len(looks))]
+    packs = len(assets) * 3 // 8
+    var_refs = {}
+    for position, var_id in enumerate(assets):
+        dependencies = []
+        if chained and position >= packs:
+            dependencies = rng.sample(assets[:packs], rng.randint(1, 2))
+            if rng.random() < 0.3:
+                dependencies.append(assets[rng.randint(max(packs, position - 50), position - 1)])
+        var_refs[var_id] = BenchVar(var_id, [reference(dep_id) for dep_id in dependencies])
+    for position, var_id in enumerate(looks):
+        dependencies = rng.sample(assets, 5)
+        if chained and position > 0 and rng.random() < 0.3:
+            dependencies.append(looks[rng.randint(max(0, position - 50), position - 1)])
+        var_refs[var_id] = BenchVar(var_id, [reference(dep_id) for dep_id in dependencies])
+    for var_id in scenes:
+        dependencies = rng.sample(looks, 3) + rng.sample(assets, 5)
+        var_refs[var_id] = BenchVar(var_id, [reference(dep_id) for dep_id in dependencies])
+    return var_refs
+
+
+def fixed_point(database: VarDatabase) -> defaultdict[str, set]:
+    """The required_dependencies loop the dependency graph replaced"""
+    required = defaultdict(set)
+    for var_id in database.vars:
+        dependencies = set(database[var_id].used_dependencies)
+        while True:
+            additional_dependencies = set()
+            for dependency in dependencies:
+                dep_id = database.get_var_name(dependency)
+                if dep_id is None:
+                    continue
+                additional_dependencies.update(database[dep_id].used_dependencies)
+            new_dependencies = additional_dependencies - dependencies
+            if len(new_dependencies) == 0:
+                break
+            dependencies.update(new_dependencies)
+        required[var_id] = dependencies
+    return required
+
+
+def dependency_graph(database: VarDatabase) -> defaultdict[str, set]:
+    return database.required_dependencies
+
+
+def main(count: int) -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database = VarDatabase(root=temp_dir, image_root=temp_dir, workers=1)
+        for shape in ("layered", "chained"):
+            database.vars = build_vars(count, shape == "chained")
+            print(f"{shape}, {len(database.vars)} vars")
+            results = []
+            for name, func in (("fixed point", fixed_point), ("dependency graph", dependency_graph)):
+                database.clear()
+                # Shared by both, the versions are not part of the resolution
+                database.vars_versions  # pylint: disable=pointless-statement
+                start = time.perf_counter()
+                results.append(func(database))
+                print(f"{name:>18}: {time.perf_counter() - start:.2f}s")
+            assert results[0] == results[1]
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60000)
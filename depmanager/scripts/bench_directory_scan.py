@@ -0,0 +1,48 @@
+"""Compare the legacy os.walk + multiprocessing stat pool against the scandir walker
+
+Usage: python -m depmanager.scripts.bench_directory_scan [path]
+The path defaults to the REMOTE_PATH environment variable.
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+from depmanager.common.enums.ext import Ext
+from depmanager.common.enums.paths import IMAGE_LIB_DIR
+from depmanager.common.enums.paths import REMOVED_DIR
+from depmanager.common.enums.paths import REPAIR_LIB_DIR
+from depmanager.common.shared.tools import get_file_stat
+from depmanager.common.shared.tools import scan_directory_files
+
+
+def ignore_directory(dirpath: str) -> bool:
+    return IMAGE_LIB_DIR in dirpath or REPAIR_LIB_DIR in dirpath or "_ignore" in dirpath or REMOVED_DIR in dirpath
+
+
+def legacy_directory_files(root: str) -> list[tuple[str, float, float]]:
+    files = []
+    for (dirpath, _, filenames) in os.walk(root):
+        if ignore_directory(dirpath):
+            continue
+        files.extend(os.path.join(dirpath, f) for f in filenames if len(f) > 4 and f[-4:] == Ext.VAR)
+    with multiprocessing.Pool() as m_pool:
+        return list(m_pool.map(get_file_stat, files))
+
+
+def main(root: str, rounds: int = 3) -> None:
+    for name, func in (
+        ("os.walk + stat pool", legacy_directory_files),
+        ("scandir walker", lambda r: scan_directory_files(r, Ext.VAR, ignore=ignore_directory)),
+    ):
+        timings = []
+        files = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            files = func(root)
+            timings.append(time.perf_counter() - start)
+        print(f"{name:>20}: {len(files)} vars, best {min(timings):.3f}s, mean {sum(timings) / rounds:.3f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getenv("REMOTE_PATH", "."))
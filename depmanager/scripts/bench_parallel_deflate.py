@@ -0,0 +1,68 @@
+"""Deflating the members of a var rewrite with zipfile against ZipMemberWriter on a thread pool
+
+Usage: python -m depmanager.scripts.bench_parallel_deflate [size_mb] [workers] [directory]
+A synthetic var of size_mb (default 500) of stored json like members is written to directory (defaults to the
+system temp directory), then rewritten deflated, by zipfile and by ZipMemberWriter with workers threads (default
+one per core). Both outputs are checked to hold the same members.
+"""
+import os
+import random
+import tempfile
+from os import path
+from zipfile import ZIP_DEFLATED
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+
+from depmanager.common.shared.ziptools import ZipMemberWriter
+from depmanager.common.shared.ziptools import ZipReadInto
+from depmanager.common.shared.ziptools import copy_zip_member
+from depmanager.scripts.bench_tools import argument
+from depmanager.scripts.bench_tools import build_var
+from depmanager.scripts.bench_tools import removed_after
+from depmanager.scripts.bench_tools import time_rewrite
+
+MEMBER_SIZE = 8 * 1024 * 1024
+
+
+def build_scene_var(file_path: str, size_mb: int) -> None:
+    rng = random.Random(0)
+    # Text with enough repeats to deflate to a fraction, but not so many that deflate has nothing to do
+    words = [rng.randbytes(6).hex().encode() for _ in range(4096)]
+    block = b" ".join(rng.choice(words) for _ in range(MEMBER_SIZE // 13))[:MEMBER_SIZE]
+    build_var(file_path, size_mb, block, "Saves/scene/scene_{}.json", ZIP_STORED)
+
+
+def rewrite_zipfile(read_path: str, write_path: str, _: int) -> None:
+    with ZipReadInto(read_path, write_path) as (read_zf, zf_dest):
+        for item in read_zf.infolist():
+            copy_zip_member(read_zf, zf_dest, item, ZIP_DEFLATED)
+
+
+def rewrite_member_writer(read_path: str, write_path: str, workers: int) -> None:
+    with ZipReadInto(read_path, write_path) as (read_zf, zf_dest), ZipMemberWriter(zf_dest, workers) as writer:
+        for item in read_zf.infolist():
+            writer.copy(read_zf, item)
+
+
+def members(file_path: str) -> list[tuple[str, int, int, int]]:
+    with ZipFile(file_path) as read_zf:
+        assert read_zf.testzip() is None
+        return [(item.filename, item.compress_type, item.compress_size, item.CRC) for item in read_zf.infolist()]
+
+
+def main(size_mb: int, workers: int, directory: str) -> None:
+    read_path = path.join(directory, "bench.deflate.1.var")
+    write_paths = [path.join(directory, "bench.deflate.2.var"), path.join(directory, "bench.deflate.3.var")]
+    workers = workers if workers > 0 else os.cpu_count() or 1
+    with removed_after(read_path, *write_paths):
+        build_scene_var(read_path, size_mb)
+        print(f"{size_mb}MB var, {workers} workers on {os.cpu_count()} cores")
+        for write_path, (name, func) in zip(
+            write_paths, (("zipfile", rewrite_zipfile), ("ZipMemberWriter", rewrite_member_writer))
+        ):
+            time_rewrite(name, size_mb, func, read_path, write_path, workers)
+        assert members(write_paths[0]) == members(write_paths[1])
+
+
+if __name__ == "__main__":
+    main(argument(1, 500), argument(2, 0), argument(3, tempfile.gettempdir()))
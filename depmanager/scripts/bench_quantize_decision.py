@@ -0,0 +1,57 @@
+"""The PNG quantization decision of VarObjectImageLib against the sort and sum it replaced
+
+Usage: python -m depmanager.scripts.bench_quantize_decision [size]
+Synthetic size x size (default 4096) images, from a handful of colors to pure noise, are each decided both ways.
+"""
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from depmanager.common.var_object.var_object_image_lib import VarObjectImageLib
+
+
+def should_quantize_sorted(img: Image.Image) -> bool:
+    colors = img.getcolors(maxcolors=100000)
+    if colors is None:
+        return False
+    colors = sorted(colors, reverse=True)
+    primary_colors = sum(c[0] for c in colors[:256])
+    all_colors = sum(c[0] for c in colors)
+    if len(colors) <= 256:
+        return True
+    return (primary_colors / all_colors) > 0.5
+
+
+def build_images(size: int) -> dict[str, Image.Image]:
+    rng = np.random.default_rng(0)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    gradient = np.stack([np.add.outer(ramp, ramp * 0), np.add.outer(ramp * 0, ramp), np.add.outer(ramp, ramp) / 2], -1)
+    images = {"gradient (98k colors)": Image.fromarray(gradient.astype(np.uint8))}
+    for colors in (200, 5000, 60000):
+        palette = rng.integers(0, 255, (colors, 3), dtype=np.uint8)
+        # Zipf like weights, a few colors dominate
+        weights = 1 / np.arange(1, colors + 1)
+        pixels = rng.choice(colors, (size, size), p=weights / weights.sum())
+        images[f"{colors} colors"] = Image.fromarray(palette[pixels])
+    images["5000 colors RGBA"] = images["5000 colors"].convert("RGBA")
+    images["palette"] = images["200 colors"].convert("P")
+    images["noise"] = Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8))
+    return images
+
+
+def main(size: int) -> None:
+    for name, img in build_images(size).items():
+        timings = []
+        decisions = []
+        for func in (should_quantize_sorted, VarObjectImageLib._should_quantize_image):  # pylint: disable=W0212
+            start = time.perf_counter()
+            decisions.append(func(img))
+            timings.append(time.perf_counter() - start)
+        assert decisions[0] == decisions[1], name
+        print(f"{name:>22}: {decisions[0]!s:>5} sorted {timings[0]:.3f}s, vectorised {timings[1]:.3f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4096)
@@ -0,0 +1,54 @@
+"""Throughput of RawParser.scan_with_paths against the byte level scan_bytes_with_paths
+
+Usage: python -m depmanager.scripts.bench_reference_scan [path] [limit]
+Every json, vap and vaj member of the vars found under path (defaults to the REMOTE_PATH environment variable)
+is decompressed into memory first, so only the scanning itself is timed. limit caps the number of vars read.
+"""
+import io
+import os
+import sys
+import time
+from os import path
+
+from depmanager.common.enums.ext import Ext
+from depmanager.common.parser.parser import VarParser
+from depmanager.common.shared.tools import scan_directory_files
+from depmanager.common.shared.ziptools import ZipRead
+
+
+def load_members(root: str, limit: int) -> list[bytes]:
+    members = []
+    for file_path, _, _ in scan_directory_files(root, Ext.VAR)[:limit]:
+        with ZipRead(file_path) as read_zf:
+            for item in read_zf.namelist():
+                if item != "meta.json" and path.splitext(item)[1].lower() in (Ext.JSON, Ext.VAP, Ext.VAJ):
+                    members.append(read_zf.read(item))
+    return members
+
+
+def scan_lines(data: bytes) -> dict[str, set[str]]:
+    with io.TextIOWrapper(io.BytesIO(data), encoding="UTF-8") as read_item:
+        return VarParser.scan_with_paths(read_item.readlines())
+
+
+def main(root: str, limit: int) -> None:
+    members = load_members(root, limit)
+    total = sum(len(member) for member in members) / 1024 / 1024
+    print(f"{len(members)} members, {total:.1f}MB")
+
+    results = {}
+    for name, func in (("scan_with_paths", scan_lines), ("scan_bytes_with_paths", VarParser.scan_bytes_with_paths)):
+        start = time.perf_counter()
+        results[name] = [func(member) for member in members]
+        elapsed = time.perf_counter() - start
+        print(f"{name:>22}: {elapsed:.3f}s {total / elapsed:.1f}MB/s")
+
+    differences = sum(1 for old, new in zip(*results.values()) if old != new)
+    print(f"members with different results: {differences}")
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else os.getenv("REMOTE_PATH", "."),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
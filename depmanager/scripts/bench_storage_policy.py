@@ -0,0 +1,77 @@
+"""CPU time of writing and reading back a var with every member deflated against the zip storage policy
+
+Usage: python -m depmanager.scripts.bench_storage_policy [size_mb] [directory]
+A synthetic var of size_mb (default 200) of jpg, png and assetbundle like members (incompressible) alongside json
+scenes is written to directory (defaults to the system temp directory) both ways, then read back.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from os import path
+from zipfile import ZIP_DEFLATED
+from zipfile import ZipFile
+
+from depmanager.common.shared.ziptools import StoragePolicy
+from depmanager.common.shared.ziptools import ZipWrite
+
+MEMBER_SIZE = 4 * 1024 * 1024
+
+
+def members(size_mb: int) -> list[tuple[str, bytes]]:
+    rng = random.Random(0)
+    media = rng.randbytes(MEMBER_SIZE)
+    scene = b'{"id": "Person", "position": {"x": "0.1", "y": "1.2", "z": "0.0"}},' * (MEMBER_SIZE // 64)
+    result = [("meta.json", b'{"dependencies": {}}')]
+    for position in range(max(1, size_mb * 1024 * 1024 // MEMBER_SIZE)):
+        name = ("Custom/Atom/Person/Textures/texture_{}.jpg", "Custom/Assets/bundle_{}.assetbundle")[position % 2]
+        result.append((name.format(position), media))
+        if position % 4 == 0:
+            result.append((f"Saves/scene/scene_{position}.json", scene))
+    return result
+
+
+def write_deflated(file_path: str, var_members: list[tuple[str, bytes]]) -> None:
+    with ZipWrite(file_path) as zf_dest:
+        for name, data in var_members:
+            zf_dest.writestr(name, data, ZIP_DEFLATED)
+
+
+def write_policy(file_path: str, var_members: list[tuple[str, bytes]]) -> None:
+    policy = StoragePolicy()
+    with ZipWrite(file_path) as zf_dest:
+        for name, data in var_members:
+            policy.write(zf_dest, name, data)
+
+
+def read_all(file_path: str) -> None:
+    with ZipFile(file_path) as read_zf:
+        for item in read_zf.infolist():
+            read_zf.read(item)
+
+
+def main(size_mb: int, directory: str) -> None:
+    var_members = members(size_mb)
+    print(f"{size_mb}MB var, {len(var_members)} members")
+    for name, func in (("all deflated", write_deflated), ("storage policy", write_policy)):
+        file_path = path.join(directory, "bench.storage.1.var")
+        try:
+            start = time.process_time()
+            func(file_path, var_members)
+            written = time.process_time() - start
+            start = time.process_time()
+            read_all(file_path)
+            read = time.process_time() - start
+            size_mb_on_disk = os.stat(file_path).st_size / 1024 / 1024
+            print(f"{name:>15}: write {written:.2f}s CPU, read {read:.2f}s CPU, {size_mb_on_disk:.1f}MB on disk")
+        finally:
+            if path.exists(file_path):
+                os.remove(file_path)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        sys.argv[2] if len(sys.argv) > 2 else tempfile.gettempdir(),
+    )
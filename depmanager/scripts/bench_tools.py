@@ -0,0 +1,39 @@
+"""Synthetic vars and timing shared by the zip rewrite benchmarks"""
+import contextlib
+import os
+import sys
+import time
+from os import path
+from typing import Callable
+from typing import Iterator
+from zipfile import ZipFile
+
+
+def build_var(file_path: str, size_mb: int, block: bytes, member_name: str, compression: int) -> None:
+    """A var of meta.json and size_mb of copies of block, the members named member_name.format(position)"""
+    with ZipFile(file_path, "w", compression=compression) as write_zf:
+        write_zf.writestr("meta.json", b'{"dependencies": {}}')
+        for position in range(max(1, size_mb * 1024 * 1024 // len(block))):
+            write_zf.writestr(member_name.format(position), block)
+
+
+def time_rewrite(name: str, size_mb: int, rewrite: Callable[..., None], *args) -> None:
+    start = time.perf_counter()
+    rewrite(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>18}: {elapsed:.2f}s {size_mb / elapsed:.1f}MB/s")
+
+
+@contextlib.contextmanager
+def removed_after(*file_paths: str) -> Iterator[None]:
+    try:
+        yield
+    finally:
+        for file_path in file_paths:
+            if path.exists(file_path):
+                os.remove(file_path)
+
+
+def argument(position: int, default):
+    """Command line argument position, converted to the type of default"""
+    return type(default)(sys.argv[position]) if len(sys.argv) > position else default
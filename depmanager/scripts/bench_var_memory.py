@@ -0,0 +1,106 @@
+"""Measure the memory held per VarObject with the compact representation against the previous layout
+
+Usage: python -m depmanager.scripts.bench_var_memory [path]
+The path is the directory holding the remote database and defaults to the REMOTE_PATH environment variable.
+Without a database a synthetic remote of 5000 vars is generated in memory.
+The previous layout (infolist tuples, namelist copy, used_packages sets, cached includes) is rebuilt from the same
+records so both sides hold exactly the same data.
+"""
+import gc
+import os
+import sys
+import tracemalloc
+from os import path
+
+from depmanager.common.enums.formats import DatabaseFormat
+from depmanager.common.var_database.var_database_formats import get_database_storage
+from depmanager.common.var_object.var_object import VarObject
+
+
+def synthetic_records(count: int) -> list[dict]:
+    records = []
+    for index in range(count):
+        author = f"author_{index % 200}"
+        infolist = [["meta.json", 900], ["Custom/", 0], ["Custom/Atom/", 0]]
+        infolist += [[f"Custom/Atom/Person/Textures/{author}/texture_{item}.jpg", 250000 + item] for item in range(60)]
+        infolist += [[f"Saves/scene/{author}/scene_{index}_{item}.json", 80000] for item in range(5)]
+        used_packages = {
+            "SELF": [name for name, _ in infolist[3:23]],
+            f"author_{(index + 1) % 200}.package.latest": [
+                f"Custom/Atom/Person/Textures/shared_{item}.jpg" for item in range(40)
+            ],
+        }
+        records.append(
+            {
+                "file_path": path.join("assets", f"{author}.package_{index}.1.var"),
+                "info": {"created": 1.0, "modified": 2.0, "size": 1000},
+                "contains": {"asset": True, "scene": True},
+                "infolist": infolist,
+                "dependencies": list(used_packages)[1:],
+                "used_packages": used_packages,
+                "metadata": {"licenseType": "CC BY", "creatorName": author, "packageName": f"package_{index}"},
+            }
+        )
+    return records
+
+
+def legacy_layout(record: dict) -> dict:
+    """The per var containers the previous VarObject held once namelist and includes_as_list were cached"""
+    var_id = path.basename(record["file_path"])[:-4]
+    infolist = list(map(tuple, record["infolist"]))
+    namelist = [name for name, _ in infolist]
+    return {
+        "infolist": infolist,
+        "namelist": namelist,
+        "includes": [(var_id, name, path.basename(name)) for name in namelist if "." in name and name != "meta.json"],
+        "used_packages": {key: set(val) for key, val in record["used_packages"].items()},
+        "dependencies": list(record["dependencies"]),
+        "metadata": dict(record["metadata"]),
+    }
+
+
+def compact_layout(record: dict) -> VarObject:
+    var = VarObject.from_dict(data=record, root_path=".")
+    _ = var.includes_as_list
+    # Every database load keys its vars by id and version
+    _ = var.var_id, var.duplicate_id, var.version
+    return var
+
+
+def measure(build, records: list[dict]) -> int:
+    # orjson returns fresh strings for every record, copies mimic that so interning has the same work to do
+    copies = [
+        {**record, "infolist": [[str(name + " ")[:-1], size] for name, size in record["infolist"]]}
+        for record in records
+    ]
+    gc.collect()
+    tracemalloc.start()
+    built = [build(record) for record in copies]
+    del copies
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return current
+
+
+def main(root: str = None) -> None:
+    records = None
+    if root is not None:
+        for db_format in (DatabaseFormat.BINARY, DatabaseFormat.SQLITE, DatabaseFormat.JSON):
+            storage = get_database_storage(root, db_format)
+            if storage.exists():
+                records = storage.load()
+                break
+    if records is None:
+        records = synthetic_records(5000)
+
+    members = sum(len(record["infolist"]) for record in records)
+    print(f"{len(records)} vars, {members} members")
+    for name, build in (("previous", legacy_layout), ("compact", compact_layout)):
+        used = measure(build, records)
+        print(f"{name:>10}: {used / 1024 / 1024:.1f}MB, {used / len(records):.0f} bytes per var")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else os.getenv("REMOTE_PATH"))
@@ -0,0 +1,59 @@
+"""Rewriting a var to change meta.json, re-encoding every member against copy_zip_member
+
+Usage: python -m depmanager.scripts.bench_zip_rewrite [size_mb] [directory]
+A synthetic var of size_mb (default 500) of compressible assetbundle and texture like members is written to
+directory (defaults to the system temp directory), then rewritten both ways.
+"""
+import os
+import random
+import tempfile
+from os import path
+from zipfile import ZIP_DEFLATED
+
+from depmanager.common.shared.ziptools import ZipReadInto
+from depmanager.common.shared.ziptools import copy_zip_member
+from depmanager.scripts.bench_tools import argument
+from depmanager.scripts.bench_tools import build_var
+from depmanager.scripts.bench_tools import removed_after
+from depmanager.scripts.bench_tools import time_rewrite
+
+MEMBER_SIZE = 16 * 1024 * 1024
+
+
+def build_bundle_var(file_path: str, size_mb: int) -> None:
+    rng = random.Random(0)
+    # Half random, half repeated, so deflate has real work to do
+    block = rng.randbytes(MEMBER_SIZE // 2) + bytes(MEMBER_SIZE // 2)
+    build_var(file_path, size_mb, block, "Custom/Assets/author/bundle_{}.assetbundle", ZIP_DEFLATED)
+
+
+def rewrite_recompress(read_path: str, write_path: str) -> None:
+    with ZipReadInto(read_path, write_path) as (read_zf, zf_dest):
+        for item in read_zf.infolist():
+            if item.filename == "meta.json":
+                zf_dest.writestr(item.filename, b'{"dependencies": {"a.b.latest": {}}}')
+            else:
+                zf_dest.writestr(item.filename, read_zf.read(item.filename))
+
+
+def rewrite_raw_copy(read_path: str, write_path: str) -> None:
+    with ZipReadInto(read_path, write_path) as (read_zf, zf_dest):
+        for item in read_zf.infolist():
+            if item.filename == "meta.json":
+                zf_dest.writestr(item.filename, b'{"dependencies": {"a.b.latest": {}}}')
+            else:
+                copy_zip_member(read_zf, zf_dest, item)
+
+
+def main(size_mb: int, directory: str) -> None:
+    read_path = path.join(directory, "bench.rewrite.1.var")
+    write_path = path.join(directory, "bench.rewrite.2.var")
+    with removed_after(read_path, write_path):
+        build_bundle_var(read_path, size_mb)
+        print(f"{size_mb}MB var, {os.stat(read_path).st_size / 1024 / 1024:.1f}MB on disk")
+        for name, func in (("writestr(read())", rewrite_recompress), ("copy_zip_member", rewrite_raw_copy)):
+            time_rewrite(name, size_mb, func, read_path, write_path)
+
+
+if __name__ == "__main__":
+    main(argument(1, 500), argument(2, tempfile.gettempdir()))
@@ -18,6 +18,13 @@ def mock_image_dir():
         yield
 
 
+@pytest.fixture(name="resource_image_dir")
+def fixture_resource_image_dir(monkeypatch):
+    monkeypatch.setattr(
+        "depmanager.common.var_object.var_object_image_lib.IMAGE_RESOURCE_DIR", os.path.abspath("../resources")
+    )
+
+
 @pytest.fixture(name="test_data_dir")
 def fixture_test_data_dir():
     return "test_data"
@@ -0,0 +1,62 @@
+import random
+
+from depmanager.common.shared.dependency_graph import DependencyGraph
+
+
+def _naive_closure(edges, node):
+    reachable = set()
+    pending = list(edges.get(node, []))
+    while pending:
+        current = pending.pop()
+        if current in reachable or current not in edges:
+            continue
+        reachable.add(current)
+        pending.extend(edges[current])
+    return reachable
+
+
+def test_dependency_graph_closures_and_cycles():
+    edges = {
+        "scene": ["look", "asset"],
+        "look": ["asset", "missing"],
+        "asset": [],
+        "cycle_a": ["cycle_b"],
+        "cycle_b": ["cycle_a", "asset"],
+        "self": ["self"],
+    }
+    graph = DependencyGraph(edges)
+
+    assert graph.closure("scene") == {"look", "asset"}
+    assert graph.closure("asset") == set()
+    assert graph.closure("cycle_a") == {"cycle_a", "cycle_b", "asset"}
+    assert graph.closure("self") == {"self"}
+    assert graph.closure("unknown") == set()
+    assert graph.reverse_closure("asset") == {"scene", "look", "cycle_a", "cycle_b"}
+    assert graph.reverse_closure("scene") == set()
+    assert graph.cycles() == [["cycle_a", "cycle_b"], ["self"]]
+
+
+def test_dependency_graph_matches_naive_closure():
+    rng = random.Random(7)
+    nodes = [f"author.package_{index}.1" for index in range(300)]
+    edges = {node: rng.sample(nodes, rng.randint(0, 4)) for node in nodes}
+    graph = DependencyGraph(edges)
+
+    for node in nodes:
+        assert graph.closure(node) == _naive_closure(edges, node)
+        assert graph.reverse_closure(node) == {other for other in nodes if node in _naive_closure(edges, other)}
+
+
+def test_dependency_graph_collects_labels():
+    rng = random.Random(11)
+    nodes = [f"author.package_{index}.1" for index in range(300)]
+    edges = {node: rng.sample(nodes, rng.randint(0, 3)) for node in nodes}
+    labels = {node: [f"{node}:label_{index}" for index in range(rng.randint(0, 2))] for node in nodes}
+    graph = DependencyGraph(edges, labels)
+
+    for node in nodes:
+        expected = set(labels[node])
+        for dep_id in _naive_closure(edges, node):
+            expected.update(labels[dep_id])
+        assert graph.collect(node) == expected
+    assert graph.collect("unknown") == frozenset()
@@ -0,0 +1,54 @@
+import os
+import random
+
+from depmanager.common.shared.fuzzy_index import FuzzyFileIndex
+from depmanager.common.shared.fuzzy_index import FuzzyIndex
+from depmanager.common.shared.fuzzy_index import fuzzy_scores
+from depmanager.common.shared.tools import fuzzy_compare_strings
+
+
+def _naive_find(filepath, included_files, threshold):
+    found = [
+        (var_id, file_path, fuzzy_compare_strings(filepath, file_path))
+        for var_id, file_path, file_only in included_files
+        if os.path.splitext(filepath)[1] == os.path.splitext(file_only)[1]
+    ]
+    found = [item for item in found if item[2] < threshold]
+    if len(found) == 0:
+        return None, None
+    best = min(item[2] for item in found)
+    return next((var_id, file_path) for var_id, file_path, score in found if score == best)
+
+
+def test_fuzzy_scores_match_compare_strings():
+    candidates = ["Custom/Atom/Person/hair.vam", "", "ÄÄb", "custom/atom/person/hair2.vam"]
+    for query in ("Custom/Atom/Person/Hair.vam", "Äb", ""):
+        assert list(fuzzy_scores(query, candidates)) == [fuzzy_compare_strings(query, item) for item in candidates]
+
+
+def test_fuzzy_index_search():
+    index = FuzzyIndex(["abc", "abd", "xyz", "aabbcc"])
+    positions, scores = index.search("abc", 2)
+    assert list(positions) == [0, 1, 3]
+    assert list(scores) == [0, 1, 0]
+    assert index.nearest("abc", 1) == 0
+    assert index.nearest("qqq", 3) is None
+
+
+def test_fuzzy_file_index_matches_naive_search():
+    rng = random.Random(5)
+    alphabet = "abcdefg_/.É"
+    included_files = []
+    for position in range(500):
+        name = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 16)))
+        file_path = f"Custom/{name}{rng.choice(['.vaj', '.vam', '.jpg', ''])}"
+        included_files.append((f"author.package.{position % 5}", file_path, os.path.basename(file_path)))
+    index = FuzzyFileIndex(included_files)
+
+    for _ in range(100):
+        query = list(rng.choice(included_files)[1])
+        for _ in range(rng.randint(0, 3)):
+            query[rng.randrange(len(query))] = rng.choice(alphabet)
+        query = "".join(query)
+        for threshold in (1, 3):
+            assert index.find(query, threshold) == _naive_find(query, included_files, threshold)
@@ -0,0 +1,20 @@
+import threading
+import time
+
+from depmanager.common.shared.memory_semaphore import MemorySemaphore
+
+
+def test_memory_semaphore_clamps_and_blocks():
+    semaphore = MemorySemaphore(100)
+    assert semaphore.acquire(1000) == 100
+    assert semaphore.available == 0
+
+    acquired = []
+    waiting = threading.Thread(target=lambda: acquired.append(semaphore.acquire(30)))
+    waiting.start()
+    time.sleep(0.05)
+    assert not acquired
+    semaphore.release(100)
+    waiting.join(1)
+    assert acquired == [30]
+    assert semaphore.available == 70
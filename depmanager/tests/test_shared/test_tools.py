@@ -0,0 +1,48 @@
+import os
+
+from depmanager.common.enums.ext import Ext
+from depmanager.common.shared.tools import is_temp_var
+from depmanager.common.shared.tools import scan_directory_files
+from depmanager.common.shared.tools import temp_var_path
+
+
+def _touch(file_path, size=1):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as write_file:
+        write_file.write(b"0" * size)
+
+
+def test_scan_directory_files_returns_stats_and_prunes(tmp_path):
+    root = str(tmp_path)
+    expected = [
+        os.path.join(root, "a.b.1.var"),
+        os.path.join(root, "assets", "hair", "c.d.2.var"),
+        os.path.join(root, "scenes", "e.f.3.var"),
+    ]
+    for index, file_path in enumerate(expected):
+        _touch(file_path, size=index + 1)
+    _touch(os.path.join(root, "scenes", "e.f.3.json"))
+    _touch(os.path.join(root, "_ignore", "g.h.1.var"))
+    _touch(os.path.join(root, "assets", "removed", "i.j.1.var"))
+
+    files = scan_directory_files(root, Ext.VAR, ignore=lambda d: "_ignore" in d or "removed" in d)
+
+    assert [f[0] for f in files] == sorted(expected)
+    for file_path, mtime, size in files:
+        stats = os.stat(file_path)
+        assert mtime == stats.st_mtime
+        assert size == stats.st_size
+
+
+def test_scan_directory_files_ignored_root(tmp_path):
+    _touch(os.path.join(str(tmp_path), "a.b.1.var"))
+    assert scan_directory_files(str(tmp_path), Ext.VAR, ignore=lambda d: True) == []
+
+
+def test_temp_var_path_is_unique_and_recognised(tmp_path):
+    first, second = temp_var_path(str(tmp_path)), temp_var_path(str(tmp_path))
+    assert first != second
+    assert os.path.dirname(first) == str(tmp_path)
+    assert is_temp_var(os.path.basename(first))
+    assert is_temp_var("temp.temp.1.var")
+    assert not is_temp_var("author.temp.1.var")
@@ -0,0 +1,212 @@
+import random
+import tracemalloc
+import zipfile
+
+import pytest
+
+from depmanager.common.shared.ziptools import StoragePolicy
+from depmanager.common.shared.ziptools import ZipCentralDirectory
+from depmanager.common.shared.ziptools import ZipMemberWriter
+from depmanager.common.shared.ziptools import ZipReadInto
+from depmanager.common.shared.ziptools import copy_zip_member
+from depmanager.common.shared.ziptools import get_memory_budget
+from depmanager.common.shared.ziptools import set_memory_budget
+
+
+def _write_zip(file_path, members, compression=zipfile.ZIP_DEFLATED, comment=b""):
+    with zipfile.ZipFile(file_path, "w", compression=compression) as write_zf:
+        for name, data in members:
+            write_zf.writestr(name, data)
+        write_zf.comment = comment
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_central_directory_matches_zipfile(tmp_path, compression):
+    file_path = str(tmp_path / "author.package.1.var")
+    members = [("meta.json", b'{"dependencies": {}}'), ("Custom/", b""), ("Saves/scene/ünïcode.json", b"x" * 5000)]
+    _write_zip(file_path, members, compression=compression, comment=b"comment")
+
+    with zipfile.ZipFile(file_path) as read_zf, ZipCentralDirectory(file_path) as read_cd:
+        assert read_cd.infolist() == [(info.filename, info.file_size) for info in read_zf.infolist()]
+        assert list(read_cd.crcs) == [info.CRC for info in read_zf.infolist()]
+        for name, data in members:
+            assert read_cd.read(name) == data
+
+
+def test_central_directory_reads_zip64(tmp_path):
+    file_path = str(tmp_path / "author.package.1.var")
+    with zipfile.ZipFile(file_path, "w", compression=zipfile.ZIP_DEFLATED) as write_zf:
+        with write_zf.open("meta.json", "w", force_zip64=True) as write_item:
+            write_item.write(b"{}")
+
+    with ZipCentralDirectory(file_path) as read_cd:
+        assert read_cd.infolist() == [("meta.json", 2)]
+        assert read_cd.read("meta.json") == b"{}"
+
+
+def test_central_directory_rejects_unsupported_and_invalid(tmp_path):
+    file_path = str(tmp_path / "author.package.1.var")
+    _write_zip(file_path, [("meta.json", b"{}")], compression=zipfile.ZIP_BZIP2)
+    with ZipCentralDirectory(file_path) as read_cd:
+        with pytest.raises(NotImplementedError):
+            read_cd.read("meta.json")
+
+    with open(file_path, "wb") as write_file:
+        write_file.write(b"not a zip")
+    with pytest.raises(zipfile.BadZipFile):
+        with ZipCentralDirectory(file_path):
+            pass
+
+
+def test_copy_zip_member_keeps_compressed_bytes(tmp_path):
+    read_path = str(tmp_path / "author.package.1.var")
+    write_path = str(tmp_path / "author.package.2.var")
+    with zipfile.ZipFile(read_path, "w") as write_zf:
+        write_zf.writestr("meta.json", b'{"old": true}', zipfile.ZIP_DEFLATED)
+        write_zf.writestr("Custom/stored.bin", bytes(range(256)) * 100, zipfile.ZIP_STORED)
+        write_zf.writestr("Custom/deflated.json", b"{}" * 5000, zipfile.ZIP_DEFLATED)
+        with write_zf.open("Custom/zip64.bin", "w", force_zip64=True) as write_item:
+            write_item.write(b"zip64" * 1000)
+        write_zf.mkdir("Custom/Empty")
+
+    with ZipReadInto(read_path, write_path) as (read_zf, zf_dest):
+        for item in read_zf.infolist():
+            if item.filename == "meta.json":
+                zf_dest.writestr("meta.json", b'{"new": true}')
+            else:
+                copy_zip_member(read_zf, zf_dest, item)
+
+    with zipfile.ZipFile(read_path) as read_zf, zipfile.ZipFile(write_path) as written_zf:
+        assert written_zf.testzip() is None
+        assert written_zf.namelist() == read_zf.namelist()
+        assert written_zf.read("meta.json") == b'{"new": true}'
+        for item in read_zf.infolist()[1:]:
+            written = written_zf.getinfo(item.filename)
+            assert written_zf.read(item.filename) == read_zf.read(item.filename)
+            assert (written.compress_type, written.compress_size, written.CRC) == (
+                item.compress_type,
+                item.compress_size,
+                item.CRC,
+            )
+
+
+def test_storage_policy_stores_compressed_formats(tmp_path):
+    read_path = str(tmp_path / "author.package.1.var")
+    write_path = str(tmp_path / "author.package.2.var")
+    noise = random.Random(0).randbytes(20000)
+    with zipfile.ZipFile(read_path, "w", compression=zipfile.ZIP_DEFLATED) as write_zf:
+        write_zf.writestr("Custom/Atom/Person/Textures/skin.jpg", noise)
+        write_zf.writestr("Custom/Assets/noise.bin", noise)
+        write_zf.writestr("Saves/scene/scene.json", b'{"atoms": []}' * 1000)
+        write_zf.writestr("Custom/Scripts/script.cs", b"// script" * 1000, zipfile.ZIP_STORED)
+
+    policy = StoragePolicy.from_config({".cs": 9, ".bin": "deflated"}, 0.05)
+    with ZipReadInto(read_path, write_path) as (read_zf, zf_dest):
+        for item in read_zf.infolist():
+            policy.copy(read_zf, zf_dest, item)
+        policy.write(zf_dest, "meta.json", b'{"dependencies": {}}' * 100)
+        policy.write(zf_dest, "Custom/Assets/noise.json", noise)
+
+    with zipfile.ZipFile(read_path) as read_zf, zipfile.ZipFile(write_path) as written_zf:
+        assert written_zf.testzip() is None
+        for item in read_zf.infolist():
+            assert written_zf.read(item.filename) == read_zf.read(item.filename)
+        assert {item.filename: item.compress_type for item in written_zf.infolist()} == {
+            "Custom/Atom/Person/Textures/skin.jpg": zipfile.ZIP_STORED,
+            # Deflated for next to nothing
+            "Custom/Assets/noise.bin": zipfile.ZIP_STORED,
+            "Saves/scene/scene.json": zipfile.ZIP_DEFLATED,
+            "Custom/Scripts/script.cs": zipfile.ZIP_DEFLATED,
+            "meta.json": zipfile.ZIP_DEFLATED,
+            "Custom/Assets/noise.json": zipfile.ZIP_STORED,
+        }
+        assert written_zf.read("Custom/Assets/noise.json") == noise
+        scene = read_zf.getinfo("Saves/scene/scene.json")
+        assert written_zf.getinfo("Saves/scene/scene.json").compress_size == scene.compress_size
+
+
+@pytest.fixture(name="small_memory_budget")
+def fixture_small_memory_budget():
+    budget = get_memory_budget()
+    set_memory_budget(8 * 1024 * 1024)
+    yield get_memory_budget()
+    set_memory_budget(budget)
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_member_writer_parallel_matches_serial(tmp_path, small_memory_budget, workers):
+    read_path = str(tmp_path / "author.package.1.var")
+    noise = random.Random(0).randbytes(200000)
+    with zipfile.ZipFile(read_path, "w") as write_zf:
+        write_zf.writestr("meta.json", b'{"dependencies": {}}')
+        write_zf.mkdir("Custom/Empty")
+        for position in range(12):
+            write_zf.writestr(f"Custom/Atom/Person/Textures/skin_{position}.jpg", noise, zipfile.ZIP_DEFLATED)
+            write_zf.writestr(f"Saves/scene/scene_{position}.json", b'{"atoms": []}' * 10000, zipfile.ZIP_STORED)
+            write_zf.writestr(f"Custom/Scripts/script_{position}.cs", b"// script" * 1000, zipfile.ZIP_DEFLATED)
+        # Past the memory budget, so it is streamed
+        write_zf.writestr("Saves/scene/huge.json", b"{}" * small_memory_budget, zipfile.ZIP_STORED)
+
+    written = []
+    for count in (1, workers):
+        write_path = str(tmp_path / f"author.package.{count + 1}.var")
+        with ZipReadInto(read_path, write_path) as (read_zf, zf_dest), ZipMemberWriter(zf_dest, count) as writer:
+            for item in read_zf.infolist():
+                writer.copy(read_zf, item)
+        with open(write_path, "rb") as read_file:
+            written.append(read_file.read())
+    assert written[0] == written[1]
+
+    with zipfile.ZipFile(read_path) as read_zf, zipfile.ZipFile(write_path) as written_zf:
+        assert written_zf.testzip() is None
+        assert written_zf.namelist() == read_zf.namelist()
+        assert written_zf.getinfo("Custom/Atom/Person/Textures/skin_0.jpg").compress_type == zipfile.ZIP_STORED
+        assert written_zf.getinfo("Saves/scene/scene_0.json").compress_type == zipfile.ZIP_DEFLATED
+        assert written_zf.getinfo("Saves/scene/huge.json").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_member_writer_writes_in_order(tmp_path):
+    write_path = str(tmp_path / "author.package.1.var")
+    members = [(f"Saves/scene/scene_{position}.json", b'{"id": %d}' % position * 1000) for position in range(20)]
+    with zipfile.ZipFile(write_path, "w") as zf_dest, ZipMemberWriter(zf_dest, 4) as writer:
+        for name, data in members:
+            writer.write(name, data)
+        writer.write_encoded("meta.json", b"{}", zipfile.ZIP_STORED, b"{}")
+
+    with zipfile.ZipFile(write_path) as written_zf:
+        assert written_zf.testzip() is None
+        assert written_zf.namelist() == [name for name, _ in members] + ["meta.json"]
+        for name, data in members:
+            assert written_zf.read(name) == data
+            assert written_zf.getinfo(name).compress_type == zipfile.ZIP_DEFLATED
+
+
+@pytest.fixture(name="huge_var", scope="module")
+def fixture_huge_var(tmp_path_factory):
+    read_path = str(tmp_path_factory.mktemp("huge") / "author.package.1.var")
+    # Past the zip64 limit, stored so building it stays quick
+    block = bytes(64 * 1024 * 1024)
+    with zipfile.ZipFile(read_path, "w", compression=zipfile.ZIP_STORED) as write_zf:
+        with write_zf.open("Custom/Assets/huge.assetbundle", "w", force_zip64=True) as write_item:
+            for _ in range(40):
+                write_item.write(block)
+    return read_path
+
+
+@pytest.mark.parametrize("compress_type", [None, zipfile.ZIP_DEFLATED])
+def test_copy_zip_member_memory_stays_within_budget(tmp_path, huge_var, small_memory_budget, compress_type):
+    write_path = str(tmp_path / "author.package.2.var")
+    tracemalloc.start()
+    try:
+        with ZipReadInto(huge_var, write_path) as (read_zf, zf_dest):
+            copy_zip_member(read_zf, zf_dest, read_zf.getinfo("Custom/Assets/huge.assetbundle"), compress_type)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < small_memory_budget
+
+    with zipfile.ZipFile(huge_var) as read_zf, zipfile.ZipFile(write_path) as written_zf:
+        item = read_zf.getinfo("Custom/Assets/huge.assetbundle")
+        written = written_zf.getinfo("Custom/Assets/huge.assetbundle")
+        assert (written.file_size, written.CRC) == (item.file_size, item.CRC)
+        assert written.compress_type == (compress_type or zipfile.ZIP_STORED)
@@ -1,11 +1,24 @@
+import os
+import shutil
+
+import pytest
+
+from depmanager.common.var_database.var_database import VarDatabase
+from depmanager.common.var_object.var_object_image_lib import _resource_image
+
+
 def test_db_initialized(mock_var_database):
     assert len(mock_var_database.vars) == 8
 
 
-def test_db_directory_listing_and_count(mock_var_database):
+def test_db_directory_files_and_count(mock_var_database):
     assert mock_var_database.directory_count == 8
-    assert mock_var_database.directory_listing == {
-        "test_data\\fixtures_database": [
+    assert {
+        (os.path.dirname(file_path), os.path.basename(file_path))
+        for file_path, _, _ in mock_var_database.directory_files
+    } == {
+        (os.path.join("test_data", "fixtures_database"), filename)
+        for filename in (
             "Blazedust.Script_ParentHoldLink.1.var",
             "custom.test_scene.1.var",
             "Hunting-Succubus.Enhanced_Eyes.3.var",
@@ -14,7 +27,7 @@ def test_db_directory_listing_and_count(mock_var_database):
             "Roac.Arty.2.var",
             "Roac.Arty_ponytail.1.var",
             "Spacedog.Import_Reloaded_Lite.2.var",
-        ]
+        )
     }
 
 
@@ -41,3 +54,66 @@ def test_vars_versions(mock_var_database):
         "Roac.Arty_ponytail": {1},
         "Spacedog.Import_Reloaded_Lite": {2},
     }
+
+
+def test_db_parallel_scan_matches_serial(test_database_dir):
+    serial_database = VarDatabase(root=test_database_dir, workers=1)
+    parallel_database = VarDatabase(root=test_database_dir, workers=2)
+
+    assert serial_database.keys == parallel_database.keys
+    for var_id in serial_database.keys:
+        serial_var = serial_database[var_id]
+        parallel_var = parallel_database[var_id]
+        assert serial_var.file_path == parallel_var.file_path
+        assert serial_var.infolist == parallel_var.infolist
+        assert serial_var.dependencies == parallel_var.dependencies
+        assert serial_var.contains == parallel_var.contains
+        assert {key: set(val) for key, val in serial_var.used_packages.items()} == {
+            key: set(val) for key, val in parallel_var.used_packages.items()
+        }
+
+
+@pytest.mark.usefixtures("resource_image_dir")
+def test_db_parallel_thumbnails_match_serial(test_database_dir, tmp_path):
+    images = {}
+    for workers in (1, 2):
+        root = str(tmp_path / str(workers))
+        shutil.copytree(test_database_dir, root)
+        database = VarDatabase(root=root, image_root=str(tmp_path / f"images_{workers}"), workers=workers)
+        database.refresh_image_db()
+        images[workers] = {}
+        for image_file in database.image_files:
+            with open(image_file, "rb") as read_file:
+                images[workers][os.path.relpath(image_file, database.image_db_local_path)] = read_file.read()
+    assert len(images[1]) == len(database.vars) > 0
+    assert images[1] == images[2]
+
+
+@pytest.mark.usefixtures("resource_image_dir")
+def test_db_default_thumbnails_share_one_file(test_database_dir, tmp_path):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    shutil.copyfile(
+        os.path.join(root, "Blazedust.Script_ParentHoldLink.1.var"),
+        os.path.join(root, "Blazedust.Script_ParentHoldLink.2.var"),
+    )
+    database = VarDatabase(root=root, image_root=str(tmp_path / "local"), workers=1)
+    database.refresh_image_db()
+    stats = [
+        os.stat(image_file)
+        for image_file in database.image_files
+        if os.path.basename(image_file).startswith("Blazedust.Script_ParentHoldLink.")
+    ]
+    assert len(stats) == 2
+    assert stats[0].st_ino == stats[1].st_ino
+    assert stats[0].st_nlink == 3
+
+
+@pytest.mark.usefixtures("resource_image_dir")
+def test_default_images_decoded_once(mock_var_database):
+    _resource_image.cache_clear()
+    var = mock_var_database.vars["Blazedust.Script_ParentHoldLink.1"]
+    images = [var.extract_default_image_data(var.var_type.type) for _ in range(3)]
+    assert _resource_image.cache_info().misses == 1
+    assert images[0] is not images[1]
+    assert images[0].tobytes() == images[2].tobytes()
@@ -1,3 +1,24 @@
+import json
+import multiprocessing
+import os
+import shutil
+from zipfile import ZIP_STORED
+from zipfile import ZipFile
+
+import pytest
+
+from depmanager.common.shared.ziptools import StoragePolicy
+from depmanager.common.shared.ziptools import get_memory_budget
+from depmanager.common.shared.ziptools import get_storage_policy
+from depmanager.common.shared.ziptools import set_memory_budget
+from depmanager.common.shared.ziptools import set_storage_policy
+from depmanager.common.var_database import var_database
+from depmanager.common.var_database.var_database import VarDatabase
+from depmanager.common.var_object.compression_cache import CompressionCache
+from depmanager.common.var_object.compression_cache import set_compression_cache
+from depmanager.common.var_object.var_object import VarObject
+
+
 def test_db_repair_index_builds(mock_var_database):
     repair_index = mock_var_database.repair_index
     assert len(repair_index) == 934
@@ -19,3 +40,106 @@ def test_db_required_dependencies_builds(mock_var_database):
                 "kemenate.Decals.latest",
                 "Hunting-Succubus.EyeBall_Shadow.latest",
             }
+
+
+def test_db_repair_lookups_match_repair_index(mock_var_database):
+    repair_index = mock_var_database.repair_index
+    for _, file_path, basename in repair_index:
+        exact = [(item[0], item[1]) for item in repair_index if item[1].lower() == file_path.lower()]
+        by_name = [(item[0], item[1]) for item in repair_index if item[2].lower() == basename.lower()]
+        assert mock_var_database.repair_path_index[file_path.lower()] == exact
+        assert mock_var_database.repair_basename_index[basename.lower()] == by_name
+        assert mock_var_database.find_replacement_from_repair_index(file_path) == exact[0]
+    assert mock_var_database.find_replacement_from_repair_index("Custom/missing.vaj") == (None, None)
+
+
+@pytest.mark.parametrize("health_check", [True, False])
+def test_db_find_broken_vars_parallel_matches_serial(mock_var_database, monkeypatch, health_check):
+    monkeypatch.setattr(var_database, "BROKEN_SCAN_CHUNK_SIZE", 2)
+    monkeypatch.setattr(mock_var_database, "workers", 1)
+    serial = mock_var_database.find_broken_vars(health_check=health_check)
+    monkeypatch.setattr(mock_var_database, "workers", 2)
+    assert mock_var_database.find_broken_vars(health_check=health_check) == serial
+
+
+def test_db_find_broken_vars_spawned_workers(mock_var_database, monkeypatch):
+    monkeypatch.setattr(var_database, "BROKEN_SCAN_CHUNK_SIZE", 2)
+    monkeypatch.setattr(mock_var_database, "workers", 1)
+    serial = mock_var_database.find_broken_vars()
+    # The start method Windows and macOS use, workers share nothing with the parent
+    monkeypatch.setattr(multiprocessing, "Pool", multiprocessing.get_context("spawn").Pool)
+    monkeypatch.setattr(mock_var_database, "workers", 2)
+    assert mock_var_database.find_broken_vars() == serial
+
+
+def test_db_transform_var_matches_separate_passes(temporary_database, monkeypatch):
+    monkeypatch.setattr("builtins.input", lambda _: "y")
+    var_id = "custom.test_scene.1"
+    var_ref = temporary_database[var_id]
+    with open(var_ref.file_path, "rb") as read_file:
+        original = read_file.read()
+
+    assert temporary_database.repair_broken_var(var_ref, remove_confirm=True)
+    temporary_database.repair_metadata(var_ref)
+    with ZipFile(var_ref.file_path) as read_zf:
+        separate = {item.filename: read_zf.read(item.filename) for item in read_zf.infolist()}
+
+    with open(var_ref.file_path, "wb") as write_file:
+        write_file.write(original)
+    assert temporary_database.transform_var(var_ref, remove_confirm=True)
+    with ZipFile(var_ref.file_path) as read_zf:
+        fused = {item.filename: read_zf.read(item.filename) for item in read_zf.infolist()}
+
+    assert fused == separate
+    assert not VarObject(var_ref.root_path, var_ref.file_path).incorrect_metadata
+
+
+def _rename_creator(file_path):
+    with ZipFile(file_path) as read_zf:
+        members = [(item, read_zf.read(item)) for item in read_zf.infolist()]
+    with ZipFile(file_path, "w") as write_zf:
+        for item, data in members:
+            if item.filename == "meta.json":
+                data = json.dumps({**json.loads(data), "creatorName": "someone"}).encode("UTF-8")
+            write_zf.writestr(item, data)
+
+
+@pytest.fixture(name="rewrite_settings")
+def fixture_rewrite_settings():
+    """Settings a worker only follows when they are handed over, every default changed"""
+    budget, policy = get_memory_budget(), get_storage_policy()
+    set_memory_budget(512 * 1024)
+    set_storage_policy(StoragePolicy(default=(ZIP_STORED, None)))
+    yield
+    set_memory_budget(budget)
+    set_storage_policy(policy)
+    set_compression_cache(None)
+
+
+@pytest.mark.usefixtures("rewrite_settings")
+@pytest.mark.parametrize("start_method", ["fork", "spawn"])
+def test_db_transform_vars_parallel_matches_serial(test_database_dir, tmp_path, monkeypatch, start_method):
+    monkeypatch.setattr(multiprocessing, "Pool", multiprocessing.get_context(start_method).Pool)
+    contents = {}
+    cached = {}
+    for workers in (1, 2):
+        root = str(tmp_path / str(workers))
+        shutil.copytree(test_database_dir, root)
+        # The metadata fix rewrites the var, under the storage policy
+        _rename_creator(os.path.join(root, "kemenate.Decals.5.var"))
+        cache_path = str(tmp_path / f"compression_cache_{workers}.jsonl")
+        set_compression_cache(CompressionCache(cache_path))
+        database = VarDatabase(root=root, workers=workers)
+        transformed = database.transform_vars(list(database.vars.values()), compress=True, remove_skip=True)
+        assert transformed == sorted(var_id for var_id in database.vars if var_id != "custom.test_scene.1")
+        assert sorted(os.listdir(root)) == sorted(f"{var_id}.var" for var_id in database.vars)
+        contents[workers] = {}
+        for var_id, var_ref in database.vars.items():
+            with ZipFile(var_ref.file_path) as read_zf:
+                contents[workers][var_id] = [
+                    (item.filename, item.compress_type, read_zf.read(item)) for item in read_zf.infolist()
+                ]
+        cached[workers] = CompressionCache(cache_path).entries
+    assert contents[1] == contents[2]
+    assert len(cached[1]) > 0
+    assert cached[1] == cached[2]
@@ -0,0 +1,202 @@
+import os
+import shutil
+
+import pytest
+
+from depmanager.common.enums.formats import DatabaseFormat
+from depmanager.common.var_database import var_database_storage
+from depmanager.common.var_database.var_database import VarDatabase
+from depmanager.common.var_database.var_database_sqlite import VarDatabaseSqliteStorage
+from depmanager.common.var_database.var_database_storage import VarDatabaseBinaryStorage
+from depmanager.common.var_database.var_database_storage import VarDatabaseStorage
+
+
+@pytest.fixture(name="records")
+def fixture_records():
+    return [
+        {
+            "file_path": os.path.join("assets", f"author.package_{index}.{index + 1}.var"),
+            "info": {"created": 1.0, "modified": 2.0, "size": 100 + index},
+            "contains": {"asset": True},
+            "infolist": [["meta.json", 10], [f"Custom/Assets/item_{index}.assetbundle", 1000]],
+            "dependencies": [],
+            "used_packages": {"SELF": [f"Custom/Assets/item_{index}.assetbundle"]},
+            "metadata": {"creatorName": "author", "packageName": f"package_{index}"},
+        }
+        for index in range(25)
+    ]
+
+
+def test_binary_storage_round_trip(tmp_path, records):
+    storage = VarDatabaseBinaryStorage(str(tmp_path))
+    storage.save(str(tmp_path), records)
+
+    assert storage.exists()
+    assert storage.load() == records
+    assert storage.load_record("author.package_7.8") == records[7]
+    assert storage.load_record("author.missing.1") is None
+
+
+def test_binary_storage_is_smaller_than_json(tmp_path, records):
+    VarDatabaseStorage(str(tmp_path)).save(str(tmp_path), records)
+    VarDatabaseBinaryStorage(str(tmp_path)).save(str(tmp_path), records)
+
+    assert os.path.getsize(tmp_path / "remote_db.dmdb") < os.path.getsize(tmp_path / "remote_db.json")
+
+
+def test_binary_storage_rejects_corrupt_file(tmp_path, records):
+    storage = VarDatabaseBinaryStorage(str(tmp_path))
+    storage.save(str(tmp_path), records)
+    with open(storage.file_path, "r+b") as write_file:
+        write_file.seek(20)
+        write_file.write(b"\x00" * 16)
+
+    with pytest.raises(ValueError):
+        storage.load()
+
+
+def test_binary_storage_interrupted_save_keeps_database(tmp_path, records, monkeypatch):
+    storage = VarDatabaseBinaryStorage(str(tmp_path))
+    storage.save(str(tmp_path), records[:10])
+
+    def interrupted_replace(*_):
+        raise OSError("interrupted")
+
+    monkeypatch.setattr(var_database_storage.os, "replace", interrupted_replace)
+    with pytest.raises(OSError):
+        storage.save(str(tmp_path), records)
+    assert storage.load() == records[:10]
+
+
+def test_json_storage_interrupted_save_keeps_database(tmp_path, records, monkeypatch):
+    storage = VarDatabaseStorage(str(tmp_path))
+    storage.save(str(tmp_path), records[:10])
+    storage.save_changes(records[10:12], set())
+
+    def interrupted_replace(*_):
+        raise OSError("interrupted")
+
+    monkeypatch.setattr(var_database_storage.os, "replace", interrupted_replace)
+    with pytest.raises(OSError):
+        storage.save(str(tmp_path), records)
+    assert storage.load() == records[:12]
+
+
+def test_database_migrates_json_to_binary(test_database_dir, tmp_path):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    json_database = VarDatabase(root=root, workers=1)
+    json_database._files_added_or_removed = True  # pylint: disable=protected-access
+    json_database.save()
+    json_database = VarDatabase(root=root, workers=1)
+
+    binary_database = VarDatabase(root=root, workers=1, db_format=DatabaseFormat.BINARY)
+
+    assert os.path.exists(os.path.join(root, "remote_db.dmdb"))
+    assert binary_database.keys == json_database.keys
+    for var_id in json_database.keys:
+        assert binary_database[var_id].to_dict() == json_database[var_id].to_dict()
+
+
+def test_sqlite_storage_round_trip(tmp_path, records):
+    storage = VarDatabaseSqliteStorage(str(tmp_path))
+    storage.save(str(tmp_path), records)
+
+    assert storage.exists()
+    assert sorted(storage.load(), key=lambda item: item["file_path"]) == sorted(
+        records, key=lambda item: item["file_path"]
+    )
+
+
+def test_sqlite_storage_rejects_corrupt_file(tmp_path):
+    storage = VarDatabaseSqliteStorage(str(tmp_path))
+    with open(storage.file_path, "wb") as write_file:
+        write_file.write(b"\x00" * 1024)
+
+    with pytest.raises(ValueError):
+        storage.load()
+
+
+def test_sqlite_queries_match_database(test_database_dir, tmp_path):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    database = VarDatabase(root=root, workers=1, db_format=DatabaseFormat.SQLITE)
+    database.save()
+    storage = database.storage
+
+    assert storage.find_missing_vars() == database.find_missing_vars()
+    for var_id in database.keys | set(database.vars_required):
+        assert sorted(storage.required_by(var_id)) == sorted(database.vars_required.get(var_id, []))
+    for var_id, file_path, _ in database.repair_index:
+        expected = next(
+            (index[0], index[1]) for index in database.repair_index if index[1].lower() == file_path.lower()
+        )
+        assert database.find_replacement_from_repair_index(file_path) == expected
+
+
+@pytest.mark.parametrize("db_format", [DatabaseFormat.JSON, DatabaseFormat.BINARY, DatabaseFormat.SQLITE])
+def test_database_saves_changes_incrementally(test_database_dir, tmp_path, db_format):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    database = VarDatabase(root=root, workers=1, db_format=db_format)
+    database.save()
+    saved_size = os.path.getsize(database.storage.file_path)
+
+    moved_var_id, removed_var_id = sorted(database.keys)[:2]
+    database.manipulate_file(moved_var_id, os.path.join(root, "moved"), move=True)
+    os.remove(database[removed_var_id].file_path)
+    database.refresh()
+    database.save()
+
+    if db_format != DatabaseFormat.SQLITE:
+        assert os.path.getsize(database.storage.file_path) == saved_size
+        assert len(database.storage.read_journal()) == 2
+
+    reloaded = VarDatabase(root=root, workers=1, db_format=db_format)
+    assert reloaded.keys == database.keys
+    assert removed_var_id not in reloaded.keys
+    assert reloaded[moved_var_id].file_path == os.path.join(root, "moved", database[moved_var_id].filename)
+
+    reloaded.save(compact=True)
+    assert not os.path.exists(reloaded.storage.journal_path)
+    assert VarDatabase(root=root, workers=1, db_format=db_format).keys == database.keys
+
+
+def test_truncated_journal_line_is_skipped(test_database_dir, tmp_path, monkeypatch):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    database = VarDatabase(root=root, workers=1)
+    database.save()
+    moved_var_id = sorted(database.keys)[0]
+    database.manipulate_file(moved_var_id, os.path.join(root, "moved"), move=True)
+    database.save()
+    assert len(database.storage.read_journal()) == 1
+    with open(database.storage.journal_path, "ab") as journal_file:
+        journal_file.write(b'{"var_id": "author.cut_short.1", "rec')
+
+    def refresh(_):
+        raise AssertionError("a truncated journal line must not trigger a rescan")
+
+    monkeypatch.setattr(VarDatabase, "refresh", refresh)
+    reloaded = VarDatabase(root=root, workers=1)
+    assert reloaded.keys == database.keys
+    assert reloaded[moved_var_id].file_path == database[moved_var_id].file_path
+    assert reloaded.storage.needs_compaction()
+
+
+def test_sqlite_repair_ranks_are_updated_lazily(test_database_dir, tmp_path):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    database = VarDatabase(root=root, workers=1, db_format=DatabaseFormat.SQLITE)
+    database.save()
+    assert not database.storage.repair_ranks_stale()
+
+    moved_var_id = sorted(database.keys)[0]
+    database.manipulate_file(moved_var_id, os.path.join(root, "moved"), move=True)
+    database.save()
+    assert database.storage.repair_ranks_stale()
+
+    for _, file_path, _ in database.repair_index:
+        expected = next((var_id, member) for var_id, member, _ in database.repair_index if member == file_path)
+        assert database.find_replacement_from_repair_index(file_path) == expected
+    assert not VarDatabaseSqliteStorage(root).repair_ranks_stale()
@@ -0,0 +1,141 @@
+import os
+import shutil
+
+import pytest
+
+from depmanager.common.var_database.image_archive import ImageArchive
+from depmanager.common.var_database.var_database import VarDatabase
+
+
+def _write_images(local_dir, images):
+    for relative, data in images.items():
+        file_path = os.path.join(local_dir, relative)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as write_file:
+            write_file.write(data)
+
+
+def _read_images(local_dir):
+    images = {}
+    for dir_path, _, files in os.walk(local_dir):
+        for file in files:
+            with open(os.path.join(dir_path, file), "rb") as read_file:
+                images[os.path.relpath(os.path.join(dir_path, file), local_dir)] = read_file.read()
+    return images
+
+
+def _image_files(local_dir):
+    return sorted(os.path.join(dir_path, file) for dir_path, _, files in os.walk(local_dir) for file in files)
+
+
+def test_image_archive_appends_only_changes(tmp_path):
+    local_dir = str(tmp_path / "local")
+    archive_dir = str(tmp_path / "remote")
+    os.makedirs(archive_dir)
+    images = {os.path.join("assets", f"author.var_{position}.1.jpg"): os.urandom(2000) for position in range(10)}
+    _write_images(local_dir, images)
+
+    archive = ImageArchive(archive_dir)
+    assert archive.sync(local_dir, _image_files(local_dir)) == 10
+    pack_size = archive.pack_size
+    assert ImageArchive(archive_dir).sync(local_dir, _image_files(local_dir)) == 0
+
+    # A move only appends an index line, a removal a tombstone and a new image its data
+    os.makedirs(os.path.join(local_dir, "scenes"))
+    os.rename(
+        os.path.join(local_dir, "assets", "author.var_0.1.jpg"), os.path.join(local_dir, "scenes", "author.var_0.1.jpg")
+    )
+    os.remove(os.path.join(local_dir, "assets", "author.var_1.1.jpg"))
+    _write_images(local_dir, {os.path.join("assets", "author.new.1.jpg"): b"new image"})
+    assert ImageArchive(archive_dir).sync(local_dir, _image_files(local_dir)) == 3
+    assert ImageArchive(archive_dir).pack_size == pack_size + len(b"new image")
+
+    extract_dir = str(tmp_path / "extract")
+    archive = ImageArchive(archive_dir)
+    assert len(archive.extract_missing(extract_dir, ["author.var_2.1"])) == 9
+    expected = _read_images(local_dir)
+    del expected[os.path.join("assets", "author.var_2.1.jpg")]
+    assert _read_images(extract_dir) == expected
+    for relative in expected:
+        local_stat = os.stat(os.path.join(local_dir, relative))
+        assert os.stat(os.path.join(extract_dir, relative)).st_mtime_ns == local_stat.st_mtime_ns
+
+
+def test_image_archive_compacts_dead_images(tmp_path):
+    local_dir = str(tmp_path / "local")
+    archive_dir = str(tmp_path / "remote")
+    os.makedirs(archive_dir)
+    images = {os.path.join("assets", f"author.var_{position}.1.jpg"): os.urandom(2000) for position in range(10)}
+    _write_images(local_dir, images)
+    ImageArchive(archive_dir).sync(local_dir, _image_files(local_dir))
+
+    for position in range(6):
+        os.remove(os.path.join(local_dir, "assets", f"author.var_{position}.1.jpg"))
+    archive = ImageArchive(archive_dir)
+    archive.sync(local_dir, _image_files(local_dir))
+    assert archive.needs_compaction
+    archive.compact()
+    assert not archive.needs_compaction
+    assert archive.pack_size == 4 * 2000
+
+    extract_dir = str(tmp_path / "extract")
+    assert len(ImageArchive(archive_dir).extract_missing(extract_dir, [])) == 4
+    assert _read_images(extract_dir) == _read_images(local_dir)
+    assert ImageArchive(archive_dir).sync(local_dir, _image_files(local_dir)) == 0
+
+
+@pytest.mark.usefixtures("resource_image_dir")
+def test_db_thumbnails_restore_from_archive(test_database_dir, tmp_path):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    database = VarDatabase(root=root, image_root=str(tmp_path / "local"), workers=1)
+    database.refresh_image_db()
+    database.save_image_db()
+    images = _read_images(database.image_db_local_path)
+    assert len(images) == len(database.vars) > 0
+
+    # A later session on another machine
+    shutil.rmtree(database.image_db_local_path)
+    database = VarDatabase(root=root, image_root=str(tmp_path / "local"), workers=1)
+    database.load_image_db()
+    assert _read_images(database.image_db_local_path) == images
+
+
+@pytest.mark.usefixtures("resource_image_dir")
+def test_db_thumbnail_moves_touch_only_changes(test_database_dir, tmp_path):
+    root = str(tmp_path / "remote")
+    shutil.copytree(test_database_dir, root)
+    database = VarDatabase(root=root, image_root=str(tmp_path / "local"), workers=1)
+    database.refresh_image_db()
+    database.save_image_db()
+    archive = ImageArchive(root)
+    index_lines, pack_size = archive.index_lines, archive.pack_size
+
+    var_id = sorted(database.vars)[0]
+    moved_dir = os.path.join("tagged", "used")
+    database.manipulate_image_file_list([(var_id, "", moved_dir)])
+    assert database.image_catalogue.changed == {var_id}
+    database.save_image_db()
+    archive = ImageArchive(root)
+    assert (archive.index_lines, archive.pack_size) == (index_lines + 1, pack_size)
+    assert archive.paths[var_id] == os.path.join(moved_dir, f"{var_id}.jpg")
+
+    database.manipulate_image_file_list([(var_id, moved_dir, "")])
+    database.remove_empty_image_directories()
+    assert not os.path.exists(os.path.join(database.image_db_local_path, "tagged"))
+    assert sorted(database.image_files) == _image_files(database.image_db_local_path)
+
+
+def test_image_archive_relinks_shared_images(tmp_path):
+    local_dir = str(tmp_path / "local")
+    archive_dir = str(tmp_path / "remote")
+    os.makedirs(archive_dir)
+    _write_images(local_dir, {os.path.join("plugins", "author.plugin.1.jpg"): b"default image"})
+    os.link(os.path.join(local_dir, "plugins", "author.plugin.1.jpg"), os.path.join(local_dir, "author.plugin.2.jpg"))
+    ImageArchive(archive_dir).sync(local_dir, _image_files(local_dir))
+
+    extract_dir = str(tmp_path / "extract")
+    assert len(ImageArchive(archive_dir).extract_missing(extract_dir, [])) == 2
+    assert _read_images(extract_dir) == _read_images(local_dir)
+    stats = [os.stat(file_path) for file_path in _image_files(extract_dir)]
+    assert stats[0].st_ino == stats[1].st_ino
@@ -0,0 +1,43 @@
+from depmanager.common.shared.cached_property import cached_property
+from depmanager.common.var_object.var_object import VarObject
+from depmanager.common.var_object.var_object_compact import Infolist
+from depmanager.common.var_object.var_object_compact import compact_used_packages
+
+
+def test_infolist_behaves_like_list_of_tuples():
+    items = [["meta.json", 10], ["Custom/Assets/item.assetbundle", 2**33]]
+    infolist = Infolist(items)
+
+    assert len(infolist) == 2
+    assert infolist[1] == ("Custom/Assets/item.assetbundle", 2**33)
+    assert list(infolist) == [("meta.json", 10), ("Custom/Assets/item.assetbundle", 2**33)]
+    assert infolist == items
+    assert infolist == Infolist(items)
+    assert infolist.names == ["meta.json", "Custom/Assets/item.assetbundle"]
+
+
+def test_paths_are_shared_between_vars():
+    first = Infolist([["".join(["Custom/", "Atom/shared.jpg"]), 1]])
+    second = Infolist([["".join(["Custom/Atom/", "shared.jpg"]), 1]])
+    used_packages = compact_used_packages({"author.package.latest": {"".join(["Custom/", "Atom/shared.jpg"])}})
+
+    assert first.names[0] is second.names[0]
+    assert used_packages["author.package.latest"][0] is first.names[0]
+
+
+def test_var_object_caches_in_slots():
+    record = {
+        "file_path": "author.package.1.var",
+        "info": {"created": 1.0, "modified": 2.0, "size": 1000},
+        "infolist": [["meta.json", 10]],
+        "dependencies": [],
+        "used_packages": {},
+        "metadata": {},
+    }
+    var = VarObject.from_dict(data=record, root_path=".")
+
+    assert not hasattr(var, "__dict__")
+    for name in dir(VarObject):
+        if isinstance(getattr(VarObject, name), cached_property) and name != "exists":
+            getattr(var, name)
+    assert (var.var_id, var.duplicate_id, var.version) == ("author.package.1", "author.package", 1)
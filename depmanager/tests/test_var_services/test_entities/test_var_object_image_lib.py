@@ -0,0 +1,148 @@
+import io
+import os
+import shutil
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+from depmanager.common.var_object import var_object_image_lib
+from depmanager.common.var_object.compression_cache import CompressionCache
+from depmanager.common.var_object.compression_cache import set_compression_cache
+from depmanager.common.var_object.var_object import VarObject
+from depmanager.common.var_object.var_object_image_lib import VarObjectImageLib
+
+
+def _image(rng, size, colors, img_format):
+    palette = rng.integers(0, 255, (colors, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(palette[rng.integers(0, colors, size)], "RGB").save(buffer, img_format)
+    return buffer.getvalue()
+
+
+def _write_image_var(file_path):
+    rng = np.random.default_rng(3)
+    images = [
+        _image(rng, (1024, 1024), 250, "PNG"),
+        _image(rng, (512, 1024), 64, "PNG"),
+        b"not an image",
+        _image(rng, (1024, 1024), 200, "PNG"),
+        _image(rng, (256, 256), 16, "JPEG"),
+    ]
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as write_zf:
+        write_zf.writestr("meta.json", b'{"dependencies": {}}')
+        for position, image in enumerate(images):
+            ext = "jpg" if image.startswith(b"\xff\xd8") else "png"
+            write_zf.writestr(f"Custom/Atom/Person/Textures/tester/skin_{position}.{ext}", image)
+            write_zf.writestr(f"Custom/Clothing/Female/tester/dress/dress_{position}.{ext}", image)
+        write_zf.writestr("Custom/Atom/Person/Textures/tester/skin.psd", b"psd")
+
+
+def test_var_object_compress_parallel_matches_serial(tmp_path):
+    for workers in (1, 3):
+        os.makedirs(tmp_path / str(workers))
+    serial_path = str(tmp_path / "1" / "tester.images.1.var")
+    parallel_path = str(tmp_path / "3" / "tester.images.1.var")
+    _write_image_var(serial_path)
+    shutil.copyfile(serial_path, parallel_path)
+
+    saved = VarObject(str(tmp_path / "1"), serial_path).compress(workers=1)
+    assert saved > 0
+    assert VarObject(str(tmp_path / "3"), parallel_path).compress(workers=3) == saved
+
+    with zipfile.ZipFile(serial_path) as serial_zf, zipfile.ZipFile(parallel_path) as parallel_zf:
+        assert serial_zf.namelist() == parallel_zf.namelist()
+        assert "Custom/Atom/Person/Textures/tester/skin.psd" not in serial_zf.namelist()
+        for name in serial_zf.namelist():
+            assert serial_zf.read(name) == parallel_zf.read(name)
+
+
+def test_var_object_compress_reuses_cached_decisions(tmp_path, monkeypatch):
+    var_path = str(tmp_path / "tester.images.1.var")
+    cache_path = str(tmp_path / "compression_cache.jsonl")
+    _write_image_var(var_path)
+    set_compression_cache(CompressionCache(cache_path))
+    try:
+        assert VarObject(str(tmp_path), var_path).compress() > 0
+        # The compressed images are new members, one more run settles them
+        VarObject(str(tmp_path), var_path).compress()
+        entries = CompressionCache(cache_path).entries.values()
+        assert {entry["outcome"] for entry in entries} == {"compressed", "skipped", "failed"}
+        assert {entry.get("reason") for entry in entries} >= {"not_square", "small"}
+
+        decoded = []
+        compress_image = VarObjectImageLib._compress_image  # pylint: disable=protected-access
+
+        def counting_compress_image(self, img_data, *args, **kwargs):
+            decoded.append(img_data)
+            return compress_image(self, img_data, *args, **kwargs)
+
+        monkeypatch.setattr(VarObjectImageLib, "_compress_image", counting_compress_image)
+        set_compression_cache(CompressionCache(cache_path))
+        with open(var_path, "rb") as read_file:
+            before = read_file.read()
+        assert VarObject(str(tmp_path), var_path).compress() == 0
+        assert not decoded
+        with open(var_path, "rb") as read_file:
+            assert read_file.read() == before
+    finally:
+        set_compression_cache(None)
+
+
+def test_var_object_compress_skips_images_of_rejected_var(tmp_path, monkeypatch):
+    var_path = str(tmp_path / "tester.images.1.var")
+    repack_path = str(tmp_path / "tester.repack.1.var")
+    cache_path = str(tmp_path / "compression_cache.jsonl")
+    _write_image_var(var_path)
+    # A repack holding the very same images
+    shutil.copyfile(var_path, repack_path)
+    # Every image counts as large enough to be worth compressing
+    monkeypatch.setattr(var_object_image_lib, "MEGABYTE", 1)
+    set_compression_cache(CompressionCache(cache_path))
+    try:
+        assert VarObject(str(tmp_path), var_path).is_compressible
+        compression_is_worthwhile = VarObjectImageLib.compression_is_worthwhile
+        monkeypatch.setattr(VarObjectImageLib, "compression_is_worthwhile", lambda self, *args: False)
+        assert VarObject(str(tmp_path), var_path).compress() == 0
+
+        entries = CompressionCache(cache_path).entries
+        rejected = {key for key, entry in entries.items() if entry.get("reason") == "var_savings"}
+        assert len(rejected) > 0
+        assert all(key.startswith("tester.images.1/") for key in rejected)
+        assert not VarObject(str(tmp_path), var_path).is_compressible
+
+        # The repack passes its own savings gate
+        monkeypatch.setattr(VarObjectImageLib, "compression_is_worthwhile", compression_is_worthwhile)
+        set_compression_cache(CompressionCache(cache_path))
+        assert VarObject(str(tmp_path), repack_path).is_compressible
+        assert VarObject(str(tmp_path), repack_path).compress() > 0
+    finally:
+        set_compression_cache(None)
+
+
+def _should_quantize_sorted(img):
+    colors = img.getcolors(maxcolors=100000)
+    if colors is None:
+        return False
+    colors = sorted(colors, reverse=True)
+    if len(colors) <= 256:
+        return True
+    return sum(c[0] for c in colors[:256]) / sum(c[0] for c in colors) > 0.5
+
+
+def test_should_quantize_image_matches_sorted_counts():
+    rng = np.random.default_rng(9)
+    images = []
+    for colors in (1, 256, 257, 400, 3000, 70000):
+        palette = rng.integers(0, 255, (colors, 4), dtype=np.uint8)
+        for skew in (0.0, 1.0, 2.0):
+            weights = 1 / np.arange(1, colors + 1) ** skew
+            pixels = palette[rng.choice(colors, (300, 300), p=weights / weights.sum())]
+            images.append(Image.fromarray(pixels[..., :3], "RGB"))
+            images.append(Image.fromarray(pixels, "RGBA"))
+    images.append(Image.fromarray(rng.integers(0, 255, (400, 400, 3), dtype=np.uint8), "RGB"))
+    images.extend(images[4].convert(mode) for mode in ("1", "L", "LA", "P", "I"))
+
+    for img in images:
+        # pylint: disable=protected-access
+        assert VarObjectImageLib._should_quantize_image(img) == _should_quantize_sorted(img), img.mode
@@ -1,4 +1,5 @@
 import io
+import json
 from os import path
 
 import pytest
@@ -48,6 +49,64 @@ def test_scan_with_paths(test_data_fixture_dir):
     }
 
 
+SCAN_CORPUS = [
+    '"id" : "Author.Package.1:/Custom/Scripts/Author/DoSomething.cs", ',
+    '"uid" : "A_Author.Clothing.latest:/Custom/Clothing/Female/Author/top.vam", ',
+    '"displayName" : "A_Author.Renamed.latest:/Custom/Clothing/Female/Author/renamed.vam", ',
+    '"internalId" : "A_Author.Prefixed.2:Author.Prefixed.2:/Custom/Hair/Female/Author/hair.vam", ',
+    '"storable" : "toggle:Author.Toggled.3:/Custom/Clothing/Female/Author/toggled.vam", ',
+    '"customTexture_MainTex" : "Author.Textures.1:/Custom/Atom/Person/Textures/Author/diffuse.jpg:True", ',
+    '"enabled" : "Author.Textures.1:/Custom/Atom/Person/Textures/Author/normal.png:False", ',
+    '"url" : "https://example.com/Author.Package.1:/Custom/readme.txt", ',
+    '"link" : "HTTP://example.com/Custom/page.html", ',
+    '"path" : "Custom/Atom/Person/Textures/local.png", ',
+    '"id" : "A_Local:Saves/scene/local.json", ',
+    '"SELF:/Custom/Sounds/local.wav", ',
+    '"Saves/Person/appearance/Preset_local.vap" : { ',
+    '"plugin#0" : "Nested.Package.1:/Other.Package.2:/Custom/Scripts/nested.cs", ',
+    '"name" : "Just a name", ',
+    "{ ",
+    "} ",
+]
+
+
+def _scan_lines(lines):
+    return VarParser.scan_with_paths(io.TextIOWrapper(io.BytesIO("\n".join(lines).encode("UTF-8")), encoding="UTF-8"))
+
+
+@pytest.mark.parametrize("line", SCAN_CORPUS)
+def test_scan_bytes_with_paths_matches_scan_with_paths_per_line(line):
+    assert VarParser.scan_bytes_with_paths(line.encode("UTF-8")) == _scan_lines([line])
+
+
+def test_scan_bytes_with_paths_matches_scan_with_paths(test_data_fixture_dir):
+    with open(path.join(test_data_fixture_dir, "test_scene.json"), "rb") as read_item:
+        data = read_item.read()
+
+    assert VarParser.scan_bytes_with_paths(data) == _scan_lines(data.decode("UTF-8").splitlines())
+    assert VarParser.scan_bytes_with_paths("\r\n".join(SCAN_CORPUS).encode("UTF-8")) == _scan_lines(SCAN_CORPUS)
+
+
+def test_scan_bytes_with_paths_reads_minified_json():
+    data = json.dumps(
+        {
+            "atoms": [
+                {"id": "Author.Package.1:/Custom/Scripts/Author/DoSomething.cs"},
+                {"padding": "x" * 5000, "position": "1/2"},
+                {"storable": "toggle:Author.Toggled.3:/Custom/Clothing/Female/Author/toggled.vam"},
+                {"path": "Custom/Atom/Person/Textures/local.png"},
+            ]
+        },
+        separators=(",", ":"),
+    ).encode("UTF-8")
+
+    assert VarParser.scan_bytes_with_paths(data) == {
+        "Author.Package.1": {"Custom/Scripts/Author/DoSomething.cs"},
+        "Author.Toggled.3": {"Custom/Clothing/Female/Author/toggled.vam"},
+        "SELF_UNREF": {"Custom/Atom/Person/Textures/local.png"},
+    }
+
+
 @pytest.mark.parametrize("extension", Ext.TYPES_REPLACE + [Ext.VAM, Ext.VMI])
 def test_replace_line_replaces_all_formats_with_matched_mapping(extension):
     line = f'"some_id_thing" : "Author.Package.1:/Custom/Scripts/Author/DoSomething.{extension}"'